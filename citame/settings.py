@@ -37,43 +37,30 @@ CORS_ALLOW_ALL_ORIGINS = True  # Solo para desarrollo, en producción especifica
 CORS_ALLOW_CREDENTIALS = True
 
 # Configuración de logging
+# Los registros se encolan en el hilo de la petición y un hilo dedicado los
+# escribe en consola (texto) y en django.log (JSON por línea). Ver core/utils_logging.py
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
-        },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
-        },
-    },
     'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-        'file': {
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'django.log',
-            'formatter': 'verbose',
+        'cola': {
+            'class': 'core.utils_logging.ColaHandler',
+            'archivo': BASE_DIR / 'django.log',
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['cola'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['cola'],
             'level': 'INFO',
             'propagate': False,
         },
         'core': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['cola'],
+            'level': config('LOG_LEVEL_CORE', default='INFO'),
             'propagate': False,
         },
     },
@@ -101,6 +88,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PerfiladoMiddleware',  # Debe estar después de AuthenticationMiddleware
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -181,6 +169,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Usuario personalizado
 AUTH_USER_MODEL = 'core.Usuario'
 
+# Carga el rol y los perfiles junto al usuario de la sesión (ver core/backends.py)
+AUTHENTICATION_BACKENDS = ['core.backends.BackendAutenticacion']
+
 # Configuración de login
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -193,3 +184,84 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 # Configuración de archivos de medios
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Perfilado bajo demanda (ver core/utils_perfilado.py)
+PERFILADO_DIR = Path(config('PERFILADO_DIR', default=str(BASE_DIR / 'perfiles')))
+PERFILADO_MAX_POR_HORA = config('PERFILADO_MAX_POR_HORA', default=10, cast=int)
+PERFILADO_TOKEN_VIGENCIA = config('PERFILADO_TOKEN_VIGENCIA', default=3600, cast=int)
+
+# Stream de notificaciones (ver core/utils_eventos.py). El archivo de señal debe
+# ser visible para todos los workers del servidor
+EVENTOS_INTERVALO = config('EVENTOS_INTERVALO', default=2, cast=int)
+EVENTOS_REVISION_MAXIMA = config('EVENTOS_REVISION_MAXIMA', default=30, cast=int)
+EVENTOS_DURACION_WSGI = config('EVENTOS_DURACION_WSGI', default=25, cast=int)
+# Conexiones en espera por proceso WSGI (menos que los hilos de gunicorn.conf.py);
+# sin cupo, el cliente recibe el estado actual y vuelve a consultar a los N segundos
+EVENTOS_MAX_ESPERAS_WSGI = config('EVENTOS_MAX_ESPERAS_WSGI', default=8, cast=int)
+EVENTOS_REINTENTO_SATURADO = config('EVENTOS_REINTENTO_SATURADO', default=30, cast=int)
+EVENTOS_ARCHIVO_SENAL = Path(config('EVENTOS_ARCHIVO_SENAL', default=str(BASE_DIR / 'tmp' / 'notificaciones.senal')))
+
+# Retención de notificaciones (ver core/utils_retencion.py). Por tipo: qué hacer
+# con las leídas o inactivas ('archivar', 'eliminar' o 'conservar') y tras cuántos días
+NOTIFICACIONES_RETENCION = {
+    'confirmacion': {'accion': 'archivar', 'dias': 30},
+    'recordatorio': {'accion': 'eliminar', 'dias': 7},
+    'cancelacion': {'accion': 'archivar', 'dias': 90},
+    'advertencia': {'accion': 'archivar', 'dias': 90},
+    'informacion': {'accion': 'eliminar', 'dias': 30},
+}
+NOTIFICACIONES_RETENCION_LOTE = config('NOTIFICACIONES_RETENCION_LOTE', default=500, cast=int)
+
+# Ventana en segundos en la que se agrupan eventos repetidos en un solo resumen
+NOTIFICACIONES_VENTANA_AGRUPACION = config('NOTIFICACIONES_VENTANA_AGRUPACION', default=3600, cast=int)
+
+# Recordatorios de citas (ver core/utils_recordatorios.py). El backend es opcional:
+# 'core.utils_recordatorios.BackendEmail', 'BackendArchivo' o 'BackendConsola'
+RECORDATORIOS_ANTICIPACION_HORAS = config('RECORDATORIOS_ANTICIPACION_HORAS', default=24, cast=int)
+RECORDATORIOS_LOTE = config('RECORDATORIOS_LOTE', default=1000, cast=int)
+RECORDATORIOS_BACKEND = config('RECORDATORIOS_BACKEND', default='') or None
+RECORDATORIOS_ARCHIVO = config('RECORDATORIOS_ARCHIVO', default=str(BASE_DIR / 'tmp' / 'recordatorios.jsonl'))
+
+# Sincronización incremental (ver core/utils_sincronizacion.py)
+SINCRONIZACION_LIMITE = config('SINCRONIZACION_LIMITE', default=500, cast=int)
+SINCRONIZACION_MARGEN_SEGUNDOS = config('SINCRONIZACION_MARGEN_SEGUNDOS', default=2, cast=int)
+SINCRONIZACION_RETENCION_DIAS = config('SINCRONIZACION_RETENCION_DIAS', default=30, cast=int)
+
+# Caché compartida entre workers (versiones de catálogos, ver core/utils_catalogos.py).
+# Con REDIS_URL se usa Redis; si no, archivos locales, visibles para todos los workers de la máquina
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / '.cache')),
+    }}
+CATALOGOS_REVISION_SEGUNDOS = config('CATALOGOS_REVISION_SEGUNDOS', default=5, cast=int)
+
+# Estadísticas del dashboard de farmacia (core/utils_estadisticas_farmacia.py)
+FARMACIA_SERIE_DIAS = tuple(int(dias) for dias in config('FARMACIA_SERIE_DIAS', default='7,30,90').split(','))
+FARMACIA_ESTADISTICAS_TTL = config('FARMACIA_ESTADISTICAS_TTL', default=300, cast=int)
+
+# Pronóstico de reposición (core/utils_reposicion.py)
+REPOSICION_DIAS_HISTORIAL = config('REPOSICION_DIAS_HISTORIAL', default=90, cast=int)
+REPOSICION_TIEMPO_ENTREGA_DIAS = config('REPOSICION_TIEMPO_ENTREGA_DIAS', default=7, cast=int)
+REPOSICION_DIAS_COBERTURA = config('REPOSICION_DIAS_COBERTURA', default=30, cast=int)
+REPOSICION_FACTOR_SEGURIDAD = config('REPOSICION_FACTOR_SEGURIDAD', default=1.65, cast=float)
+
+# Ingreso masivo por guía de remisión (core/utils_ingreso_masivo.py)
+INGRESO_MASIVO_MAX_LINEAS = config('INGRESO_MASIVO_MAX_LINEAS', default=5000, cast=int)
+INGRESO_MASIVO_MAX_BYTES = config('INGRESO_MASIVO_MAX_BYTES', default=2 * 1024 * 1024, cast=int)
+# Segundos que la guía subida espera en la caché entre la vista previa y el registro
+INGRESO_MASIVO_GUIA_TTL = config('INGRESO_MASIVO_GUIA_TTL', default=3600, cast=int)
+
+# Cola de trabajo de farmacia (core/utils_cola_recetas.py)
+FARMACIA_RESERVA_RECETA_MINUTOS = config('FARMACIA_RESERVA_RECETA_MINUTOS', default=10, cast=int)
+
+# Tramos de vencimiento de medicamentos en días (core/utils_vencimientos.py)
+FARMACIA_TRAMOS_VENCIMIENTO = tuple(int(dias) for dias in config('FARMACIA_TRAMOS_VENCIMIENTO', default='7,30,90').split(','))
+
+# Clasificación ABC/XYZ del inventario (core/utils_clasificacion_inventario.py)
+INVENTARIO_CLASIFICACION_MESES = config('INVENTARIO_CLASIFICACION_MESES', default=12, cast=int)
+INVENTARIO_LIMITES_ABC = tuple(float(limite) for limite in config('INVENTARIO_LIMITES_ABC', default='0.80,0.95').split(','))
+INVENTARIO_LIMITES_XYZ = tuple(float(limite) for limite in config('INVENTARIO_LIMITES_XYZ', default='0.5,1.0').split(','))
@@ -3,34 +3,32 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from datetime import datetime, timedelta
 from .models import Medico, DisponibilidadMedica, Cita, Consultorio
+from . import utils_catalogos
+import logging
+
+logger = logging.getLogger(__name__)
 
 @login_required
 def medicos_por_especialidad(request, especialidad_id):
     """
     Retorna la lista de médicos que pertenecen a una especialidad específica.
     """
-    print(f"[DEBUG] Buscando médicos para la especialidad ID: {especialidad_id}")
+    logger.debug('Buscando médicos para la especialidad ID: %s', especialidad_id)
     try:
         # Verificar si la especialidad existe
         from .models import Especialidad
         try:
-            especialidad = Especialidad.objects.get(id=especialidad_id)
-            print(f"[DEBUG] Especialidad encontrada: {especialidad.nombre} (ID: {especialidad.id})")
+            especialidad = utils_catalogos.especialidades().obtener(especialidad_id)
         except Especialidad.DoesNotExist:
-            print(f"[ERROR] No existe una especialidad con ID: {especialidad_id}")
+            logger.info('No existe una especialidad con ID: %s', especialidad_id)
             return JsonResponse({'error': f'No existe una especialidad con ID: {especialidad_id}'}, status=404)
         
-        # Buscar médicos para esta especialidad
-        medicos = Medico.objects.filter(especialidad_id=especialidad_id)
-        print(f"[DEBUG] Médicos encontrados: {medicos.count()}")
-        
-        # Mostrar información de cada médico encontrado
-        for medico in medicos:
-            print(f"[DEBUG] Médico: {medico.usuario.nombres} {medico.usuario.apellidos} (ID: {medico.id})")
+        # Buscar médicos para esta especialidad (una sola consulta, con el usuario incluido)
+        medicos = list(Medico.objects.filter(especialidad_id=especialidad_id).select_related('usuario'))
         
         # Si no hay médicos, devolver un mensaje claro
-        if not medicos.exists():
-            print(f"[AVISO] No hay médicos asignados a la especialidad: {especialidad.nombre}")
+        if not medicos:
+            logger.debug('No hay médicos asignados a la especialidad: %s', especialidad.nombre)
             return JsonResponse([], safe=False)
         
         # Construir la respuesta con los datos de los médicos
@@ -43,12 +41,13 @@ def medicos_por_especialidad(request, especialidad_id):
             } 
             for medico in medicos
         ]
-        print(f"[DEBUG] Datos a devolver: {data}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Especialidad %s: %s médicos encontrados', especialidad.nombre, len(data))
+            for medico in data:
+                logger.debug('Médico: %s %s (ID: %s)', medico['nombres'], medico['apellidos'], medico['id'])
         return JsonResponse(data, safe=False)
     except Exception as e:
-        import traceback
-        print(f"[ERROR] Error en medicos_por_especialidad: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error en medicos_por_especialidad')
         return JsonResponse({'error': str(e)}, status=500)
 
 @login_required
@@ -75,8 +74,7 @@ def horarios_disponibles(request, medico_id, fecha):
         )
         
         # Obtener consultorio del médico (simplificado para el ejemplo)
-        consultorios = Consultorio.objects.all()
-        consultorio_default = consultorios[0] if consultorios.exists() else None
+        consultorio_default = utils_catalogos.consultorios().primero()
         
         # Construir lista de horarios disponibles
         horarios = []
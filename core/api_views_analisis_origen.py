@@ -6,8 +6,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.http import JsonResponse
 from datetime import datetime, timedelta
+import logging
 
 from .models import Cita, Especialidad, Medico, TratamientoProgramado, Derivacion, Usuario, Rol
+from . import utils_catalogos
+
+logger = logging.getLogger(__name__)
 
 
 @api_view(['GET'])
@@ -58,29 +62,29 @@ def api_origen_citas(request):
         try:
             # Buscar rol de paciente (id 1 según la imagen)
             try:
-                rol_paciente = Rol.objects.get(nombre__icontains='paciente').id
+                rol_paciente = utils_catalogos.roles().buscar('paciente').id
             except Rol.DoesNotExist:
                 # Si no encuentra por nombre, intentar por ID
                 rol_paciente = 1
-                print(f"Usando ID fijo para rol_paciente: {rol_paciente}")
+                logger.warning("Usando ID fijo para rol_paciente: %s", rol_paciente)
             
             # Buscar rol de admisión (id 3 según la imagen)
             try:
                 # Intentar primero sin tilde
-                rol_admision = Rol.objects.get(nombre__icontains='admision').id
+                rol_admision = utils_catalogos.roles().buscar('admision').id
             except Rol.DoesNotExist:
                 try:
                     # Intentar con tilde por si acaso
-                    rol_admision = Rol.objects.get(nombre__icontains='admisión').id
+                    rol_admision = utils_catalogos.roles().buscar('admisión').id
                 except Rol.DoesNotExist:
                     # Si todo falla, usar el ID fijo
                     rol_admision = 3
-                    print(f"Usando ID fijo para rol_admision: {rol_admision}")
+                    logger.warning("Usando ID fijo para rol_admision: %s", rol_admision)
             
-            print(f"Roles encontrados - Paciente: {rol_paciente}, Admisión: {rol_admision}")
+            logger.debug("Roles encontrados - Paciente: %s, Admisión: %s", rol_paciente, rol_admision)
             
         except Exception as e:
-            print(f"Error al obtener roles: {str(e)}")
+            logger.exception("Error al obtener roles")
             return Response({'error': 'No se encontraron los roles necesarios: ' + str(e)}, status=500)
         
         # 1. Citas creadas por paciente
@@ -251,9 +255,7 @@ def api_origen_citas(request):
         
         return Response(respuesta)
     except Exception as e:
-        import traceback
-        print(f"Error en api_origen_citas: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error en api_origen_citas")
         return Response({
             'error': str(e),
             'mensaje': 'Ocurrió un error al procesar la solicitud. Por favor, contacte al administrador.'
@@ -4,6 +4,8 @@ from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from .models import Notificacion
+from .utils_notificaciones import ajustar_contadores, obtener_no_leidas
+from .utils_sincronizacion import registrar_cambios
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -13,34 +15,17 @@ def marcar_notificaciones_leidas(request):
     excluyendo las relacionadas con citas ya atendidas
     """
     try:
-        from .models import Cita
-        
         # Obtener todas las notificaciones no leídas
-        notificaciones = request.user.notificaciones.filter(leido=False)
-        
-        # Filtrar las notificaciones relacionadas con citas atendidas
-        ids_a_excluir = []
-        for notificacion in notificaciones:
-            if notificacion.objeto_relacionado == 'cita' and notificacion.objeto_id:
-                try:
-                    cita = Cita.objects.get(id=notificacion.objeto_id)
-                    if cita.estado == 'atendida':
-                        ids_a_excluir.append(notificacion.id)
-                except Cita.DoesNotExist:
-                    ids_a_excluir.append(notificacion.id)
-        
-        # Excluir las notificaciones identificadas
-        notificaciones_filtradas = notificaciones.exclude(id__in=ids_a_excluir)
-        count = notificaciones_filtradas.count()
-        
-        # Marcar como leídas solo las notificaciones válidas
-        for notificacion in notificaciones_filtradas:
-            notificacion.leido = True
-            notificacion.fecha_lectura = timezone.now()
-            notificacion.save()
+        notificaciones = Notificacion.objects.filter(usuario=request.user, leido=False)
         
-        # Eliminar las notificaciones de citas atendidas
-        notificaciones.filter(id__in=ids_a_excluir).delete()
+        # Marcar como leídas solo las notificaciones válidas (una sola sentencia UPDATE)
+        ids = list(notificaciones.activas().values_list('pk', flat=True))
+        ahora = timezone.now()
+        count = Notificacion.objects.filter(pk__in=ids, leido=False).update(leido=True, fecha_lectura=ahora, updated_at=ahora)
+        # update() no dispara señales: el contador y el registro de cambios se actualizan explícitamente
+        ajustar_contadores({request.user.pk: -count})
+        registrar_cambios(Notificacion(pk=pk, usuario_id=request.user.pk) for pk in ids)
+        # Las notificaciones de citas atendidas se retiran con purgar_notificaciones
         
         return JsonResponse({
             'success': True,
@@ -100,7 +85,8 @@ def eliminar_notificacion(request, notificacion_id):
 def limpiar_notificaciones_citas_atendidas(request):
     """
     Esta función ha sido desactivada temporalmente para evitar solicitudes constantes.
-    Originalmente eliminaba todas las notificaciones relacionadas con citas atendidas.
+    Originalmente eliminaba todas las notificaciones relacionadas con citas atendidas;
+    ahora las retira el comando purgar_notificaciones fuera de las peticiones.
     """
     # Devolver una respuesta vacía sin realizar ninguna acción
     return JsonResponse({
@@ -117,25 +103,7 @@ def notificaciones_no_leidas_count(request):
     excluyendo las relacionadas con citas ya atendidas
     """
     try:
-        from .models import Cita
-        
-        # Obtener todas las notificaciones no leídas
-        notificaciones = request.user.notificaciones.filter(leido=False)
-        
-        # Filtrar las notificaciones relacionadas con citas atendidas
-        ids_a_excluir = []
-        for notificacion in notificaciones:
-            if notificacion.objeto_relacionado == 'cita' and notificacion.objeto_id:
-                try:
-                    cita = Cita.objects.get(id=notificacion.objeto_id)
-                    if cita.estado == 'atendida':
-                        ids_a_excluir.append(notificacion.id)
-                except Cita.DoesNotExist:
-                    ids_a_excluir.append(notificacion.id)
-        
-        # Excluir las notificaciones identificadas
-        notificaciones_filtradas = notificaciones.exclude(id__in=ids_a_excluir)
-        count = notificaciones_filtradas.count()
+        count = obtener_no_leidas(request.user)
         
         return JsonResponse({
             'success': True,
@@ -0,0 +1,28 @@
+from django.http import JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from .utils_sincronizacion import sincronizar
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_sincronizacion(request):
+    """
+    Sincronización incremental de citas, notificaciones, derivaciones y recetas.
+    
+    Parámetros:
+        desde: Marca devuelta por la respuesta anterior (omitir la primera vez)
+    
+    La respuesta trae la nueva ``marca``, las filas nuevas o modificadas en
+    ``cambios`` y las ids borradas en ``eliminados``. Con ``completo`` el cliente
+    debe reemplazar sus datos; con ``hay_mas`` debe volver a pedir enseguida.
+    """
+    desde = request.GET.get('desde')
+    if desde is not None:
+        try:
+            desde = int(desde)
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Marca de sincronización inválida'}, status=400)
+    
+    return JsonResponse({'success': True, **sincronizar(request.user, desde)})
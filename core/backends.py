@@ -0,0 +1,21 @@
+from django.contrib.auth.backends import ModelBackend, UserModel
+
+
+class BackendAutenticacion(ModelBackend):
+    """
+    ModelBackend que carga al usuario de la sesión junto con su rol y sus
+    perfiles de médico y paciente en una sola consulta. Así las comprobaciones
+    de rol (``request.user.rol.nombre``) y los accesos a ``request.user.medico``
+    o ``request.user.paciente`` no vuelven a consultar la base en cada petición.
+    """
+
+    def get_user(self, user_id):
+        try:
+            usuario = (
+                UserModel._default_manager
+                .select_related('rol', 'medico__especialidad', 'paciente')
+                .get(pk=user_id)
+            )
+        except UserModel.DoesNotExist:
+            return None
+        return usuario if self.user_can_authenticate(usuario) else None
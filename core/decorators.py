@@ -1,79 +1,45 @@
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.http import JsonResponse
 from functools import wraps
 
-def admin_required(view_func):
-    """
-    Decorador que verifica si el usuario es un administrador.
-    Si no lo es, redirige al dashboard con un mensaje de error.
-    """
-    @wraps(view_func)
-    def _wrapped_view(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            messages.error(request, "Debe iniciar sesión para acceder a esta página.")
-            return redirect('login')
-        
-        if not request.user.rol or request.user.rol.nombre != 'Administrador':
-            messages.error(request, "No tiene permisos para acceder a esta página.")
-            return redirect('dashboard')
-        
-        return view_func(request, *args, **kwargs)
-    
-    return _wrapped_view
+def nombre_rol(usuario):
+    """Nombre del rol del usuario, o None. El rol llega junto al usuario (ver core.backends)"""
+    rol = getattr(usuario, 'rol', None)
+    return rol.nombre if rol else None
 
-def medico_required(view_func):
+def role_required(*roles, api=False, mensaje="No tiene permisos para acceder a esta página."):
     """
-    Decorador que verifica si el usuario es un médico.
-    Si no lo es, redirige al dashboard con un mensaje de error.
-    """
-    @wraps(view_func)
-    def _wrapped_view(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            messages.error(request, "Debe iniciar sesión para acceder a esta página.")
-            return redirect('login')
-        
-        if not request.user.rol or request.user.rol.nombre != 'Medico':
-            messages.error(request, "No tiene permisos para acceder a esta página.")
-            return redirect('dashboard')
-        
-        return view_func(request, *args, **kwargs)
+    Decorador que verifica que el usuario tenga alguno de los roles indicados.
+    Si no ha iniciado sesión redirige al login; si no tiene el rol, redirige al
+    dashboard con un mensaje de error (o responde 403 en JSON con ``api=True``).
     
-    return _wrapped_view
+    Uso:
+        @role_required('Medico')
+        @role_required('Administrador', 'Admision')
+    """
+    def decorador(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                if api:
+                    return JsonResponse({'error': 'No autenticado'}, status=401)
+                messages.error(request, "Debe iniciar sesión para acceder a esta página.")
+                return redirect('login')
+            
+            if nombre_rol(request.user) not in roles:
+                if api:
+                    return JsonResponse({'error': 'No autorizado'}, status=403)
+                messages.error(request, mensaje)
+                return redirect('dashboard')
+            
+            return view_func(request, *args, **kwargs)
+        
+        return _wrapped_view
+    return decorador
 
-def paciente_required(view_func):
-    """
-    Decorador que verifica si el usuario es un paciente.
-    Si no lo es, redirige al dashboard con un mensaje de error.
-    """
-    @wraps(view_func)
-    def _wrapped_view(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            messages.error(request, "Debe iniciar sesión para acceder a esta página.")
-            return redirect('login')
-        
-        if not request.user.rol or request.user.rol.nombre != 'Paciente':
-            messages.error(request, "No tiene permisos para acceder a esta página.")
-            return redirect('dashboard')
-        
-        return view_func(request, *args, **kwargs)
-    
-    return _wrapped_view
-
-def admision_required(view_func):
-    """
-    Decorador que verifica si el usuario es de admisión.
-    Si no lo es, redirige al dashboard con un mensaje de error.
-    """
-    @wraps(view_func)
-    def _wrapped_view(request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            messages.error(request, "Debe iniciar sesión para acceder a esta página.")
-            return redirect('login')
-        
-        if not request.user.rol or request.user.rol.nombre != 'Admision':
-            messages.error(request, "No tiene permisos para acceder a esta página.")
-            return redirect('dashboard')
-        
-        return view_func(request, *args, **kwargs)
-    
-    return _wrapped_view
+admin_required = role_required('Administrador')
+medico_required = role_required('Medico')
+paciente_required = role_required('Paciente')
+admision_required = role_required('Admision')
+farmaceutico_required = role_required('Farmacéutico', mensaje='No tienes permiso para acceder a esta página')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.utils_vencimientos import barrer_vencimientos, resumen_vencimientos
+
+
+class Command(BaseCommand):
+    help = (
+        'Marca como vencidas las recetas fuera de vigencia y recalcula las alertas de '
+        'medicamentos por vencer por tramos (pensado para ejecutarse cada noche).'
+    )
+
+    def handle(self, *args, **options):
+        resultado = barrer_vencimientos()
+        if resultado['fechas_completadas']:
+            self.stdout.write(f"{resultado['fechas_completadas']} recetas sin fecha límite completadas")
+        self.stdout.write(f"{resultado['recetas_vencidas']} recetas marcadas como vencidas")
+        for fila in resumen_vencimientos():
+            nombre = 'Vencidos' if fila['tramo'] == 0 else f"Hasta {fila['tramo']} días"
+            self.stdout.write(f"  {nombre}: {fila['medicamentos']} medicamentos, {fila['lotes']} lotes, {fila['unidades']} unidades")
+        self.stdout.write(self.style.SUCCESS(f"{resultado['alertas_vencimiento']} alertas de vencimiento registradas"))
@@ -0,0 +1,125 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.utils_benchmark import ESCENARIOS, generar_dataset, ejecutar_escenario
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (p50/p95/p99) y número de consultas de los endpoints críticos '
+        'sobre un dataset sintético y compara contra una línea base guardada en JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=int, default=1, help='Factor de escala del dataset sintético')
+        parser.add_argument('--iteraciones', type=int, default=30, help='Peticiones medidas por escenario')
+        parser.add_argument(
+            '--baseline',
+            default=str(Path(settings.BASE_DIR) / 'benchmark_baseline.json'),
+            help='Ruta del archivo JSON con la línea base'
+        )
+        parser.add_argument('--guardar', action='store_true', help='Guardar los resultados como nueva línea base')
+        parser.add_argument(
+            '--tolerancia', type=float, default=15.0,
+            help='Porcentaje de aumento de p95 a partir del cual se marca regresión'
+        )
+        parser.add_argument('--escenario', action='append', default=[], help='Limitar a uno o más escenarios')
+        parser.add_argument(
+            '--bd-actual', action='store_true',
+            help='Usar la base de datos configurada en lugar de crear una base de pruebas temporal'
+        )
+        parser.add_argument(
+            '--fallar-si-regresion', action='store_true',
+            help='Terminar con error si algún escenario empeora (útil en CI)'
+        )
+
+    def handle(self, *args, **options):
+        escenarios = ESCENARIOS
+        if options['escenario']:
+            escenarios = [e for e in ESCENARIOS if e['nombre'] in options['escenario']]
+            if not escenarios:
+                raise CommandError(f"Escenarios desconocidos: {', '.join(options['escenario'])}")
+
+        nombre_bd_original = None
+        if not options['bd_actual']:
+            # Base de datos temporal: el benchmark nunca toca datos reales
+            nombre_bd_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            self.stdout.write(f"Generando dataset (escala {options['escala']}) en {connection.vendor}...")
+            datos = generar_dataset(
+                escala=options['escala'],
+                recetas_pendientes=options['iteraciones'] + 5,
+            )
+
+            resultados = {}
+            for escenario in escenarios:
+                self.stdout.write(f"  Midiendo {escenario['nombre']}...")
+                resultados[escenario['nombre']] = ejecutar_escenario(escenario, datos, options['iteraciones'])
+        finally:
+            if nombre_bd_original is not None:
+                connection.creation.destroy_test_db(nombre_bd_original, verbosity=0)
+
+        ruta_baseline = Path(options['baseline'])
+        baseline = {}
+        if ruta_baseline.exists():
+            baseline = json.loads(ruta_baseline.read_text(encoding='utf-8')).get('escenarios', {})
+
+        regresiones = self.imprimir_comparacion(resultados, baseline, options['tolerancia'])
+
+        if options['guardar']:
+            ruta_baseline.write_text(json.dumps({
+                'meta': {
+                    'fecha': datetime.now().isoformat(timespec='seconds'),
+                    'motor': connection.vendor,
+                    'escala': options['escala'],
+                    'iteraciones': options['iteraciones'],
+                },
+                'escenarios': resultados,
+            }, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {ruta_baseline}'))
+
+        if regresiones and options['fallar_si_regresion']:
+            raise CommandError(f"Regresiones detectadas: {', '.join(regresiones)}")
+
+    def imprimir_comparacion(self, resultados, baseline, tolerancia):
+        """Imprime la tabla comparativa y devuelve los escenarios con regresión"""
+        encabezado = (
+            f"{'Escenario':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'p95 base':>9} {'Δp95 %':>8} {'SQL':>5} {'SQL base':>8}  Estado"
+        )
+        self.stdout.write('')
+        self.stdout.write(encabezado)
+        self.stdout.write('-' * len(encabezado))
+
+        regresiones = []
+        for nombre, actual in resultados.items():
+            base = baseline.get(nombre)
+            if base:
+                delta = ((actual['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100) if base['p95_ms'] else 0.0
+                if delta > tolerancia or actual['consultas'] > base['consultas']:
+                    estado = self.style.ERROR('REGRESIÓN')
+                    regresiones.append(nombre)
+                elif delta < -tolerancia or actual['consultas'] < base['consultas']:
+                    estado = self.style.SUCCESS('MEJORA')
+                else:
+                    estado = 'OK'
+                p95_base, delta_txt, sql_base = f"{base['p95_ms']:.2f}", f'{delta:+.1f}', str(base['consultas'])
+            else:
+                estado, p95_base, delta_txt, sql_base = 'NUEVO', '-', '-', '-'
+
+            if actual['errores']:
+                estado = self.style.ERROR(f"{actual['errores']} ERRORES")
+                regresiones.append(nombre)
+
+            self.stdout.write(
+                f"{nombre:<26} {actual['p50_ms']:>9.2f} {actual['p95_ms']:>9.2f} {actual['p99_ms']:>9.2f} "
+                f"{p95_base:>9} {delta_txt:>8} {actual['consultas']:>5} {sql_base:>8}  {estado}"
+            )
+        return regresiones
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.utils_clasificacion_inventario import clasificar_inventario, matriz_clasificacion, parametros_clasificacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula la clasificación ABC (valor de consumo) y XYZ (variabilidad de la demanda '
+        'mensual) de los medicamentos activos (pensado para ejecutarse cada noche).'
+    )
+
+    def handle(self, *args, **options):
+        total = clasificar_inventario()
+        for fila in matriz_clasificacion():
+            celdas = ', '.join(f"{celda['clase_xyz']}: {celda['medicamentos']}" for celda in fila['celdas'])
+            self.stdout.write(f"  Clase {fila['clase']}: {fila['medicamentos']} medicamentos ({celdas}), S/ {fila['valor_consumo']}")
+        meses = parametros_clasificacion()['meses']
+        self.stdout.write(self.style.SUCCESS(f'{total} medicamentos clasificados con {meses} meses de historial'))
@@ -0,0 +1,40 @@
+import time as time_module
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from core.utils_recordatorios import generar_recordatorios, obtener_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea las notificaciones de recordatorio de las citas próximas que aún no lo '
+        'tienen. Es idempotente: puede ejecutarse desde cron cada pocos minutos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=float,
+                            help='Anticipación en horas (por defecto RECORDATORIOS_ANTICIPACION_HORAS)')
+        parser.add_argument('--lote', type=int, help='Citas por lote (por defecto RECORDATORIOS_LOTE)')
+        parser.add_argument('--backend', help='Ruta de la clase de envío; reemplaza a RECORDATORIOS_BACKEND')
+        parser.add_argument('--sin-envio', action='store_true', help='Solo crear las notificaciones internas')
+
+    def handle(self, *args, **options):
+        try:
+            if options['sin_envio']:
+                backend = None
+            elif options['backend']:
+                backend = import_string(options['backend'])()
+            else:
+                backend = obtener_backend()
+        except ImportError as e:
+            raise CommandError(f'Backend de recordatorios inválido: {e}')
+
+        inicio = time_module.perf_counter()
+        resultado = generar_recordatorios(horas=options['horas'], tamano_lote=options['lote'], backend=backend)
+        duracion = time_module.perf_counter() - inicio
+
+        mensaje = f"{resultado['citas']} recordatorios creados en {duracion:.2f} s"
+        if backend is not None:
+            mensaje += f" ({resultado['entregados']} entregados, {resultado['fallidos']} fallidos)"
+        self.stdout.write(self.style.SUCCESS(mensaje) if not resultado['fallidos'] else self.style.WARNING(mensaje))
@@ -0,0 +1,141 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.utils_benchmark import ESCENARIOS, generar_dataset
+from core.utils_planes import capturar_consultas, analizar_planes
+
+
+class Command(BaseCommand):
+    help = (
+        'Captura el SQL de los reportes y rutas calientes sobre un dataset escalado, ejecuta '
+        'EXPLAIN sobre cada consulta, marca recorridos secuenciales en tablas grandes y propone '
+        'índices. Con --verificar compara contra la línea base guardada; conviene correrlo '
+        'después de cada cambio de esquema.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=int, default=1, help='Factor de escala del dataset sintético')
+        parser.add_argument(
+            '--min-filas', type=int, default=1000,
+            help='Tamaño mínimo de tabla para reportar un recorrido secuencial'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=str(Path(settings.BASE_DIR) / 'planes_baseline.json'),
+            help='Ruta del archivo JSON con los hallazgos de referencia'
+        )
+        parser.add_argument('--guardar', action='store_true', help='Guardar los hallazgos como nueva línea base')
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Comparar contra la línea base y terminar con error si aparecen recorridos nuevos'
+        )
+        parser.add_argument('--escenario', action='append', default=[], help='Limitar a uno o más escenarios')
+        parser.add_argument('--mostrar-plan', action='store_true', help='Incluir el SQL y el plan de cada hallazgo')
+        parser.add_argument(
+            '--bd-actual', action='store_true',
+            help='Usar la base de datos configurada en lugar de crear una base de pruebas temporal'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'EXPLAIN no soportado para {connection.vendor}')
+
+        escenarios = ESCENARIOS
+        if options['escenario']:
+            escenarios = [e for e in ESCENARIOS if e['nombre'] in options['escenario']]
+            if not escenarios:
+                raise CommandError(f"Escenarios desconocidos: {', '.join(options['escenario'])}")
+
+        nombre_bd_original = None
+        if not options['bd_actual']:
+            nombre_bd_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            self.stdout.write(f"Generando dataset (escala {options['escala']}) en {connection.vendor}...")
+            datos = generar_dataset(escala=options['escala'])
+            # Estadísticas actualizadas para que el planificador decida como en producción
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            consultas = capturar_consultas(escenarios, datos)
+            self.stdout.write(f'Consultas distintas capturadas: {len(consultas)}')
+            hallazgos = analizar_planes(consultas, min_filas=options['min_filas'])
+        finally:
+            if nombre_bd_original is not None:
+                connection.creation.destroy_test_db(nombre_bd_original, verbosity=0)
+
+        self.imprimir_hallazgos(hallazgos, options['mostrar_plan'])
+
+        ruta_baseline = Path(options['baseline'])
+        if options['verificar']:
+            self.verificar(hallazgos, ruta_baseline)
+
+        if options['guardar']:
+            ruta_baseline.write_text(json.dumps({
+                'meta': {
+                    'fecha': datetime.now().isoformat(timespec='seconds'),
+                    'motor': connection.vendor,
+                    'escala': options['escala'],
+                    'min_filas': options['min_filas'],
+                },
+                'hallazgos': {
+                    h['clave']: {'escenario': h['escenario'], 'tabla': h['tabla'], 'propuesta': h['propuesta']}
+                    for h in hallazgos
+                },
+            }, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {ruta_baseline}'))
+
+    def imprimir_hallazgos(self, hallazgos, mostrar_plan):
+        if not hallazgos:
+            self.stdout.write(self.style.SUCCESS('Sin recorridos secuenciales sobre tablas grandes'))
+            return
+
+        self.stdout.write('')
+        self.stdout.write(self.style.WARNING(f'Recorridos secuenciales detectados: {len(hallazgos)}'))
+        propuestas = {}
+        for hallazgo in hallazgos:
+            self.stdout.write(
+                f"  [{hallazgo['escenario']}] {hallazgo['tabla']} ({hallazgo['filas']} filas) "
+                f"- consulta {hallazgo['clave'].split(':')[0]}"
+            )
+            if hallazgo['propuesta']:
+                propuestas.setdefault(hallazgo['propuesta'], set()).add(hallazgo['tabla'])
+            else:
+                self.stdout.write('      sin filtro sobre la tabla: recorrido completo esperado')
+            if mostrar_plan:
+                self.stdout.write(f"      SQL: {hallazgo['sql']}")
+                for linea in hallazgo['plan'].splitlines():
+                    self.stdout.write(f'      {linea}')
+
+        if propuestas:
+            self.stdout.write('')
+            self.stdout.write('Índices propuestos (agregar en Meta.indexes y generar la migración):')
+            for propuesta, tablas in sorted(propuestas.items()):
+                self.stdout.write(f"  {', '.join(sorted(tablas))}: {propuesta}")
+
+    def verificar(self, hallazgos, ruta_baseline):
+        """Compara contra la línea base: los recorridos nuevos son regresiones"""
+        baseline = {}
+        if ruta_baseline.exists():
+            baseline = json.loads(ruta_baseline.read_text(encoding='utf-8')).get('hallazgos', {})
+
+        actuales = {h['clave']: h for h in hallazgos}
+        nuevos = [actuales[clave] for clave in actuales if clave not in baseline]
+        resueltos = [clave for clave in baseline if clave not in actuales]
+
+        self.stdout.write('')
+        for clave in resueltos:
+            self.stdout.write(self.style.SUCCESS(f"Resuelto: {clave} ({baseline[clave]['tabla']})"))
+        if nuevos:
+            for hallazgo in nuevos:
+                self.stdout.write(self.style.ERROR(
+                    f"Nuevo recorrido secuencial: [{hallazgo['escenario']}] {hallazgo['tabla']} ({hallazgo['clave']})"
+                ))
+            raise CommandError(f'{len(nuevos)} planes empeoraron respecto a la línea base')
+        self.stdout.write(self.style.SUCCESS('Planes verificados: sin regresiones'))
@@ -0,0 +1,130 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.utils_benchmark import generar_dataset
+from core.utils_carga import (
+    MEZCLA_POR_DEFECTO, preparar_contexto, ejecutar_carga, reiniciar_stock, verificar_consistencia,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera carga concurrente con una mezcla de roles (pacientes reservando, farmacéuticos '
+        'dispensando, administradores en reportes) y reporta rendimiento, latencias y '
+        'violaciones de consistencia (citas solapadas, stock negativo).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Cantidad de hilos concurrentes')
+        parser.add_argument('--duracion', type=int, default=15, help='Duración de la prueba en segundos')
+        parser.add_argument(
+            '--mezcla', default='',
+            help='Pesos por rol, ej: paciente=6,farmaceutico=3,administrador=1'
+        )
+        parser.add_argument(
+            '--url', default='',
+            help='URL de un servidor en ejecución (ej: http://127.0.0.1:8000). '
+                 'Sin este parámetro la carga se ejecuta contra la app WSGI en proceso.'
+        )
+        parser.add_argument('--escala', type=int, default=1, help='Escala del dataset sintético (modo en proceso)')
+        parser.add_argument(
+            '--stock', type=int, default=200,
+            help='Stock inicial de los medicamentos del dataset, bajo para forzar competencia (modo en proceso)'
+        )
+        parser.add_argument(
+            '--bd-actual', action='store_true',
+            help='En modo en proceso, usar la base configurada con sus datos en lugar de una base temporal'
+        )
+        parser.add_argument('--json', action='store_true', help='Imprimir el resultado en formato JSON')
+
+    def handle(self, *args, **options):
+        mezcla = self.parsear_mezcla(options['mezcla']) if options['mezcla'] else MEZCLA_POR_DEFECTO
+        base_temporal = not options['url'] and not options['bd_actual']
+
+        nombre_bd_original = None
+        if base_temporal:
+            nombre_bd_original = connection.settings_dict['NAME']
+            if connection.vendor == 'sqlite':
+                # La base en memoria compartida bloquea tablas entre hilos; se usa un archivo
+                connection.settings_dict['TEST']['NAME'] = str(Path(tempfile.gettempdir()) / 'citame_prueba_carga.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            if base_temporal:
+                generar_dataset(escala=options['escala'])
+                reiniciar_stock(options['stock'])
+
+            contexto = preparar_contexto()
+            faltantes = [perfil for perfil in mezcla if mezcla[perfil] and not contexto['usuarios'].get(perfil)]
+            if faltantes:
+                raise CommandError(f"No hay usuarios para los perfiles: {', '.join(faltantes)}")
+            if not contexto['medicos']:
+                raise CommandError('No hay médicos con disponibilidad en especialidades de acceso directo')
+
+            antes = verificar_consistencia()
+            resultado = ejecutar_carga(
+                contexto,
+                hilos=options['hilos'],
+                duracion=options['duracion'],
+                mezcla=mezcla,
+                url_base=options['url'] or None,
+            )
+            despues = verificar_consistencia()
+        finally:
+            if nombre_bd_original is not None:
+                connection.creation.destroy_test_db(nombre_bd_original, verbosity=0)
+
+        # Solo cuentan las violaciones introducidas durante la prueba
+        resultado['violaciones'] = {clave: despues[clave] - antes[clave] for clave in despues}
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
+        else:
+            self.imprimir_resultado(resultado)
+
+    def parsear_mezcla(self, texto):
+        mezcla = {}
+        for parte in texto.split(','):
+            try:
+                perfil, peso = parte.split('=')
+                mezcla[perfil.strip()] = int(peso)
+            except ValueError:
+                raise CommandError(f'Formato de mezcla inválido: {parte}')
+        desconocidos = set(mezcla) - set(MEZCLA_POR_DEFECTO)
+        if desconocidos:
+            raise CommandError(f"Perfiles desconocidos: {', '.join(desconocidos)}")
+        return mezcla
+
+    def imprimir_resultado(self, resultado):
+        hilos = ', '.join(f'{perfil}={cantidad}' for perfil, cantidad in sorted(resultado['hilos'].items()))
+        self.stdout.write(f"Hilos: {hilos}")
+        self.stdout.write(
+            f"Duración: {resultado['duracion_s']} s | Peticiones: {resultado['peticiones']} | "
+            f"Rendimiento: {resultado['rendimiento_rps']} req/s"
+        )
+        self.stdout.write('')
+        encabezado = f"{'Endpoint':<30} {'Peticiones':>10} {'Errores':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        self.stdout.write(encabezado)
+        self.stdout.write('-' * len(encabezado))
+        for nombre, metricas in resultado['endpoints'].items():
+            self.stdout.write(
+                f"{nombre:<30} {metricas['peticiones']:>10} {metricas['errores']:>8} "
+                f"{metricas['p50_ms']:>9.2f} {metricas['p95_ms']:>9.2f} {metricas['p99_ms']:>9.2f}"
+            )
+
+        for excepcion in resultado['excepciones']:
+            self.stdout.write(self.style.WARNING(f'Hilo interrumpido: {excepcion}'))
+
+        self.stdout.write('')
+        violaciones = resultado['violaciones']
+        if any(violaciones.values()):
+            self.stdout.write(self.style.ERROR('Violaciones de consistencia detectadas:'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin violaciones de consistencia'))
+        self.stdout.write(f"  Citas activas solapadas: {violaciones['citas_solapadas']}")
+        self.stdout.write(f"  Medicamentos con stock negativo: {violaciones['stock_negativo']}")
+        self.stdout.write(f"  Detalles dispensados sobre lo prescrito: {violaciones['sobre_dispensados']}")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import TIPO_NOTIFICACION_CHOICES
+from core.utils_retencion import politicas_retencion, purgar_notificaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Archiva o elimina las notificaciones leídas o inactivas según la política '
+        'NOTIFICACIONES_RETENCION, en lotes pequeños.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, help='Filas por lote (por defecto NOTIFICACIONES_RETENCION_LOTE)')
+        parser.add_argument('--tipo', action='append', choices=[tipo for tipo, _ in TIPO_NOTIFICACION_CHOICES],
+                            help='Procesar solo este tipo (se puede repetir)')
+        parser.add_argument('--pausa', type=float, default=0,
+                            help='Segundos de espera entre lotes para no competir con las peticiones')
+        parser.add_argument('--max-lotes', type=int, help='Detenerse tras esta cantidad de lotes')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar lo que se retiraría')
+
+    def handle(self, *args, **options):
+        try:
+            politicas = politicas_retencion(options['tipo'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for tipo, politica in politicas.items():
+            detalle = 'se conservan' if politica['accion'] == 'conservar' else f"{politica['accion']} tras {politica['dias']} días"
+            self.stdout.write(f'  {tipo}: {detalle}')
+
+        resultado = purgar_notificaciones(
+            tamano_lote=options['lote'],
+            tipos=options['tipo'],
+            pausa=options['pausa'],
+            max_lotes=options['max_lotes'],
+            simular=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(
+                f"Se archivarían {resultado['archivadas']} y se eliminarían {resultado['eliminadas']} notificaciones"
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['archivadas']} notificaciones archivadas y {resultado['eliminadas']} eliminadas "
+            f"en {resultado['lotes']} lotes"
+        ))
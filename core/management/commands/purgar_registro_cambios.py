@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.utils_sincronizacion import purgar_registro_cambios
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina las entradas antiguas del registro de cambios de sincronización. '
+        'Los clientes con una marca anterior recibirán una sincronización completa.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Antigüedad mínima (por defecto SINCRONIZACION_RETENCION_DIAS)')
+
+    def handle(self, *args, **options):
+        eliminadas = purgar_registro_cambios(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f'{eliminadas} entradas del registro de cambios eliminadas'))
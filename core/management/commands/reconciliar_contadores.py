@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from core.models import Notificacion, ContadorNotificaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula los contadores de notificaciones no leídas desde la tabla de '
+        'notificaciones y corrige los que se hayan desviado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo informar las diferencias, sin corregirlas')
+
+    def handle(self, *args, **options):
+        reales = dict(
+            Notificacion.objects.filter(leido=False).activas()
+            .values('usuario_id').annotate(total=Count('id')).order_by()
+            .values_list('usuario_id', 'total')
+        )
+        guardados = dict(ContadorNotificaciones.objects.values_list('usuario_id', 'no_leidas'))
+
+        corregir, crear = [], []
+        for usuario_id in set(reales) | set(guardados):
+            real = reales.get(usuario_id, 0)
+            if usuario_id not in guardados:
+                crear.append(ContadorNotificaciones(usuario_id=usuario_id, no_leidas=real))
+            elif guardados[usuario_id] != real:
+                self.stdout.write(f'Usuario {usuario_id}: contador {guardados[usuario_id]}, real {real}')
+                corregir.append(ContadorNotificaciones(usuario_id=usuario_id, no_leidas=real))
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(corregir)} contadores desviados y {len(crear)} faltantes (sin cambios)')
+            return
+
+        with transaction.atomic():
+            ContadorNotificaciones.objects.bulk_update(corregir, ['no_leidas'], batch_size=1000)
+            ContadorNotificaciones.objects.bulk_create(crear, batch_size=1000, ignore_conflicts=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(corregir)} contadores corregidos y {len(crear)} creados'
+        ))
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.utils_snapshots import tomar_snapshot, verificar_consistencia
+
+
+class Command(BaseCommand):
+    help = (
+        'Registra el saldo y la valorización de cierre de cada medicamento '
+        '(pensado para ejecutarse cada noche; por defecto cierra el día de ayer).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', type=date.fromisoformat, help='Día a cerrar (AAAA-MM-DD)')
+        parser.add_argument('--verificar', action='store_true',
+                            help='Antes del snapshot, informar los medicamentos cuyo stock no cuadra con el historial')
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            desvios = verificar_consistencia()
+            for desvio in desvios:
+                self.stdout.write(self.style.WARNING(
+                    f"{desvio['codigo']} {desvio['nombre']}: stock {desvio['stock_actual']}, "
+                    f"según movimientos {desvio['esperado']} ({desvio['diferencia']:+d})"
+                ))
+            self.stdout.write(f'{len(desvios)} medicamentos con desvío')
+
+        total = tomar_snapshot(options['fecha'])
+        self.stdout.write(self.style.SUCCESS(f'{total} snapshots de inventario registrados'))
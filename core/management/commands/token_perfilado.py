@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Usuario
+from core.utils_perfilado import MODOS_PERFILADO, generar_token
+
+
+class Command(BaseCommand):
+    help = 'Genera un token firmado para perfilar peticiones de un usuario staff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usuario', help='Nombre de usuario (debe ser staff)')
+        parser.add_argument('--modo', choices=MODOS_PERFILADO, default='cprofile',
+                            help='cprofile (determinista, .prof) o pyinstrument (muestreo, HTML)')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = Usuario.objects.get(username=options['usuario'])
+        except Usuario.DoesNotExist:
+            raise CommandError(f"El usuario {options['usuario']} no existe")
+        if not usuario.is_staff:
+            raise CommandError('Solo los usuarios staff pueden perfilar peticiones')
+
+        token = generar_token(usuario, options['modo'])
+        vigencia = getattr(settings, 'PERFILADO_TOKEN_VIGENCIA', 3600)
+        self.stdout.write(token)
+        self.stderr.write(
+            f'Válido por {vigencia} s. Usar como ?_perfil=<token> o cabecera X-Perfil-Token.'
+        )
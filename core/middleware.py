@@ -0,0 +1,45 @@
+import logging
+
+from django.urls import reverse
+
+from .utils_perfilado import validar_token, cupo_disponible, perfilar
+
+logger = logging.getLogger(__name__)
+
+
+class PerfiladoMiddleware:
+    """
+    Perfila la petición cuando un usuario staff envía un token de perfilado
+    válido (parámetro ``_perfil`` o cabecera ``X-Perfil-Token``).
+
+    Debe ubicarse después de AuthenticationMiddleware. El archivo generado se
+    informa en la cabecera ``X-Perfil-Archivo`` con su URL de descarga.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.GET.get('_perfil') or request.headers.get('X-Perfil-Token')
+        if not token:
+            return self.get_response(request)
+
+        usuario = getattr(request, 'user', None)
+        if not usuario or not usuario.is_authenticated or not usuario.is_staff:
+            return self.get_response(request)
+
+        modo = validar_token(token, usuario)
+        if modo is None:
+            logger.warning('Token de perfilado inválido para el usuario %s', usuario.pk)
+            return self.get_response(request)
+
+        if not cupo_disponible():
+            logger.warning('Tope de perfiles por hora alcanzado; %s no se perfila', request.path)
+            respuesta = self.get_response(request)
+            respuesta['X-Perfil-Archivo'] = 'tope-alcanzado'
+            return respuesta
+
+        respuesta, nombre = perfilar(request, self.get_response, modo)
+        logger.info('Perfil %s generado para %s', nombre, request.path)
+        respuesta['X-Perfil-Archivo'] = reverse('descargar_perfil', args=[nombre])
+        return respuesta
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_movimientoinventario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['medico', 'fecha', 'estado'], name='cita_medico_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha', 'estado'], name='cita_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='derivacion',
+            index=models.Index(fields=['paciente', 'estado', 'fecha_derivacion'], name='deriv_paciente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leido', 'fecha_envio'], name='notif_usuario_leido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(condition=models.Q(('leido', False)), fields=['usuario', 'fecha_envio'], name='notif_no_leidas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recetamedica',
+            index=models.Index(fields=['estado', 'fecha_prescripcion'], name='receta_estado_fecha_idx'),
+        ),
+    ]
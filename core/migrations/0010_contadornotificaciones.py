@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_contadores(apps, schema_editor):
+    """Calcula el contador inicial con el mismo criterio que NotificacionQuerySet.activas()"""
+    Notificacion = apps.get_model('core', 'Notificacion')
+    Cita = apps.get_model('core', 'Cita')
+    ContadorNotificaciones = apps.get_model('core', 'ContadorNotificaciones')
+
+    es_de_cita = models.Q(objeto_relacionado='cita', objeto_id__isnull=False)
+    cita_vigente = models.Exists(Cita.objects.filter(pk=models.OuterRef('objeto_id')).exclude(estado='atendida'))
+    conteos = (
+        Notificacion.objects.filter(leido=False).filter(~es_de_cita | cita_vigente)
+        .values('usuario_id').annotate(total=models.Count('id')).order_by()
+    )
+    ContadorNotificaciones.objects.bulk_create(
+        [ContadorNotificaciones(usuario_id=fila['usuario_id'], no_leidas=fila['total']) for fila in conteos],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificaciones',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificaciones', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('no_leidas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Notificaciones',
+                'verbose_name_plural': 'Contadores de Notificaciones',
+            },
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
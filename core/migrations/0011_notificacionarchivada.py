@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_contadornotificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notificacion_id', models.PositiveIntegerField(help_text='ID que tenía en la tabla de notificaciones')),
+                ('mensaje', models.TextField()),
+                ('tipo', models.CharField(choices=[('confirmacion', 'Confirmación'), ('recordatorio', 'Recordatorio'), ('cancelacion', 'Cancelación'), ('advertencia', 'Advertencia'), ('informacion', 'Información')], max_length=15)),
+                ('importante', models.BooleanField(default=False)),
+                ('objeto_relacionado', models.CharField(blank=True, max_length=50, null=True)),
+                ('objeto_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('fecha_envio', models.DateTimeField()),
+                ('fecha_lectura', models.DateTimeField(blank=True, null=True)),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_archivadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación Archivada',
+                'verbose_name_plural': 'Notificaciones Archivadas',
+                'indexes': [models.Index(fields=['usuario', 'fecha_envio'], name='notif_arch_usuario_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_notificacionarchivada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='cantidad',
+            field=models.PositiveIntegerField(default=1, help_text='Cantidad de eventos agrupados'),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='clave_agrupacion',
+            field=models.CharField(blank=True, help_text='Clave del resumen y ventana a la que pertenece', max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='elementos',
+            field=models.JSONField(blank=True, default=list, help_text='Últimos eventos agrupados'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacion',
+            constraint=models.UniqueConstraint(condition=models.Q(('clave_agrupacion__isnull', False), ('leido', False)), fields=('usuario', 'clave_agrupacion'), name='notif_resumen_abierto_uniq'),
+        ),
+    ]
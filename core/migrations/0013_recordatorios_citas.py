@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_notificaciones_agrupadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='recordatorio_enviado',
+            field=models.DateTimeField(blank=True, help_text='Momento en que se generó el recordatorio (evita duplicados)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'confirmada']), ('recordatorio_enviado__isnull', True)), fields=['fecha', 'hora_inicio'], name='cita_pendiente_recordar_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recordatorios_citas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='derivacion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='RegistroCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=20)),
+                ('objeto_id', models.PositiveIntegerField()),
+                ('operacion', models.CharField(choices=[('cambio', 'Alta o modificación'), ('baja', 'Eliminación')], default='cambio', max_length=10)),
+                ('usuario_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('paciente_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Registro de Cambio',
+                'verbose_name_plural': 'Registro de Cambios',
+                'indexes': [models.Index(fields=['usuario_id', 'id'], name='cambio_usuario_idx'), models.Index(fields=['paciente_id', 'id'], name='cambio_paciente_idx'), models.Index(fields=['fecha'], name='cambio_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def crear_lotes_iniciales(apps, schema_editor):
+    """El stock existente pasa a un lote inicial con el vencimiento registrado en el medicamento"""
+    Medicamento = apps.get_model('core', 'Medicamento')
+    LoteMedicamento = apps.get_model('core', 'LoteMedicamento')
+
+    LoteMedicamento.objects.bulk_create([
+        LoteMedicamento(
+            medicamento_id=medicamento_id, numero_lote='INICIAL',
+            fecha_vencimiento=fecha_vencimiento, cantidad=stock_actual,
+        )
+        for medicamento_id, fecha_vencimiento, stock_actual in Medicamento.objects.filter(
+            stock_actual__gt=0
+        ).values_list('id', 'fecha_vencimiento', 'stock_actual').iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_registro_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteMedicamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_lote', models.CharField(help_text='Número de lote del fabricante', max_length=50)),
+                ('fecha_vencimiento', models.DateField()),
+                ('cantidad', models.IntegerField(default=0, help_text='Unidades disponibles del lote')),
+                ('fecha_ingreso', models.DateTimeField(auto_now_add=True)),
+                ('medicamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lotes', to='core.medicamento')),
+            ],
+            options={
+                'verbose_name': 'Lote de Medicamento',
+                'verbose_name_plural': 'Lotes de Medicamentos',
+                'ordering': ['fecha_vencimiento', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='movimientoinventario',
+            name='lote',
+            field=models.ForeignKey(blank=True, help_text='Lote afectado, si el stock tenía lote', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='core.lotemedicamento'),
+        ),
+        migrations.AddIndex(
+            model_name='lotemedicamento',
+            index=models.Index(condition=models.Q(('cantidad__gt', 0)), fields=['medicamento', 'fecha_vencimiento'], name='lote_fefo_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lotemedicamento',
+            constraint=models.UniqueConstraint(fields=('medicamento', 'numero_lote'), name='lote_medicamento_numero_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='lotemedicamento',
+            constraint=models.CheckConstraint(condition=models.Q(('cantidad__gte', 0)), name='lote_cantidad_no_negativa'),
+        ),
+        migrations.RunPython(crear_lotes_iniciales, migrations.RunPython.noop),
+    ]
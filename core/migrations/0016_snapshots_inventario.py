@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_lotes_medicamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Día cuyo cierre se registra')),
+                ('corte', models.DateTimeField(help_text='Instante del cierre: los movimientos posteriores no están incluidos')),
+                ('stock', models.IntegerField(help_text='Stock al cierre del día')),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valor', models.DecimalField(decimal_places=2, help_text='stock x precio_unitario', max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Inventario',
+                'verbose_name_plural': 'Snapshots de Inventario',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['medicamento', 'fecha_movimiento'], name='mov_inv_medicamento_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='snapshotinventario',
+            name='medicamento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='core.medicamento'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotinventario',
+            index=models.Index(fields=['fecha'], name='snapshot_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotinventario',
+            constraint=models.UniqueConstraint(fields=('medicamento', 'fecha'), name='snapshot_medicamento_fecha_uniq'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:14
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Copia de core.utils_busqueda_medicamentos al momento de esta migración: la
+# migración no debe cambiar si el módulo cambia o se elimina
+CAMPOS_BUSQUEDA = ('codigo', 'nombre_comercial', 'nombre_generico', 'concentracion', 'laboratorio')
+LARGO_TEXTO_BUSQUEDA = 500
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+
+def texto_busqueda(medicamento):
+    texto = ' '.join(getattr(medicamento, campo) or '' for campo in CAMPOS_BUSQUEDA)
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return _NO_ALFANUMERICO.sub(' ', texto.lower()).strip()[:LARGO_TEXTO_BUSQUEDA]
+
+
+def poblar_texto_busqueda(apps, schema_editor):
+    Medicamento = apps.get_model('core', 'Medicamento')
+    medicamentos = list(Medicamento.objects.all())
+    for medicamento in medicamentos:
+        medicamento.texto_busqueda = texto_busqueda(medicamento)
+    Medicamento.objects.bulk_update(medicamentos, ['texto_busqueda'], batch_size=1000)
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    """Índice GIN de trigramas para LIKE '%...%' sobre texto_busqueda (solo PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS medicamento_busqueda_trgm_idx '
+        'ON core_medicamento USING gin (texto_busqueda gin_trgm_ops)'
+    )
+
+
+def eliminar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS medicamento_busqueda_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_snapshots_inventario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicamento',
+            name='texto_busqueda',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.RunPython(poblar_texto_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trigramas, eliminar_indice_trigramas),
+    ]
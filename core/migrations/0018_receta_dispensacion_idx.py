@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_busqueda_medicamentos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recetamedica',
+            index=models.Index(fields=['estado', 'fecha_dispensacion'], name='receta_estado_dispensacion_idx'),
+        ),
+    ]
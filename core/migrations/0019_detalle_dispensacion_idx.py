@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_receta_dispensacion_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detallereceta',
+            index=models.Index(fields=['fecha_dispensacion', 'medicamento'], name='detalle_dispensacion_idx'),
+        ),
+    ]
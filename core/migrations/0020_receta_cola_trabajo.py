@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:23
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def poblar_fecha_limite(apps, schema_editor):
+    RecetaMedica = apps.get_model('core', 'RecetaMedica')
+    recetas = list(RecetaMedica.objects.only('id', 'fecha_prescripcion', 'vigencia_dias'))
+    for receta in recetas:
+        receta.fecha_limite = receta.fecha_prescripcion + timedelta(days=receta.vigencia_dias or 0)
+    RecetaMedica.objects.bulk_update(recetas, ['fecha_limite'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_detalle_dispensacion_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recetamedica',
+            name='fecha_limite',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Fin de la vigencia: fecha de prescripción + vigencia_dias', null=True),
+        ),
+        migrations.AddField(
+            model_name='recetamedica',
+            name='tomada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recetamedica',
+            name='tomada_por',
+            field=models.ForeignKey(blank=True, help_text='Farmacéutico que está atendiendo la receta', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recetas_tomadas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(poblar_fecha_limite, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recetamedica',
+            index=models.Index(condition=models.Q(('estado', 'pendiente')), fields=['-urgente', 'fecha_limite', 'fecha_prescripcion', 'id'], name='receta_cola_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_receta_cola_trabajo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaVencimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_vencimiento', models.DateField()),
+                ('cantidad', models.IntegerField(help_text='Unidades del lote al momento del cálculo')),
+                ('tramo', models.PositiveSmallIntegerField(help_text='0 = vencido; si no, días del tramo')),
+                ('calculado_en', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Alerta de Vencimiento',
+                'verbose_name_plural': 'Alertas de Vencimiento',
+                'ordering': ['fecha_vencimiento', 'id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='recetamedica',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('dispensada', 'Dispensada'), ('parcial', 'Parcialmente Dispensada'), ('cancelada', 'Cancelada'), ('vencida', 'Vencida')], default='pendiente', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='recetamedica',
+            index=models.Index(fields=['estado', 'fecha_limite'], name='receta_estado_limite_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertavencimiento',
+            name='lote',
+            field=models.ForeignKey(blank=True, help_text='Vacío para el stock sin lote (vence en Medicamento.fecha_vencimiento)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alertas_vencimiento', to='core.lotemedicamento'),
+        ),
+        migrations.AddField(
+            model_name='alertavencimiento',
+            name='medicamento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_vencimiento', to='core.medicamento'),
+        ),
+        migrations.AddIndex(
+            model_name='alertavencimiento',
+            index=models.Index(fields=['tramo', 'fecha_vencimiento'], name='alerta_venc_tramo_idx'),
+        ),
+    ]
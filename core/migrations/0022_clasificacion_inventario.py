@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_vencimientos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClasificacionInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clase_abc', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1)),
+                ('clase_xyz', models.CharField(choices=[('X', 'X'), ('Y', 'Y'), ('Z', 'Z')], max_length=1)),
+                ('unidades_consumidas', models.IntegerField(help_text='Unidades dispensadas en el período')),
+                ('valor_consumo', models.DecimalField(decimal_places=2, help_text='Unidades dispensadas x precio unitario', max_digits=14)),
+                ('participacion_acumulada', models.FloatField(help_text='Fracción acumulada del valor de consumo (orden ABC)')),
+                ('coeficiente_variacion', models.FloatField(blank=True, help_text='Desviación / media de la demanda mensual; vacío sin consumo', null=True)),
+                ('valor_inventario', models.DecimalField(decimal_places=2, help_text='stock x precio unitario', max_digits=14)),
+                ('calculado_en', models.DateTimeField()),
+                ('medicamento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='clasificacion', to='core.medicamento')),
+            ],
+            options={
+                'verbose_name': 'Clasificación de Inventario',
+                'verbose_name_plural': 'Clasificaciones de Inventario',
+                'indexes': [models.Index(fields=['clase_abc', 'clase_xyz'], name='clasificacion_clase_idx'), models.Index(fields=['-valor_consumo'], name='clasificacion_valor_idx')],
+            },
+        ),
+    ]
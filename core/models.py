@@ -66,6 +66,7 @@ ESTADO_RECETA_CHOICES = (
     ('dispensada', 'Dispensada'),
     ('parcial', 'Parcialmente Dispensada'),
     ('cancelada', 'Cancelada'),
+    ('vencida', 'Vencida'),
 )
 
 FORMA_FARMACEUTICA_CHOICES = (
@@ -205,6 +206,7 @@ class Derivacion(models.Model):
     vigencia_dias = models.PositiveIntegerField(default=30)
     estado = models.CharField(max_length=15, choices=ESTADO_DERIVACION_CHOICES, default='pendiente')
     cita_agendada = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Derivación de {self.paciente} a {self.especialidad_destino.nombre}"
@@ -217,6 +219,9 @@ class Derivacion(models.Model):
     class Meta:
         verbose_name = 'Derivación'
         verbose_name_plural = 'Derivaciones'
+        indexes = [
+            models.Index(fields=['paciente', 'estado', 'fecha_derivacion'], name='deriv_paciente_estado_idx'),
+        ]
 
 class TratamientoProgramado(models.Model):
     paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='tratamientos')
@@ -340,6 +345,15 @@ class Cita(models.Model):
     tratamiento = models.ForeignKey(TratamientoProgramado, on_delete=models.SET_NULL, null=True, blank=True, related_name='citas')
     reservado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='citas_reservadas')
     derivacion = models.ForeignKey(Derivacion, on_delete=models.SET_NULL, null=True, blank=True, related_name='citas')
+    recordatorio_enviado = models.DateTimeField(null=True, blank=True, help_text="Momento en que se generó el recordatorio (evita duplicados)")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Estado leído de la BD, para que las señales detecten el paso a 'atendida'
+        instancia._estado_original = instancia.__dict__.get('estado')
+        return instancia
     
     def __str__(self):
         return f"Cita: {self.paciente} con {self.medico} - {self.fecha.strftime('%d/%m/%Y')} {self.hora_inicio.strftime('%H:%M')}"
@@ -348,6 +362,13 @@ class Cita(models.Model):
         verbose_name = 'Cita'
         verbose_name_plural = 'Citas'
         ordering = ['fecha', 'hora_inicio']
+        indexes = [
+            models.Index(fields=['medico', 'fecha', 'estado'], name='cita_medico_fecha_estado_idx'),
+            models.Index(fields=['fecha', 'estado'], name='cita_fecha_estado_idx'),
+            # Índice parcial: enviar_recordatorios solo recorre citas vigentes aún sin recordar
+            models.Index(fields=['fecha', 'hora_inicio'], name='cita_pendiente_recordar_idx',
+                         condition=models.Q(recordatorio_enviado__isnull=True, estado__in=['pendiente', 'confirmada'])),
+        ]
 
 
 class DatosAntropometricos(models.Model):
@@ -393,6 +414,40 @@ class DatosAntropometricos(models.Model):
     def __str__(self):
         return f"Datos de {self.paciente} - {self.fecha_registro.strftime('%d/%m/%Y')}"
 
+class NotificacionQuerySet(models.QuerySet):
+    def _filtro_cita_vigente(self):
+        """
+        Condiciones SQL para distinguir las notificaciones de citas cuya cita
+        sigue vigente (existe y no fue atendida), sin consultar cita por cita
+        """
+        es_de_cita = models.Q(objeto_relacionado='cita', objeto_id__isnull=False)
+        cita_vigente = models.Exists(
+            Cita.objects.filter(pk=models.OuterRef('objeto_id')).exclude(estado='atendida')
+        )
+        return es_de_cita, cita_vigente
+
+    def activas(self):
+        """
+        Excluye las notificaciones de citas atendidas o inexistentes y ordena
+        con las no leídas primero y luego por fecha de envío (más recientes primero)
+        """
+        es_de_cita, cita_vigente = self._filtro_cita_vigente()
+        return self.filter(~es_de_cita | cita_vigente).order_by('leido', '-fecha_envio')
+
+    def inactivas(self):
+        """Notificaciones de citas atendidas o que ya no existen"""
+        es_de_cita, cita_vigente = self._filtro_cita_vigente()
+        return self.filter(es_de_cita & ~cita_vigente)
+
+    def activas_para(self, usuario):
+        return self.filter(usuario=usuario).activas()
+
+    def depurables(self):
+        """Notificaciones que ya no suman al contador: leídas o de citas atendidas o inexistentes"""
+        es_de_cita, cita_vigente = self._filtro_cita_vigente()
+        return self.filter(models.Q(leido=True) | (es_de_cita & ~cita_vigente))
+
+
 class Notificacion(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='notificaciones')
     mensaje = models.TextField()
@@ -404,6 +459,26 @@ class Notificacion(models.Model):
     objeto_relacionado = models.CharField(max_length=50, blank=True, null=True, help_text="Tipo de objeto relacionado (ej: 'cita', 'derivacion')")
     objeto_id = models.PositiveIntegerField(blank=True, null=True, help_text="ID del objeto relacionado")
     fecha_lectura = models.DateTimeField(null=True, blank=True)
+    # Resúmenes (ver crear_notificaciones_agrupadas): eventos del mismo tipo en una ventana de tiempo
+    clave_agrupacion = models.CharField(max_length=100, blank=True, null=True, help_text="Clave del resumen y ventana a la que pertenece")
+    cantidad = models.PositiveIntegerField(default=1, help_text="Cantidad de eventos agrupados")
+    elementos = models.JSONField(default=list, blank=True, help_text="Últimos eventos agrupados")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = NotificacionQuerySet.as_manager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Valor leído de la BD, para que las señales detecten cambios de lectura
+        instancia._leido_original = instancia.__dict__.get('leido')
+        return instancia
+    
+    def es_activa(self):
+        """Mismo criterio que NotificacionQuerySet.activas() para una sola instancia"""
+        if self.objeto_relacionado != 'cita' or self.objeto_id is None:
+            return True
+        return Cita.objects.filter(pk=self.objeto_id).exclude(estado='atendida').exists()
     
     def __str__(self):
         return f"Notificación para {self.usuario}: {self.mensaje[:30]}..."
@@ -429,6 +504,94 @@ class Notificacion(models.Model):
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
         ordering = ['-fecha_envio']
+        indexes = [
+            models.Index(fields=['usuario', 'leido', 'fecha_envio'], name='notif_usuario_leido_idx'),
+            # Índice parcial: el contador y la lista de no leídas solo tocan estas filas
+            models.Index(fields=['usuario', 'fecha_envio'], condition=models.Q(leido=False),
+                         name='notif_no_leidas_idx'),
+        ]
+        constraints = [
+            # Un solo resumen abierto (no leído) por usuario y clave: permite el upsert
+            models.UniqueConstraint(fields=['usuario', 'clave_agrupacion'],
+                                    condition=models.Q(leido=False, clave_agrupacion__isnull=False),
+                                    name='notif_resumen_abierto_uniq'),
+        ]
+
+
+class ContadorNotificaciones(models.Model):
+    """
+    Cantidad de notificaciones activas no leídas por usuario, mantenida por
+    las señales de core/signals.py para que el contador cueste una consulta
+    por clave primaria. Si la fila no existe se recalcula al leerla.
+    """
+    usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='contador_notificaciones')
+    no_leidas = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.usuario}: {self.no_leidas} no leídas"
+    
+    class Meta:
+        verbose_name = 'Contador de Notificaciones'
+        verbose_name_plural = 'Contadores de Notificaciones'
+
+
+class RegistroCambio(models.Model):
+    """
+    Registro de altas, cambios y bajas de los modelos que sincronizan los
+    clientes (ver core/utils_sincronizacion.py). El id es la marca de agua:
+    un cliente pide los cambios con id mayor al último que recibió.
+    """
+    OPERACION_CHOICES = (
+        ('cambio', 'Alta o modificación'),
+        ('baja', 'Eliminación'),
+    )
+    modelo = models.CharField(max_length=20)
+    objeto_id = models.PositiveIntegerField()
+    operacion = models.CharField(max_length=10, choices=OPERACION_CHOICES, default='cambio')
+    # Dueños del objeto sin clave foránea: las bajas deben sobrevivir al objeto
+    usuario_id = models.PositiveIntegerField(null=True, blank=True)
+    paciente_id = models.PositiveIntegerField(null=True, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.operacion} {self.modelo} #{self.objeto_id}"
+    
+    class Meta:
+        verbose_name = 'Registro de Cambio'
+        verbose_name_plural = 'Registro de Cambios'
+        indexes = [
+            models.Index(fields=['usuario_id', 'id'], name='cambio_usuario_idx'),
+            models.Index(fields=['paciente_id', 'id'], name='cambio_paciente_idx'),
+            models.Index(fields=['fecha'], name='cambio_fecha_idx'),
+        ]
+
+
+class NotificacionArchivada(models.Model):
+    """
+    Copia compacta de notificaciones retiradas de la tabla principal por
+    ``purgar_notificaciones``. Las vistas de usuario no la consultan.
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='notificaciones_archivadas')
+    notificacion_id = models.PositiveIntegerField(help_text="ID que tenía en la tabla de notificaciones")
+    mensaje = models.TextField()
+    tipo = models.CharField(max_length=15, choices=TIPO_NOTIFICACION_CHOICES)
+    importante = models.BooleanField(default=False)
+    objeto_relacionado = models.CharField(max_length=50, blank=True, null=True)
+    objeto_id = models.PositiveIntegerField(blank=True, null=True)
+    fecha_envio = models.DateTimeField()
+    fecha_lectura = models.DateTimeField(null=True, blank=True)
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Notificación archivada para {self.usuario}: {self.mensaje[:30]}..."
+    
+    class Meta:
+        verbose_name = 'Notificación Archivada'
+        verbose_name_plural = 'Notificaciones Archivadas'
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_envio'], name='notif_arch_usuario_fecha_idx'),
+        ]
 
 
 # === MODELOS DE FARMACIA ===
@@ -450,6 +613,9 @@ class Medicamento(models.Model):
     fecha_vencimiento = models.DateField(help_text="Fecha de vencimiento del lote actual")
     fecha_ingreso = models.DateField(auto_now_add=True)
     
+    # Búsqueda: código, nombres, concentración y laboratorio normalizados (ver utils_busqueda_medicamentos)
+    texto_busqueda = models.CharField(max_length=500, blank=True, default='', editable=False)
+    
     # Control
     activo = models.BooleanField(default=True)
     requiere_receta = models.BooleanField(default=True, help_text="Si requiere prescripción médica")
@@ -459,6 +625,16 @@ class Medicamento(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def save(self, *args, **kwargs):
+        from .utils_busqueda_medicamentos import texto_busqueda
+        texto = texto_busqueda(self)
+        # La señal post_save solo invalida el índice de búsqueda si el texto cambió
+        self._busqueda_modificada = texto != self.texto_busqueda
+        self.texto_busqueda = texto
+        if kwargs.get('update_fields') is not None and self._busqueda_modificada:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'texto_busqueda'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.nombre_comercial} ({self.nombre_generico}) - {self.concentracion}"
     
@@ -489,6 +665,68 @@ class Medicamento(models.Model):
         ordering = ['nombre_comercial']
 
 
+class LoteMedicamento(models.Model):
+    """
+    Existencias de un lote concreto. ``Medicamento.stock_actual`` es la suma
+    desnormalizada de los lotes más el stock sin lote (ajustes y cargas antiguas),
+    y ``Medicamento.fecha_vencimiento`` el vencimiento más próximo con existencias.
+    """
+    medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='lotes')
+    numero_lote = models.CharField(max_length=50, help_text="Número de lote del fabricante")
+    fecha_vencimiento = models.DateField()
+    cantidad = models.IntegerField(default=0, help_text="Unidades disponibles del lote")
+    fecha_ingreso = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.medicamento.codigo} | {self.numero_lote} ({self.cantidad})"
+
+    def vencido(self):
+        from datetime import date
+        return self.fecha_vencimiento < date.today()
+
+    class Meta:
+        verbose_name = 'Lote de Medicamento'
+        verbose_name_plural = 'Lotes de Medicamentos'
+        ordering = ['fecha_vencimiento', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['medicamento', 'numero_lote'], name='lote_medicamento_numero_uniq'),
+            models.CheckConstraint(condition=models.Q(cantidad__gte=0), name='lote_cantidad_no_negativa'),
+        ]
+        indexes = [
+            # Asignación FEFO: lotes con existencias de un medicamento por vencimiento
+            models.Index(fields=['medicamento', 'fecha_vencimiento'], condition=models.Q(cantidad__gt=0),
+                         name='lote_fefo_idx'),
+        ]
+
+
+class AlertaVencimiento(models.Model):
+    """
+    Lotes con existencias vencidos o que vencen dentro del mayor de los
+    FARMACIA_TRAMOS_VENCIMIENTO días. Tabla precalculada por el comando
+    ``barrer_vencimientos``; ``tramo`` es 0 para los vencidos o el primer tramo
+    (7, 30, 90...) que contiene la fecha de vencimiento.
+    """
+    medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='alertas_vencimiento')
+    lote = models.ForeignKey(LoteMedicamento, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='alertas_vencimiento',
+                             help_text="Vacío para el stock sin lote (vence en Medicamento.fecha_vencimiento)")
+    fecha_vencimiento = models.DateField()
+    cantidad = models.IntegerField(help_text="Unidades del lote al momento del cálculo")
+    tramo = models.PositiveSmallIntegerField(help_text="0 = vencido; si no, días del tramo")
+    calculado_en = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.lote or self.medicamento} - tramo {self.tramo}"
+
+    class Meta:
+        verbose_name = 'Alerta de Vencimiento'
+        verbose_name_plural = 'Alertas de Vencimiento'
+        ordering = ['fecha_vencimiento', 'id']
+        indexes = [
+            models.Index(fields=['tramo', 'fecha_vencimiento'], name='alerta_venc_tramo_idx'),
+        ]
+
+
 class RecetaMedica(models.Model):
     # Vinculación con sistemas existentes
     cita = models.ForeignKey(Cita, on_delete=models.CASCADE, null=True, blank=True, related_name='recetas')
@@ -513,6 +751,14 @@ class RecetaMedica(models.Model):
     vigencia_dias = models.IntegerField(default=30, help_text="Días de vigencia de la receta")
     urgente = models.BooleanField(default=False, help_text="Si es una receta urgente")
     
+    # Cola de trabajo de farmacia (core/utils_cola_recetas.py)
+    fecha_limite = models.DateTimeField(null=True, blank=True, editable=False,
+                                        help_text="Fin de la vigencia: fecha de prescripción + vigencia_dias")
+    tomada_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='recetas_tomadas',
+                                   help_text="Farmacéutico que está atendiendo la receta")
+    tomada_en = models.DateTimeField(null=True, blank=True)
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -522,18 +768,22 @@ class RecetaMedica(models.Model):
             # Generar código único
             import uuid
             self.codigo_receta = f"RX-{str(uuid.uuid4())[:8].upper()}"
+        from datetime import timedelta
+        # Al crearla, fecha_prescripcion (auto_now_add) toma la hora actual
+        inicio = timezone.now() if self._state.adding or not self.fecha_prescripcion else self.fecha_prescripcion
+        self.fecha_limite = inicio + timedelta(days=self.vigencia_dias or 0)
+        if 'update_fields' in kwargs and kwargs['update_fields'] is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'fecha_limite'}
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"Receta {self.codigo_receta} - {self.paciente} ({self.fecha_prescripcion.strftime('%d/%m/%Y')})"
     
     def esta_vigente(self):
-        """Verifica si la receta está vigente"""
-        from datetime import timedelta
-        if self.fecha_prescripcion and self.vigencia_dias:
-            fecha_vencimiento = self.fecha_prescripcion.date() + timedelta(days=self.vigencia_dias)
-            return fecha_vencimiento >= timezone.now().date()
-        return False
+        """Verifica si la receta está vigente (mismo criterio que el filtro SQL sobre fecha_limite)"""
+        if self.estado == 'vencida' or not self.fecha_limite or not self.vigencia_dias:
+            return False
+        return self.fecha_limite >= timezone.now()
     
     def puede_dispensarse(self):
         """Verifica si la receta puede ser dispensada"""
@@ -560,6 +810,15 @@ class RecetaMedica(models.Model):
         verbose_name = 'Receta Médica'
         verbose_name_plural = 'Recetas Médicas'
         ordering = ['-fecha_prescripcion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_prescripcion'], name='receta_estado_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_dispensacion'], name='receta_estado_dispensacion_idx'),
+            # Cola de trabajo: recorrido por cursor en el orden de prioridad
+            models.Index(fields=['-urgente', 'fecha_limite', 'fecha_prescripcion', 'id'],
+                         condition=models.Q(estado='pendiente'), name='receta_cola_idx'),
+            # Barrido de recetas vencidas (barrer_vencimientos)
+            models.Index(fields=['estado', 'fecha_limite'], name='receta_estado_limite_idx'),
+        ]
 
 
 class DetalleReceta(models.Model):
@@ -594,35 +853,21 @@ class DetalleReceta(models.Model):
     
     def dispensar(self, cantidad, lote=""):
         """Registra la dispensación del medicamento"""
-        if cantidad <= self.medicamento.stock_actual:
-            self.cantidad_dispensada += cantidad
-            self.fecha_dispensacion = timezone.now()
-            if lote:
-                self.lote_dispensado = lote
-            self.save()
-            
-            # Actualizar stock del medicamento
-            self.medicamento.stock_actual -= cantidad
-            self.medicamento.save()
-            
-            # Registrar movimiento de inventario
-            MovimientoInventario.objects.create(
-                medicamento=self.medicamento,
-                tipo_movimiento='salida',
-                cantidad=cantidad,
-                motivo=f'Dispensación receta {self.receta.codigo_receta}',
-                usuario=self.receta.farmaceutico if self.receta.farmaceutico else None,
-                lote_referencia=lote,
-                stock_anterior=self.medicamento.stock_actual + cantidad,
-                stock_nuevo=self.medicamento.stock_actual
-            )
-            
-            return True
-        return False
+        from .utils_inventario import StockInsuficiente, dispensar_detalles
+
+        try:
+            dispensar_detalles(self.receta, [(self, cantidad, lote)])
+        except StockInsuficiente:
+            return False
+        return True
     
     class Meta:
         verbose_name = 'Detalle de Receta'
         verbose_name_plural = 'Detalles de Recetas'
+        indexes = [
+            # Consumo diario por medicamento (pronóstico de reposición, estadísticas)
+            models.Index(fields=['fecha_dispensacion', 'medicamento'], name='detalle_dispensacion_idx'),
+        ]
 
 
 class MovimientoInventario(models.Model):
@@ -647,6 +892,8 @@ class MovimientoInventario(models.Model):
     
     # Referencias adicionales
     lote_referencia = models.CharField(max_length=50, blank=True, help_text="Lote involucrado")
+    lote = models.ForeignKey(LoteMedicamento, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='movimientos', help_text="Lote afectado, si el stock tenía lote")
     proveedor = models.CharField(max_length=200, blank=True, help_text="Proveedor en caso de entrada")
     precio_unitario_momento = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True,
                                                    help_text="Precio unitario al momento del movimiento")
@@ -675,6 +922,63 @@ class MovimientoInventario(models.Model):
         verbose_name = 'Movimiento de Inventario'
         verbose_name_plural = 'Movimientos de Inventario'
         ordering = ['-fecha_movimiento']
+        indexes = [
+            # Reconstrucción del stock a una fecha: movimientos de un medicamento entre dos cortes
+            models.Index(fields=['medicamento', 'fecha_movimiento'], name='mov_inv_medicamento_fecha_idx'),
+        ]
+
+
+class SnapshotInventario(models.Model):
+    """Saldo de cierre de un medicamento al final de un día (ver utils_snapshots)"""
+    medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='snapshots')
+    fecha = models.DateField(help_text="Día cuyo cierre se registra")
+    corte = models.DateTimeField(help_text="Instante del cierre: los movimientos posteriores no están incluidos")
+    stock = models.IntegerField(help_text="Stock al cierre del día")
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    valor = models.DecimalField(max_digits=14, decimal_places=2, help_text="stock x precio_unitario")
+    created_at = models.DateTimeField(auto_now_add=True)
 
+    def __str__(self):
+        return f"{self.medicamento_id} | {self.fecha} | {self.stock}"
 
+    class Meta:
+        verbose_name = 'Snapshot de Inventario'
+        verbose_name_plural = 'Snapshots de Inventario'
+        constraints = [
+            models.UniqueConstraint(fields=['medicamento', 'fecha'], name='snapshot_medicamento_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='snapshot_fecha_idx'),
+        ]
+
+
+class ClasificacionInventario(models.Model):
+    """
+    Clase ABC (valor de consumo) y XYZ (variabilidad de la demanda) de un
+    medicamento en los últimos 12 meses (ver utils_clasificacion_inventario)
+    """
+    CLASES_ABC = [('A', 'A'), ('B', 'B'), ('C', 'C')]
+    CLASES_XYZ = [('X', 'X'), ('Y', 'Y'), ('Z', 'Z')]
+
+    medicamento = models.OneToOneField(Medicamento, on_delete=models.CASCADE, related_name='clasificacion')
+    clase_abc = models.CharField(max_length=1, choices=CLASES_ABC)
+    clase_xyz = models.CharField(max_length=1, choices=CLASES_XYZ)
+    unidades_consumidas = models.IntegerField(help_text="Unidades dispensadas en el período")
+    valor_consumo = models.DecimalField(max_digits=14, decimal_places=2,
+                                        help_text="Unidades dispensadas x precio unitario")
+    participacion_acumulada = models.FloatField(help_text="Fracción acumulada del valor de consumo (orden ABC)")
+    coeficiente_variacion = models.FloatField(null=True, blank=True,
+                                              help_text="Desviación / media de la demanda mensual; vacío sin consumo")
+    valor_inventario = models.DecimalField(max_digits=14, decimal_places=2, help_text="stock x precio unitario")
+    calculado_en = models.DateTimeField()
 
+    def __str__(self):
+        return f"{self.medicamento_id} | {self.clase_abc}{self.clase_xyz}"
+
+    class Meta:
+        verbose_name = 'Clasificación de Inventario'
+        verbose_name_plural = 'Clasificaciones de Inventario'
+        indexes = [
+            models.Index(fields=['clase_abc', 'clase_xyz'], name='clasificacion_clase_idx'),
+            models.Index(fields=['-valor_consumo'], name='clasificacion_valor_idx'),
+        ]
@@ -0,0 +1,130 @@
+"""
+Señales que mantienen ContadorNotificaciones, el registro de cambios de
+sincronización (RegistroCambio), la caché de catálogos, el índice de
+búsqueda de medicamentos y las estadísticas de farmacia al día.
+
+Cubren las operaciones por instancia (save/delete). Las operaciones masivas
+con QuerySet.update() o bulk_create no disparan señales: quien las use debe
+llamar a ``ajustar_contadores`` y ``registrar_cambios`` explícitamente (ver
+marcar_notificaciones_leidas y crear_notificaciones_masivas).
+"""
+from collections import Counter
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Notificacion, Cita, Derivacion, RecetaMedica, Especialidad, Consultorio, Rol, Medicamento
+from .utils_catalogos import invalidar_catalogo
+from .utils_busqueda_medicamentos import invalidar_indice
+from .utils_estadisticas_farmacia import invalidar_estadisticas
+from .utils_notificaciones import ajustar_contadores
+from .utils_sincronizacion import cambio_para, registrar_cambios
+
+
+@receiver(post_save, sender=Notificacion)
+def actualizar_contador_al_guardar(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    leido_original = None if created else getattr(instance, '_leido_original', None)
+    if created:
+        delta = 0 if instance.leido else 1
+    elif leido_original is None or leido_original == instance.leido:
+        delta = 0
+    else:
+        delta = -1 if instance.leido else 1
+    instance._leido_original = instance.leido
+
+    if delta and instance.es_activa():
+        ajustar_contadores({instance.usuario_id: delta})
+
+
+@receiver(post_delete, sender=Notificacion)
+def actualizar_contador_al_eliminar(sender, instance, **kwargs):
+    if not instance.leido and instance.es_activa():
+        ajustar_contadores({instance.usuario_id: -1})
+
+
+def _no_leidas_por_usuario(cita_id):
+    return Counter(
+        Notificacion.objects.filter(
+            objeto_relacionado='cita', objeto_id=cita_id, leido=False
+        ).values_list('usuario_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Cita)
+def actualizar_contadores_al_atender_cita(sender, instance, created, raw=False, **kwargs):
+    """Las notificaciones de una cita atendida dejan de contar (y vuelven a contar si se revierte)"""
+    estado_original = getattr(instance, '_estado_original', None)
+    instance._estado_original = instance.estado
+    if created or raw or estado_original is None:
+        return
+    era_atendida, es_atendida = estado_original == 'atendida', instance.estado == 'atendida'
+    if era_atendida == es_atendida:
+        return
+    signo = -1 if es_atendida else 1
+    ajustar_contadores({
+        usuario_id: signo * cantidad for usuario_id, cantidad in _no_leidas_por_usuario(instance.pk).items()
+    })
+    _registrar_notificaciones_de_cita(instance.pk)
+
+
+@receiver(post_delete, sender=Cita)
+def actualizar_contadores_al_eliminar_cita(sender, instance, **kwargs):
+    if instance.estado == 'atendida':
+        return
+    ajustar_contadores({
+        usuario_id: -cantidad for usuario_id, cantidad in _no_leidas_por_usuario(instance.pk).items()
+    })
+    _registrar_notificaciones_de_cita(instance.pk)
+
+
+def _registrar_notificaciones_de_cita(cita_id):
+    """Sus notificaciones entran o salen de activas(): la sincronización las vuelve a evaluar"""
+    registrar_cambios(
+        Notificacion.objects.filter(objeto_relacionado='cita', objeto_id=cita_id).only('pk', 'usuario_id')
+    )
+
+
+@receiver(post_save, sender=Cita)
+@receiver(post_save, sender=Notificacion)
+@receiver(post_save, sender=Derivacion)
+@receiver(post_save, sender=RecetaMedica)
+def registrar_cambio_sincronizado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cambio_para(instance).save()
+
+
+@receiver(post_delete, sender=Cita)
+@receiver(post_delete, sender=Notificacion)
+@receiver(post_delete, sender=Derivacion)
+@receiver(post_delete, sender=RecetaMedica)
+def registrar_baja_sincronizada(sender, instance, **kwargs):
+    cambio_para(instance, 'baja').save()
+
+
+@receiver(post_save, sender=Especialidad)
+@receiver(post_delete, sender=Especialidad)
+@receiver(post_save, sender=Consultorio)
+@receiver(post_delete, sender=Consultorio)
+@receiver(post_save, sender=Rol)
+@receiver(post_delete, sender=Rol)
+def invalidar_catalogo_modificado(sender, **kwargs):
+    invalidar_catalogo(sender.__name__.lower())
+
+
+@receiver(post_save, sender=Medicamento)
+def invalidar_busqueda_medicamento_guardado(sender, instance, **kwargs):
+    if getattr(instance, '_busqueda_modificada', True):
+        invalidar_indice()
+
+
+@receiver(post_delete, sender=Medicamento)
+def invalidar_busqueda_medicamento_eliminado(sender, **kwargs):
+    invalidar_indice()
+
+
+@receiver(post_save, sender=RecetaMedica)
+@receiver(post_delete, sender=RecetaMedica)
+def invalidar_estadisticas_farmacia(sender, **kwargs):
+    invalidar_estadisticas()
@@ -0,0 +1,11 @@
+import pytest
+
+from core.utils_catalogos import limpiar_catalogos
+
+
+@pytest.fixture(autouse=True)
+def catalogos_vacios():
+    """Los catálogos en memoria no se enteran del rollback entre pruebas"""
+    limpiar_catalogos()
+    yield
+    limpiar_catalogos()
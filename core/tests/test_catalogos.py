@@ -0,0 +1,57 @@
+import pytest
+from core.models import Especialidad, Rol
+from core.utils_catalogos import catalogo, especialidades, roles
+
+
+@pytest.mark.django_db
+def test_catalogo_en_memoria_se_invalida_con_senales(django_assert_num_queries, settings):
+    settings.CATALOGOS_REVISION_SEGUNDOS = 60
+    cardiologia = Especialidad.objects.create(nombre='Cardiología')
+    Especialidad.objects.create(nombre='Anestesiología')
+    Rol.objects.create(nombre='Admisión')
+
+    with django_assert_num_queries(1):
+        assert [e.nombre for e in especialidades()] == ['Anestesiología', 'Cardiología']
+        assert especialidades().obtener(str(cardiologia.pk)) is especialidades().por_nombre['cardiología']
+    with pytest.raises(Especialidad.DoesNotExist):
+        especialidades().obtener(999)
+    assert roles().buscar('admisi').nombre == 'Admisión'
+
+    cardiologia.nombre = 'Cardiología Clínica'
+    cardiologia.save()
+    with django_assert_num_queries(1):
+        assert especialidades().obtener(cardiologia.pk).nombre == 'Cardiología Clínica'
+        assert catalogo('especialidad') is especialidades()
+
+    # Otro worker cambió la versión compartida: se recarga al vencer la revisión
+    from django.core.cache import cache
+    settings.CATALOGOS_REVISION_SEGUNDOS = 0
+    cache.set('catalogos:version:especialidad', 'otro-worker')
+    with django_assert_num_queries(1):
+        especialidades()
+    with django_assert_num_queries(0):
+        especialidades()
+
+
+@pytest.mark.django_db
+def test_busqueda_medicamentos_sin_tildes_y_ordenada():
+    from core.models import Medicamento
+    from core.utils_busqueda_medicamentos import buscar_medicamentos
+
+    def crear(codigo, comercial, generico, stock=10, laboratorio='Genfar'):
+        return Medicamento.objects.create(
+            codigo=codigo, nombre_comercial=comercial, nombre_generico=generico, concentracion='5mg',
+            laboratorio=laboratorio, stock_actual=stock, precio_unitario=1, fecha_vencimiento='2030-01-01',
+        )
+
+    folico = crear('M1', 'Ácido Fólico', 'Ácido fólico')
+    crear('M2', 'Folivit', 'Ácido fólico', laboratorio='Bayer')
+    crear('M3', 'Fólico Max', 'Ácido fólico', stock=0)
+    assert [m.codigo for m in buscar_medicamentos('acido fol')] == ['M1', 'M2']
+    assert [m.codigo for m in buscar_medicamentos('FOLI')] == ['M2', 'M1']
+    assert [m.codigo for m in buscar_medicamentos('bayer')] == ['M2']
+    assert [m.codigo for m in buscar_medicamentos('lico max', solo_con_stock=False)] == ['M3']
+
+    folico.laboratorio = 'Medifarma'
+    folico.save()
+    assert [m.codigo for m in buscar_medicamentos('medif')] == ['M1']
@@ -0,0 +1,366 @@
+import pytest
+from core.models import Medicamento, MovimientoInventario
+from core.utils_inventario import StockInsuficiente, aplicar_movimientos, ajustar_stock
+
+
+def _medicamento(codigo, stock):
+    return Medicamento.objects.create(
+        codigo=codigo,
+        nombre_generico='Paracetamol',
+        nombre_comercial=f'Panadol {codigo}',
+        concentracion='500mg',
+        forma_farmaceutica='tableta',
+        laboratorio='GSK',
+        stock_actual=stock,
+        stock_minimo=2,
+        precio_unitario=1.5,
+        fecha_vencimiento='2030-01-01',
+    )
+
+
+def _receta(codigo, **campos):
+    from django.contrib.auth import get_user_model
+    from core.models import Especialidad, Medico, Paciente, RecetaMedica
+
+    User = get_user_model()
+    paciente = Paciente.objects.first() or Paciente.objects.create(
+        usuario=User.objects.create_user(username='pac', password='x', dni='20000001')
+    )
+    medico = Medico.objects.first() or Medico.objects.create(
+        usuario=User.objects.create_user(username='med', password='x', dni='20000002'),
+        cmp='CMP9', especialidad=Especialidad.objects.create(nombre='General'),
+    )
+    return RecetaMedica.objects.create(codigo_receta=codigo, paciente=paciente, medico=medico, **campos)
+
+
+@pytest.mark.django_db
+def test_aplicar_movimientos_registra_stock_anterior_y_nuevo():
+    primero, segundo = _medicamento('INV001', 10), _medicamento('INV002', 4)
+    movimientos = aplicar_movimientos([
+        {'medicamento': segundo, 'tipo_movimiento': 'salida', 'cantidad': 4, 'motivo': 'x'},
+        {'medicamento': primero, 'tipo_movimiento': 'salida', 'cantidad': 3, 'motivo': 'x'},
+        {'medicamento': primero, 'tipo_movimiento': 'entrada', 'cantidad': 5, 'motivo': 'x'},
+    ])
+    assert [(m.stock_anterior, m.stock_nuevo) for m in movimientos] == [(4, 0), (10, 7), (7, 12)]
+    assert MovimientoInventario.objects.count() == 3
+    primero.refresh_from_db()
+    segundo.refresh_from_db()
+    assert (primero.stock_actual, segundo.stock_actual) == (12, 0)
+
+
+@pytest.mark.django_db
+def test_stock_insuficiente_revierte_todas_las_lineas():
+    primero, segundo = _medicamento('INV003', 10), _medicamento('INV004', 1)
+    with pytest.raises(StockInsuficiente):
+        aplicar_movimientos([
+            {'medicamento': primero, 'tipo_movimiento': 'salida', 'cantidad': 5, 'motivo': 'x'},
+            {'medicamento': segundo, 'tipo_movimiento': 'salida', 'cantidad': 2, 'motivo': 'x'},
+        ])
+    with pytest.raises(StockInsuficiente):
+        ajustar_stock(primero, 11, positivo=False)
+    assert list(Medicamento.objects.order_by('codigo').values_list('stock_actual', flat=True)) == [10, 1]
+    assert not MovimientoInventario.objects.exists()
+
+
+@pytest.mark.django_db
+def test_salida_fefo_reparte_entre_lotes_y_omite_vencidos():
+    from datetime import date, timedelta
+    from core.models import LoteMedicamento
+    from core.utils_inventario import registrar_entrada
+
+    medicamento = _medicamento('INV005', 0)
+    hoy = date.today()
+    registrar_entrada(medicamento, 5, numero_lote='B', fecha_vencimiento=hoy + timedelta(days=90))
+    registrar_entrada(medicamento, 3, numero_lote='A', fecha_vencimiento=hoy + timedelta(days=30))
+    registrar_entrada(medicamento, 4, numero_lote='V', fecha_vencimiento=hoy - timedelta(days=1))
+
+    movimientos = aplicar_movimientos([
+        {'medicamento': medicamento, 'tipo_movimiento': 'salida', 'cantidad': 6, 'motivo': 'x'},
+    ])
+    assert [(m.lote_referencia, m.cantidad, m.stock_anterior, m.stock_nuevo) for m in movimientos] == [
+        ('A', 3, 12, 9), ('B', 3, 9, 6),
+    ]
+    assert dict(LoteMedicamento.objects.values_list('numero_lote', 'cantidad')) == {'A': 0, 'B': 2, 'V': 4}
+    # Solo quedan 2 unidades vigentes: el vencido no se dispensa
+    with pytest.raises(StockInsuficiente):
+        aplicar_movimientos([{'medicamento': medicamento, 'tipo_movimiento': 'salida', 'cantidad': 3, 'motivo': 'x'}])
+    medicamento.refresh_from_db()
+    assert medicamento.stock_actual == 6
+    assert medicamento.fecha_vencimiento == hoy - timedelta(days=1)
+
+
+@pytest.mark.django_db
+def test_snapshot_reconstruye_stock_y_detecta_desvios():
+    from datetime import datetime, time, timedelta
+    from django.utils import timezone
+    from core.utils_snapshots import stock_en_fecha, tomar_snapshot, verificar_consistencia
+
+    medicamento = _medicamento('INV006', 0)
+    Medicamento.objects.filter(pk=medicamento.pk).update(created_at=timezone.now() - timedelta(days=10))
+    hoy = timezone.localdate()
+    for dias, tipo, cantidad in ((3, 'entrada', 10), (2, 'salida', 4), (0, 'salida', 1)):
+        movimiento, = aplicar_movimientos([
+            {'medicamento': medicamento, 'tipo_movimiento': tipo, 'cantidad': cantidad, 'motivo': 'x'},
+        ])
+        MovimientoInventario.objects.filter(pk=movimiento.pk).update(
+            fecha_movimiento=timezone.make_aware(datetime.combine(hoy - timedelta(days=dias), time(12)))
+        )
+
+    assert tomar_snapshot(hoy - timedelta(days=2)) == 1
+    medicamento.refresh_from_db()
+    assert medicamento.snapshots.get().stock == 6
+    assert stock_en_fecha(medicamento, hoy - timedelta(days=3))['stock'] == 10
+    assert stock_en_fecha(medicamento, hoy - timedelta(days=2))['movimientos'] == 0
+    assert stock_en_fecha(medicamento, hoy - timedelta(days=1))['stock'] == 6
+    assert verificar_consistencia() == []
+
+    Medicamento.objects.filter(pk=medicamento.pk).update(stock_actual=7)
+    desvio, = verificar_consistencia()
+    assert (desvio['esperado'], desvio['diferencia']) == (5, 2)
+
+
+@pytest.mark.django_db
+def test_estadisticas_farmacia_en_cache_hasta_un_movimiento(settings, django_assert_num_queries):
+    from django.utils import timezone
+    from core.utils_estadisticas_farmacia import resumen_farmacia, series_dispensaciones
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.FARMACIA_SERIE_DIAS = (7, 30)
+    medicamento = _medicamento('INV007', 5)
+
+    series = series_dispensaciones()
+    assert [len(series[7]), len(series[30])] == [7, 30]
+    assert series[7][-1] == (timezone.localdate(), 0)
+    assert resumen_farmacia()['medicamentos_stock_critico'] == 0
+    with django_assert_num_queries(0):
+        resumen_farmacia()
+
+    aplicar_movimientos([{'medicamento': medicamento, 'tipo_movimiento': 'salida', 'cantidad': 4, 'motivo': 'x'}])
+    assert resumen_farmacia()['medicamentos_stock_critico'] == 1
+
+
+@pytest.mark.django_db
+def test_reposicion_calcula_cobertura_y_ordena_por_urgencia(settings):
+    from datetime import datetime, time, timedelta
+    from django.utils import timezone
+    from core.models import DetalleReceta
+    from core.utils_reposicion import pronostico_reposicion
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.REPOSICION_DIAS_HISTORIAL = 10
+    settings.REPOSICION_TIEMPO_ENTREGA_DIAS = 5
+    settings.REPOSICION_DIAS_COBERTURA = 10
+    receta = _receta('REP-1')
+    rapido, lento, quieto = _medicamento('REP001', 20), _medicamento('REP002', 100), _medicamento('REP003', 50)
+    hoy = timezone.localdate()
+    # 4 unidades diarias del primero y 1 diaria del segundo durante los 10 días
+    for dias in range(10):
+        fecha = timezone.make_aware(datetime.combine(hoy - timedelta(days=dias), time(10)))
+        for medicamento, cantidad in ((rapido, 4), (lento, 1)):
+            DetalleReceta.objects.create(
+                receta=receta, medicamento=medicamento, cantidad_prescrita=cantidad, cantidad_dispensada=cantidad,
+                dosis='1', frecuencia='1', duracion_dias=1, fecha_dispensacion=fecha,
+            )
+
+    filas = pronostico_reposicion()
+    assert [fila['codigo'] for fila in filas] == ['REP001', 'REP002', 'REP003']
+    primero, segundo, tercero = filas
+    assert (primero['demanda_diaria'], primero['dias_cobertura'], primero['estado']) == (4.0, 5.0, 'reponer')
+    # Demanda constante: sin stock de seguridad; cubrir 5 + 10 días a 4 diarias
+    assert (primero['punto_reorden'], primero['cantidad_sugerida']) == (20, 40)
+    assert primero['fecha_agotamiento'] == hoy + timedelta(days=5)
+    assert (segundo['dias_cobertura'], segundo['estado'], segundo['cantidad_sugerida']) == (100.0, 'normal', 0)
+    assert (tercero['dias_cobertura'], tercero['fecha_agotamiento'], tercero['estado']) == (None, None, 'normal')
+    assert [fila['codigo'] for fila in pronostico_reposicion('cobertura')] == ['REP001', 'REP002', 'REP003']
+    assert [fila['codigo'] for fila in pronostico_reposicion(estados=['normal'])] == ['REP002', 'REP003']
+
+
+@pytest.mark.django_db
+def test_entrada_masiva_guarda_en_sesion_solo_la_referencia_de_la_guia(client, settings):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.urls import reverse
+    from core.models import LoteMedicamento, Rol, Usuario
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    client.force_login(Usuario.objects.create_user(
+        username='far', password='x', dni='20000009', rol=Rol.objects.create(nombre='Farmacéutico'),
+    ))
+    _medicamento('GUI003', 0)
+    url = reverse('entrada_masiva_medicamentos')
+    guia = 'codigo;cantidad;lote;vencimiento\nGUI003;7;B1;2031-06-30\n'
+
+    respuesta = client.post(url, {'guia': SimpleUploadedFile('guia.csv', guia.encode())})
+    assert [linea['numero'] for linea in respuesta.context['resultado']['lineas']] == [2]
+    referencia = client.session['guia_ingreso']
+    assert 'GUI003' not in referencia
+
+    respuesta = client.post(url, {'accion': 'aplicar'})
+    assert respuesta.status_code == 302
+    assert LoteMedicamento.objects.get(numero_lote='B1').cantidad == 7
+    assert 'guia_ingreso' not in client.session
+    # La guía ya registrada no se puede volver a aplicar
+    client.post(url, {'accion': 'aplicar'})
+    assert LoteMedicamento.objects.get(numero_lote='B1').cantidad == 7
+
+
+@pytest.mark.django_db
+def test_reposicion_sin_fecha_de_agotamiento_con_cobertura_muy_larga(settings):
+    from datetime import datetime, time
+    from django.utils import timezone
+    from core.models import DetalleReceta
+    from core.utils_reposicion import HORIZONTE_AGOTAMIENTO_DIAS, pronostico_reposicion
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.REPOSICION_DIAS_HISTORIAL = 90
+    # Una unidad en 90 días con 100 millones en stock: ~9000 millones de días de cobertura
+    medicamento = _medicamento('REP004', 100_000_000)
+    DetalleReceta.objects.create(
+        receta=_receta('REP-2'), medicamento=medicamento, cantidad_prescrita=1, cantidad_dispensada=1,
+        dosis='1', frecuencia='1', duracion_dias=1,
+        fecha_dispensacion=timezone.make_aware(datetime.combine(timezone.localdate(), time(10))),
+    )
+
+    fila, = pronostico_reposicion()
+    assert fila['dias_cobertura'] > HORIZONTE_AGOTAMIENTO_DIAS
+    assert (fila['fecha_agotamiento'], fila['estado']) == (None, 'normal')
+
+
+@pytest.mark.django_db
+def test_guia_valida_por_linea_y_aplica_en_bloque(django_assert_max_num_queries):
+    from core.models import LoteMedicamento
+    from core.utils_inventario import registrar_entrada
+    from core.utils_ingreso_masivo import aplicar_guia, validar_guia
+
+    primero, segundo = _medicamento('GUI001', 0), _medicamento('GUI002', 5)
+    registrar_entrada(segundo, 2, numero_lote='L1', fecha_vencimiento='2031-01-01')
+    guia = (
+        'codigo;cantidad;lote;vencimiento;precio_unitario\n'
+        'GUI001;10;A1;2031-06-30;2,50\n'
+        'GUI002;3;L1;01/01/2031;\n'
+        'GUI001;5;A1;2031-06-30;\n'
+        'NOEXISTE;1;;;\n'
+        'GUI002;cero;;;\n'
+        'GUI002;4;L1;2032-01-01;\n'
+        'GUI001;2;A1;2032-01-01;\n'
+    )
+    resultado = validar_guia(guia)
+    assert resultado['errores'] == [
+        (5, 'Medicamento no encontrado'),
+        (6, 'Cantidad inválida: cero'),
+        (7, 'El lote L1 ya existe con vencimiento 01/01/2031'),
+        (8, 'El lote A1 figura en la línea 2 con vencimiento 30/06/2031'),
+    ]
+    assert [(l['numero'], l['lote_nuevo'], l['stock_anterior'], l['stock_nuevo']) for l in resultado['lineas']] == [
+        (2, True, 0, 10), (3, False, 7, 10), (4, True, 10, 15),
+    ]
+    # Validar no modifica nada
+    assert MovimientoInventario.objects.count() == 1
+
+    with django_assert_max_num_queries(12):
+        movimientos = aplicar_guia(resultado['lineas'], proveedor='Droguería X', numero_factura='F001-1')
+    assert [(m.stock_anterior, m.stock_nuevo, m.lote.numero_lote) for m in movimientos] == [
+        (0, 10, 'A1'), (7, 10, 'L1'), (10, 15, 'A1'),
+    ]
+    assert dict(LoteMedicamento.objects.values_list('numero_lote', 'cantidad')) == {'A1': 15, 'L1': 5}
+    primero.refresh_from_db()
+    segundo.refresh_from_db()
+    assert (primero.stock_actual, str(primero.precio_unitario), str(primero.fecha_vencimiento)) == (15, '2.50', '2031-06-30')
+    assert (segundo.stock_actual, str(segundo.precio_unitario)) == (10, '1.50')
+
+
+@pytest.mark.django_db
+def test_barrido_vence_recetas_y_agrupa_lotes_por_tramo():
+    from datetime import timedelta
+    from django.utils import timezone
+    from core.models import RecetaMedica, RegistroCambio
+    from core.utils_inventario import registrar_entrada
+    from core.utils_sincronizacion import marca_actual
+    from core.utils_vencimientos import barrer_vencimientos, medicamentos_por_vencer, resumen_vencimientos
+
+    vigente, vencida = _receta('VEN-1'), _receta('VEN-2')
+    RecetaMedica.objects.filter(pk=vencida.pk).update(fecha_limite=timezone.now() - timedelta(hours=1))
+    RecetaMedica.objects.filter(pk=vigente.pk).update(fecha_limite=None)
+    hoy = timezone.localdate()
+    medicamento = _medicamento('VEN001', 0)
+    for numero, dias in (('A', -2), ('B', 5), ('C', 20), ('D', 60), ('E', 200)):
+        registrar_entrada(medicamento, 10, numero_lote=numero, fecha_vencimiento=hoy + timedelta(days=dias))
+
+    marca = marca_actual()
+    assert barrer_vencimientos() == {'fechas_completadas': 1, 'recetas_vencidas': 1, 'alertas_vencimiento': 4}
+    assert dict(RecetaMedica.objects.values_list('codigo_receta', 'estado')) == {'VEN-1': 'pendiente', 'VEN-2': 'vencida'}
+    # La vencida queda en el registro de cambios para los clientes que sincronizan
+    assert list(RegistroCambio.objects.filter(pk__gt=marca, modelo='receta').values_list(
+        'objeto_id', 'paciente_id')) == [(vencida.pk, vencida.paciente_id)]
+    assert not RecetaMedica.objects.get(pk=vencida.pk).esta_vigente()
+    assert [(fila['tramo'], fila['lotes']) for fila in resumen_vencimientos()] == [(0, 1), (7, 1), (30, 1), (90, 1)]
+    fila, = medicamentos_por_vencer(30, incluir_vencidos=False)
+    assert (fila['vencimiento'], fila['unidades']) == (hoy + timedelta(days=5), 20)
+
+
+@pytest.mark.django_db
+def test_vencer_recetas_por_lotes_en_transacciones_separadas(monkeypatch):
+    from datetime import timedelta
+    from django.utils import timezone
+    from core import utils_vencimientos
+    from core.models import RecetaMedica
+
+    monkeypatch.setattr(utils_vencimientos, 'TAMANO_LOTE', 2)
+    recetas = [_receta(f'LOT-{i}') for i in range(5)]
+    RecetaMedica.objects.update(fecha_limite=timezone.now() - timedelta(hours=1))
+    lotes = []
+    vencer_lote = utils_vencimientos._vencer_lote
+    monkeypatch.setattr(utils_vencimientos, '_vencer_lote', lambda *args: lotes.append(vencer_lote(*args)) or lotes[-1])
+
+    assert utils_vencimientos.vencer_recetas() == len(recetas)
+    assert [[pk for pk, _ in lote] for lote in lotes] == [
+        [recetas[0].pk, recetas[1].pk], [recetas[2].pk, recetas[3].pk], [recetas[4].pk], [],
+    ]
+    assert set(RecetaMedica.objects.values_list('estado', flat=True)) == {'vencida'}
+
+
+@pytest.mark.django_db
+def test_clasificacion_abc_xyz_por_valor_y_variabilidad_mensual(settings):
+    from datetime import date, datetime, time
+    from django.utils import timezone
+    from core.models import ClasificacionInventario, DetalleReceta
+    from core.utils_clasificacion_inventario import clasificar_inventario, matriz_clasificacion
+
+    settings.INVENTARIO_CLASIFICACION_MESES = 3
+    receta = _receta('ABC-1')
+    caro, variable, esporadico, quieto = (
+        _medicamento('ABC001', 10), _medicamento('ABC002', 4), _medicamento('ABC003', 0), _medicamento('ABC004', 8),
+    )
+    Medicamento.objects.filter(pk=caro.pk).update(precio_unitario=10)
+    Medicamento.objects.filter(pk=variable.pk).update(precio_unitario=2)
+    # Abril a junio; las dispensaciones de julio (mes en curso) no cuentan
+    consumo = {caro: (100, 100, 100, 500), variable: (10, 40, 40, 0), esporadico: (10, 0, 0, 0)}
+    for medicamento, cantidades in consumo.items():
+        for mes, cantidad in zip((4, 5, 6, 7), cantidades):
+            if cantidad:
+                DetalleReceta.objects.create(
+                    receta=receta, medicamento=medicamento, cantidad_prescrita=cantidad, cantidad_dispensada=cantidad,
+                    dosis='1', frecuencia='1', duracion_dias=1,
+                    fecha_dispensacion=timezone.make_aware(datetime.combine(date(2026, mes, 15), time(10))),
+                )
+
+    assert clasificar_inventario(hasta=date(2026, 7, 20)) == 4
+    filas = {
+        fila.medicamento_id: fila for fila in ClasificacionInventario.objects.all()
+    }
+    # 3000 + 180 + 15: el caro acumula el 94%, el variable cruza el 95% y el esporádico queda en C
+    assert [filas[m.pk].clase_abc + filas[m.pk].clase_xyz for m in (caro, variable, esporadico, quieto)] == [
+        'AX', 'BY', 'CZ', 'CZ',
+    ]
+    assert (filas[caro.pk].unidades_consumidas, str(filas[caro.pk].valor_consumo)) == (300, '3000.00')
+    assert str(filas[caro.pk].valor_inventario) == '100.00'
+    assert filas[variable.pk].coeficiente_variacion == pytest.approx(0.5774, abs=1e-4)
+    assert filas[quieto.pk].coeficiente_variacion is None
+    assert [fila['medicamentos'] for fila in matriz_clasificacion()] == [1, 1, 2]
+
+    Medicamento.objects.filter(pk=quieto.pk).update(activo=False)
+    clasificar_inventario(hasta=date(2026, 7, 20))
+    assert not ClasificacionInventario.objects.filter(medicamento=quieto).exists()
+    assert list(
+        Medicamento.objects.filter(clasificacion__clase_abc__in=['A', 'B']).order_by('-clasificacion__valor_consumo')
+        .values_list('codigo', flat=True)
+    ) == ['ABC001', 'ABC002']
@@ -0,0 +1,275 @@
+import pytest
+from datetime import date, time
+from django.urls import reverse
+from django.utils import timezone
+from core.models import Usuario, Paciente, Especialidad, Medico, Consultorio, Cita, Notificacion
+from core.templatetags.notification_filters import filter_notificaciones_activas
+
+
+@pytest.fixture
+def escenario_citas(db):
+    paciente = Paciente.objects.create(usuario=Usuario.objects.create_user(username='pac', password='x', dni='10000001'))
+    medico = Medico.objects.create(
+        usuario=Usuario.objects.create_user(username='med', password='x', dni='10000002'),
+        cmp='CMP1', especialidad=Especialidad.objects.create(nombre='Medicina General'),
+    )
+    consultorio = Consultorio.objects.create(codigo='C1', piso='1', area='Consulta')
+
+    def crear_cita(estado):
+        return Cita.objects.create(
+            paciente=paciente, medico=medico, consultorio=consultorio, fecha=date.today(),
+            hora_inicio=time(9, 0), hora_fin=time(9, 30), estado=estado, motivo='Control',
+        )
+    return paciente.usuario, crear_cita
+
+
+@pytest.mark.django_db
+def test_activas_excluye_citas_atendidas_en_una_consulta(escenario_citas, django_assert_num_queries):
+    usuario, crear_cita = escenario_citas
+    atendida, pendiente = crear_cita('atendida'), crear_cita('pendiente')
+    crear = lambda **datos: Notificacion.objects.create(usuario=usuario, mensaje='m', tipo='informacion', **datos)
+    crear(objeto_relacionado='cita', objeto_id=atendida.id)
+    crear(objeto_relacionado='cita', objeto_id=999999)
+    leida = crear(objeto_relacionado='cita', objeto_id=pendiente.id, leido=True)
+    general = crear()
+    no_leida = crear(objeto_relacionado='cita', objeto_id=pendiente.id)
+
+    with django_assert_num_queries(1):
+        activas = list(filter_notificaciones_activas(usuario.notificaciones.all()))
+    assert activas == [no_leida, general, leida]
+
+
+@pytest.mark.django_db
+def test_marcar_leidas_y_contador(escenario_citas, client):
+    usuario, crear_cita = escenario_citas
+    atendida = crear_cita('atendida')
+    Notificacion.objects.create(usuario=usuario, mensaje='m', tipo='informacion')
+    Notificacion.objects.create(usuario=usuario, mensaje='m', tipo='informacion',
+                                objeto_relacionado='cita', objeto_id=atendida.id)
+    client.force_login(usuario)
+
+    assert client.get(reverse('notificaciones_no_leidas_count')).json()['count'] == 1
+    assert client.post(reverse('marcar_notificaciones_leidas')).json()['count'] == 1
+    # La de la cita atendida queda hasta que la retire purgar_notificaciones
+    assert Notificacion.objects.filter(usuario=usuario).count() == 2
+    assert client.get(reverse('notificaciones_no_leidas_count')).json()['count'] == 0
+
+
+@pytest.mark.django_db
+def test_contador_se_mantiene_con_senales(escenario_citas, django_assert_num_queries):
+    from django.core.management import call_command
+    from core.models import ContadorNotificaciones
+    from core.utils_notificaciones import obtener_no_leidas
+
+    usuario, crear_cita = escenario_citas
+    cita = crear_cita('confirmada')
+    assert obtener_no_leidas(usuario) == 0
+
+    general = Notificacion.objects.create(usuario=usuario, mensaje='m', tipo='informacion')
+    Notificacion.objects.create(usuario=usuario, mensaje='m', tipo='confirmacion',
+                                objeto_relacionado='cita', objeto_id=cita.id)
+    with django_assert_num_queries(1):
+        assert obtener_no_leidas(usuario) == 2
+
+    general = Notificacion.objects.get(pk=general.pk)
+    general.marcar_como_leida()
+    cita.estado = 'atendida'
+    cita.save()
+    assert obtener_no_leidas(usuario) == 0
+
+    ContadorNotificaciones.objects.filter(pk=usuario.pk).update(no_leidas=7)
+    call_command('reconciliar_contadores')
+    assert obtener_no_leidas(usuario) == 0
+
+
+@pytest.mark.django_db
+def test_consultar_cambios_agrupa_por_usuario(escenario_citas):
+    from core.utils_eventos import consultar_cambios
+    from core.utils_notificaciones import obtener_no_leidas
+
+    usuario, _ = escenario_citas
+    obtener_no_leidas(usuario)
+    nueva = Notificacion.objects.create(usuario=usuario, mensaje='Cita confirmada', tipo='confirmacion')
+
+    eventos, ultimo_id, contadores, marca = consultar_cambios([usuario.pk], 0, {usuario.pk: 0})
+    assert [tipo for tipo, _, _ in eventos[usuario.pk]] == ['notificacion', 'contador']
+    assert ultimo_id == nueva.pk and contadores == {usuario.pk: 1}
+
+    # Un resumen que suma eventos conserva su id: llega como actualización
+    Notificacion.objects.filter(pk=nueva.pk).update(mensaje='2 citas confirmadas', updated_at=timezone.now())
+    eventos, _, _, _ = consultar_cambios([usuario.pk], ultimo_id, contadores, marca)
+    (tipo, id_evento, datos), = eventos[usuario.pk]
+    assert (tipo, id_evento, datos['id'], datos['mensaje']) == ('actualizacion', None, nueva.pk, '2 citas confirmadas')
+
+    eventos, _, _, _ = consultar_cambios([usuario.pk], ultimo_id, contadores, timezone.now())
+    assert eventos == {}
+
+
+@pytest.mark.django_db
+def test_stream_wsgi_envia_estado_inicial(escenario_citas, client, settings):
+    settings.EVENTOS_DURACION_WSGI = 0
+    usuario, _ = escenario_citas
+    notificacion = Notificacion.objects.create(usuario=usuario, mensaje='Hola', tipo='informacion')
+    client.force_login(usuario)
+
+    respuesta = client.get(reverse('stream_notificaciones'), HTTP_LAST_EVENT_ID=str(notificacion.pk - 1))
+    assert respuesta['Content-Type'] == 'text/event-stream'
+    cuerpo = b''.join(respuesta.streaming_content).decode()
+    assert 'event: contador\ndata: {"no_leidas": 1}' in cuerpo
+    assert f'event: notificacion\nid: {notificacion.pk}' in cuerpo
+
+
+@pytest.mark.django_db
+def test_esperas_wsgi_sin_cupo_responden_sin_ocupar_el_hilo(escenario_citas, client, settings):
+    from core.views_eventos import cupos_wsgi
+
+    settings.EVENTOS_MAX_ESPERAS_WSGI = 0
+    settings.EVENTOS_REINTENTO_SATURADO = 30
+    usuario, _ = escenario_citas
+    client.force_login(usuario)
+
+    cuerpo = b''.join(client.get(reverse('stream_notificaciones')).streaming_content).decode()
+    assert cuerpo.startswith('retry: 30000\n\n') and 'event: contador' in cuerpo
+    datos = client.get(reverse('long_poll_notificaciones'), {'contador': 0}).json()
+    assert datos == {'eventos': [], 'reintentar_en': 30}
+    assert cupos_wsgi.ocupados == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cantidad', [2, 8])
+def test_notificar_rol_consultas_constantes(escenario_citas, django_assert_num_queries, cantidad):
+    from core.models import Rol
+    from core.utils_notificaciones import notificar_rol, obtener_no_leidas
+
+    rol = Rol.objects.create(nombre='Farmacéutico')
+    farmaceuticos = [
+        Usuario.objects.create_user(username=f'farm{i}', password='x', dni=f'2000000{i}', rol=rol)
+        for i in range(cantidad)
+    ]
+    for farmaceutico in farmaceuticos[1:]:
+        obtener_no_leidas(farmaceutico)
+
+    # Usuarios del rol, INSERT, registro de cambios y UPDATE de contadores
+    with django_assert_num_queries(4):
+        creadas = notificar_rol('Farmacéutico', mensaje='Nueva receta', importante=True,
+                                creador=farmaceuticos[0])
+
+    assert len(creadas) == cantidad - 1
+    assert not Notificacion.objects.filter(usuario=farmaceuticos[0]).exists()
+    assert [obtener_no_leidas(f) for f in farmaceuticos[1:]] == [1] * (cantidad - 1)
+
+
+@pytest.mark.django_db
+def test_crear_notificaciones_masivas_por_destinatario(escenario_citas):
+    from core.utils_notificaciones import crear_notificaciones_masivas, obtener_no_leidas
+
+    usuario, crear_cita = escenario_citas
+    cita = crear_cita('pendiente')
+    medico = cita.medico.usuario
+    obtener_no_leidas(usuario)
+
+    crear_notificaciones_masivas(
+        [{'usuario': usuario, 'mensaje': 'Cita confirmada', 'tipo': 'confirmacion'}, medico, medico.pk],
+        mensaje='Nueva cita', objeto_relacionado='cita', objeto_id=cita.id,
+    )
+
+    url = reverse('atender_paciente', kwargs={'cita_id': cita.id})
+    assert list(Notificacion.objects.order_by('pk').values_list('usuario', 'tipo', 'mensaje', 'url_redireccion')) == [
+        (usuario.pk, 'confirmacion', 'Cita confirmada', url),
+        (medico.pk, 'informacion', 'Nueva cita', url),
+    ]
+    assert obtener_no_leidas(usuario) == 1
+
+
+@pytest.mark.django_db
+def test_purgar_notificaciones_por_lotes(escenario_citas, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from core.models import NotificacionArchivada
+    from core.utils_notificaciones import obtener_no_leidas
+    from core.utils_retencion import purgar_notificaciones
+
+    settings.NOTIFICACIONES_RETENCION = {
+        'confirmacion': {'accion': 'archivar', 'dias': 30},
+        'recordatorio': {'accion': 'eliminar', 'dias': 30},
+    }
+    usuario, crear_cita = escenario_citas
+    atendida = crear_cita('atendida')
+    crear = lambda tipo, **datos: Notificacion.objects.create(usuario=usuario, mensaje='m', tipo=tipo, **datos)
+    archivables = [crear('confirmacion', leido=True) for _ in range(3)]
+    eliminable = crear('recordatorio', objeto_relacionado='cita', objeto_id=atendida.id)
+    conservadas = [
+        crear('confirmacion'),  # no leída
+        crear('informacion', leido=True),  # tipo sin política
+    ]
+    reciente = crear('confirmacion', leido=True)
+    Notificacion.objects.exclude(pk=reciente.pk).update(fecha_envio=timezone.now() - timedelta(days=40))
+    no_leidas = obtener_no_leidas(usuario)
+
+    resultado = purgar_notificaciones(tamano_lote=2)
+
+    assert resultado == {'archivadas': 3, 'eliminadas': 1, 'lotes': 2}
+    assert set(Notificacion.objects.values_list('pk', flat=True)) == {n.pk for n in conservadas + [reciente]}
+    assert sorted(NotificacionArchivada.objects.values_list('notificacion_id', flat=True)) == [n.pk for n in archivables]
+    assert not NotificacionArchivada.objects.filter(notificacion_id=eliminable.pk).exists()
+    assert obtener_no_leidas(usuario) == no_leidas == 1
+
+
+@pytest.mark.django_db
+def test_purgar_lote_conserva_notificaciones_que_dejaron_de_ser_depurables(escenario_citas, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from core.models import NotificacionArchivada, RegistroCambio
+    from core.utils_retencion import _procesar_lote, politicas_retencion
+
+    settings.NOTIFICACIONES_RETENCION = {'confirmacion': {'accion': 'archivar', 'dias': 30}}
+    usuario, _ = escenario_citas
+    leida, reabierta = [
+        Notificacion.objects.create(usuario=usuario, mensaje='m', tipo='confirmacion', leido=True) for _ in range(2)
+    ]
+    Notificacion.objects.update(fecha_envio=timezone.now() - timedelta(days=40))
+    # Seleccionada como depurable, pero vuelve a quedar sin leer antes de procesar su lote
+    Notificacion.objects.filter(pk=reabierta.pk).update(leido=False)
+
+    assert _procesar_lote([leida.pk, reabierta.pk], politicas_retencion(), timezone.now()) == (1, 0)
+    assert list(Notificacion.objects.values_list('pk', flat=True)) == [reabierta.pk]
+    assert list(NotificacionArchivada.objects.values_list('notificacion_id', flat=True)) == [leida.pk]
+    assert RegistroCambio.objects.filter(modelo='notificacion', objeto_id=leida.pk, operacion='baja').exists()
+
+
+@pytest.mark.django_db
+def test_notificaciones_agrupadas_actualizan_un_resumen(escenario_citas):
+    from datetime import timedelta
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+    from core.utils_notificaciones import clave_resumen, crear_notificaciones_agrupadas, obtener_no_leidas
+
+    usuario, crear_cita = escenario_citas
+    medico = crear_cita('pendiente').medico.usuario
+    obtener_no_leidas(medico)
+    agrupar = lambda cita: crear_notificaciones_agrupadas(
+        [medico], 'nueva_cita', mensaje=f'Nueva cita {cita.id}', mensaje_resumen='Tienes {cantidad} nuevas citas',
+        objeto_relacionado='cita', objeto_id=cita.id,
+    )
+
+    agrupar(crear_cita('pendiente'))
+    citas = [crear_cita('pendiente') for _ in range(3)]
+    with CaptureQueriesContext(connection) as consultas:
+        agrupar(citas[0])
+    assert not [c for c in consultas.captured_queries if c['sql'].startswith('INSERT INTO "core_notificacion"')]
+    for cita in citas[1:]:
+        agrupar(cita)
+
+    resumen = Notificacion.objects.get(usuario=medico)
+    assert (resumen.cantidad, resumen.mensaje) == (4, 'Tienes 4 nuevas citas')
+    assert [e['objeto_id'] for e in resumen.elementos[:3]] == [c.id for c in reversed(citas)]
+    assert resumen.clave_agrupacion == clave_resumen('nueva_cita')
+    assert obtener_no_leidas(medico) == 1
+
+    # Una vez leído, el siguiente evento abre otro resumen
+    resumen.marcar_como_leida()
+    agrupar(citas[0])
+    assert Notificacion.objects.filter(usuario=medico).count() == 2
+    assert obtener_no_leidas(medico) == 1
+    assert clave_resumen('x', timezone.now() + timedelta(hours=1)) != clave_resumen('x')
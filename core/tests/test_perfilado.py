@@ -0,0 +1,35 @@
+import pytest
+from django.urls import reverse
+from core.models import Usuario
+from core.utils_perfilado import generar_token
+
+
+@pytest.fixture
+def staff(db):
+    return Usuario.objects.create_user(username='perfilador', password='x', dni='99999999', is_staff=True)
+
+
+@pytest.mark.django_db
+def test_perfilado_respeta_tope_por_hora(client, staff, settings, tmp_path):
+    settings.PERFILADO_DIR = tmp_path
+    settings.PERFILADO_MAX_POR_HORA = 1
+    client.force_login(staff)
+    token = generar_token(staff)
+
+    respuesta = client.get(reverse('home'), {'_perfil': token})
+    archivo = respuesta['X-Perfil-Archivo']
+    assert archivo.endswith('.prof/')
+    assert client.get(archivo).status_code == 200
+
+    respuesta = client.get(reverse('home'), HTTP_X_PERFIL_TOKEN=token)
+    assert respuesta['X-Perfil-Archivo'] == 'tope-alcanzado'
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.django_db
+def test_perfilado_ignora_token_de_otro_usuario(client, staff, settings, tmp_path):
+    settings.PERFILADO_DIR = tmp_path
+    otro = Usuario.objects.create_user(username='otro', password='x', dni='88888888', is_staff=True)
+    client.force_login(otro)
+    respuesta = client.get(reverse('home'), {'_perfil': generar_token(staff)})
+    assert 'X-Perfil-Archivo' not in respuesta
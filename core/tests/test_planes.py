@@ -0,0 +1,19 @@
+from core.utils_planes import huella_consulta, proponer_indice, formatear_indice
+
+
+def test_huella_ignora_literales():
+    a = 'SELECT * FROM "core_cita" WHERE "core_cita"."medico_id" = 3 AND "core_cita"."estado" IN (\'pendiente\', \'confirmada\')'
+    b = 'SELECT * FROM "core_cita" WHERE "core_cita"."medico_id" = 15 AND "core_cita"."estado" IN (\'atendida\')'
+    assert huella_consulta(a) == huella_consulta(b)
+
+
+def test_propuesta_igualdad_antes_que_rango_y_parcial():
+    sql = (
+        'SELECT COUNT(*) FROM "core_notificacion" WHERE ("core_notificacion"."usuario_id" = 7 '
+        'AND "core_notificacion"."leido" = 0 AND "core_notificacion"."fecha_envio" >= \'2025-01-01\') '
+        'ORDER BY "core_notificacion"."fecha_envio" DESC'
+    )
+    propuesta = proponer_indice(sql, 'core_notificacion', 'core_notificacion')
+    assert propuesta['campos'] == ['usuario', 'fecha_envio']
+    assert propuesta['condicion'] == {'leido': False}
+    assert 'condition=Q(leido=False)' in formatear_indice(propuesta)
@@ -0,0 +1,44 @@
+import json
+import pytest
+from datetime import datetime, time, timedelta
+from django.core.management import call_command
+from django.utils import timezone
+from core.models import Usuario, Paciente, Especialidad, Medico, Consultorio, Cita, Notificacion
+from core.utils_recordatorios import BackendArchivo, generar_recordatorios
+
+
+@pytest.mark.django_db
+def test_generar_recordatorios_es_idempotente(tmp_path):
+    usuario = Usuario.objects.create_user(username='pac', password='x', dni='10000001', email='pac@example.com')
+    paciente = Paciente.objects.create(usuario=usuario)
+    medico = Medico.objects.create(
+        usuario=Usuario.objects.create_user(username='med', password='x', dni='10000002', nombres='Ana'),
+        cmp='CMP1', especialidad=Especialidad.objects.create(nombre='Medicina General'),
+    )
+    consultorio = Consultorio.objects.create(codigo='C1', piso='1', area='Consulta')
+    ahora = timezone.make_aware(datetime(2030, 5, 10, 20, 0))
+
+    def crear_cita(dias, hora, estado='pendiente', **datos):
+        return Cita.objects.create(
+            paciente=paciente, medico=medico, consultorio=consultorio,
+            fecha=(ahora + timedelta(days=dias)).date(), hora_inicio=hora, hora_fin=hora,
+            estado=estado, motivo='Control', **datos,
+        )
+    recordar = [crear_cita(0, time(21, 0)), crear_cita(1, time(9, 0), estado='confirmada'), crear_cita(1, time(19, 30))]
+    crear_cita(0, time(19, 0))  # ya empezó
+    crear_cita(1, time(20, 30))  # fuera de la ventana
+    crear_cita(1, time(10, 0), estado='cancelada')
+    crear_cita(1, time(11, 0), recordatorio_enviado=ahora)
+
+    archivo = tmp_path / 'recordatorios.jsonl'
+    resultado = generar_recordatorios(horas=24, tamano_lote=2, backend=BackendArchivo(archivo), ahora=ahora)
+
+    assert resultado == {'citas': 3, 'entregados': 3, 'fallidos': 0}
+    assert sorted(Notificacion.objects.filter(tipo='recordatorio').values_list('objeto_id', flat=True)) == [c.id for c in recordar]
+    enviados = [json.loads(linea) for linea in archivo.read_text(encoding='utf-8').splitlines()]
+    assert [e['cita_id'] for e in enviados] == [c.id for c in recordar]
+    assert enviados[0]['email'] == 'pac@example.com'
+
+    assert generar_recordatorios(horas=24, ahora=ahora)['citas'] == 0
+    call_command('enviar_recordatorios', '--sin-envio')
+    assert Notificacion.objects.filter(tipo='recordatorio').count() == 3
@@ -0,0 +1,85 @@
+import pytest
+from datetime import date, time
+from django.urls import reverse
+from core.models import Usuario, Paciente, Especialidad, Medico, Consultorio, Cita, Notificacion, Derivacion
+
+
+@pytest.mark.django_db
+def test_sincronizacion_devuelve_solo_cambios_y_bajas(client, settings):
+    settings.SINCRONIZACION_MARGEN_SEGUNDOS = 0
+    usuario = Usuario.objects.create_user(username='pac', password='x', dni='10000001')
+    paciente = Paciente.objects.create(usuario=usuario)
+    otro = Paciente.objects.create(usuario=Usuario.objects.create_user(username='otro', password='x', dni='10000003'))
+    medico = Medico.objects.create(
+        usuario=Usuario.objects.create_user(username='med', password='x', dni='10000002'),
+        cmp='CMP1', especialidad=Especialidad.objects.create(nombre='Medicina General'),
+    )
+    consultorio = Consultorio.objects.create(codigo='C1', piso='1', area='Consulta')
+    crear_cita = lambda p: Cita.objects.create(
+        paciente=p, medico=medico, consultorio=consultorio, fecha=date(2030, 1, 1),
+        hora_inicio=time(9, 0), hora_fin=time(9, 30), motivo='Control',
+    )
+    cita, _ = crear_cita(paciente), crear_cita(otro)
+    notificacion = Notificacion.objects.create(usuario=usuario, mensaje='Hola', tipo='informacion')
+    client.force_login(usuario)
+    url = reverse('api_sincronizacion')
+
+    inicial = client.get(url).json()
+    assert inicial['completo']
+    assert [c['id'] for c in inicial['cambios']['cita']] == [cita.id]
+    assert [n['id'] for n in inicial['cambios']['notificacion']] == [notificacion.id]
+
+    cita.estado = 'confirmada'
+    cita.save()
+    crear_cita(otro).delete()
+    derivacion = Derivacion.objects.create(paciente=paciente, medico_origen=medico,
+                                           especialidad_destino=medico.especialidad, motivo='Control')
+    notificacion_id = notificacion.id
+    notificacion.delete()
+    client.post(reverse('marcar_notificaciones_leidas'))
+
+    delta = client.get(url, {'desde': inicial['marca']}).json()
+    assert not delta['completo'] and not delta['hay_mas']
+    assert [(c['id'], c['estado']) for c in delta['cambios']['cita']] == [(cita.id, 'confirmada')]
+    assert [d['id'] for d in delta['cambios']['derivacion']] == [derivacion.id]
+    assert delta['eliminados']['notificacion'] == [notificacion_id]
+    assert 'receta' not in delta['cambios']
+
+    assert client.get(url, {'desde': delta['marca']}).json()['cambios'] == {}
+    assert client.get(url, {'desde': 'x'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_sincronizacion_incremental_elimina_notificaciones_inactivas(client, settings):
+    settings.SINCRONIZACION_MARGEN_SEGUNDOS = 0
+    usuario = Usuario.objects.create_user(username='pac', password='x', dni='10000001')
+    paciente = Paciente.objects.create(usuario=usuario)
+    medico = Medico.objects.create(
+        usuario=Usuario.objects.create_user(username='med', password='x', dni='10000002'),
+        cmp='CMP1', especialidad=Especialidad.objects.create(nombre='Medicina General'),
+    )
+    cita = Cita.objects.create(
+        paciente=paciente, medico=medico, consultorio=Consultorio.objects.create(codigo='C1', piso='1', area='Consulta'),
+        fecha=date(2030, 1, 1), hora_inicio=time(9, 0), hora_fin=time(9, 30), motivo='Control',
+    )
+    crear = lambda: Notificacion.objects.create(
+        usuario=usuario, mensaje='Cita', tipo='recordatorio', objeto_relacionado='cita', objeto_id=cita.id,
+    )
+    de_cita, otra = crear(), crear()
+    client.force_login(usuario)
+    url = reverse('api_sincronizacion')
+    inicial = client.get(url).json()
+    assert {n['id'] for n in inicial['cambios']['notificacion']} == {de_cita.id, otra.id}
+
+    cita.estado = 'atendida'
+    cita.save()
+    delta = client.get(url, {'desde': inicial['marca']}).json()
+    assert delta['cambios']['notificacion'] == []
+    assert delta['eliminados']['notificacion'] == sorted([de_cita.id, otra.id])
+
+    # Un cambio posterior de una notificación inactiva tampoco la devuelve
+    de_cita.leido = True
+    de_cita.save()
+    delta = client.get(url, {'desde': delta['marca']}).json()
+    assert delta['cambios']['notificacion'] == []
+    assert delta['eliminados']['notificacion'] == [de_cita.id]
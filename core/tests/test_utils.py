@@ -18,4 +18,23 @@ def test_medicamento_dias_para_vencer():
         fecha_vencimiento=hoy + timedelta(days=45),
     )
     dias = med.dias_para_vencer()
-    assert dias == 45 
\ No newline at end of file
+    assert dias == 45 
+
+def test_cola_handler_escribe_json_fuera_del_hilo(tmp_path):
+    import json
+    import logging
+    from core.utils_logging import ColaHandler
+
+    archivo = tmp_path / 'app.log'
+    handler = ColaHandler(archivo=archivo, consola=False)
+    logger = logging.getLogger('core.tests.cola')
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        logger.warning('stock de %s en %s', 'Paracetamol', 3, extra={'medicamento_id': 7})
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    registro = json.loads(archivo.read_text(encoding='utf-8'))
+    assert registro['mensaje'] == 'stock de Paracetamol en 3'
+    assert registro['medicamento_id'] == 7
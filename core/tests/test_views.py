@@ -13,4 +13,62 @@ def test_consumo_medicamentos_view_admin():
     url = reverse('admin_reporte_consumo_medicamentos')
     response = client.get(url)
     assert response.status_code == 200
-    assert b'Consumo de Medicamentos' in response.content 
\ No newline at end of file
+    assert b'Consumo de Medicamentos' in response.content 
+
+@pytest.mark.django_db
+def test_usuario_de_sesion_trae_rol_y_perfiles(client, django_assert_num_queries):
+    from core.backends import BackendAutenticacion
+    from core.models import Rol, Especialidad, Medico, Paciente
+
+    User = get_user_model()
+    medico = User.objects.create_user(username='med', password='x', dni='10000002',
+                                      rol=Rol.objects.create(nombre='Medico'))
+    Medico.objects.create(usuario=medico, cmp='CMP1', especialidad=Especialidad.objects.create(nombre='Pediatría'))
+
+    with django_assert_num_queries(1):
+        usuario = BackendAutenticacion().get_user(medico.pk)
+    with django_assert_num_queries(0):
+        assert (usuario.rol.nombre, usuario.medico.especialidad.nombre) == ('Medico', 'Pediatría')
+        with pytest.raises(Paciente.DoesNotExist):
+            usuario.paciente
+
+    client.force_login(medico)
+    respuesta = client.get(reverse('dashboard_farmacia'))
+    assert respuesta.status_code == 302 and respuesta.url == reverse('dashboard')
+    assert client.get(reverse('api_buscar_medicamento')).status_code == 403
+
+
+@pytest.mark.django_db
+def test_cola_recetas_prioriza_pagina_por_cursor_y_reserva():
+    from core.models import Especialidad, Medico, Paciente, RecetaMedica
+    from core.utils_cola_recetas import (
+        ORDEN_COLA, CursorInvalido, cola_recetas, paginar_por_cursor, tomar_receta, tomar_siguiente,
+    )
+
+    User = get_user_model()
+    paciente = Paciente.objects.create(usuario=User.objects.create_user(username='pac', password='x', dni='40000001'))
+    medico = Medico.objects.create(
+        usuario=User.objects.create_user(username='med', password='x', dni='40000002'),
+        cmp='CMP7', especialidad=Especialidad.objects.create(nombre='General'),
+    )
+    recetas = {
+        codigo: RecetaMedica.objects.create(
+            codigo_receta=codigo, paciente=paciente, medico=medico, vigencia_dias=vigencia, urgente=urgente,
+        )
+        for codigo, vigencia, urgente in (('RX-A', 30, False), ('RX-B', 5, False), ('RX-C', 60, True), ('RX-D', 0, False))
+    }
+    RecetaMedica.objects.filter(codigo_receta='RX-D').update(fecha_limite=recetas['RX-D'].fecha_limite.replace(year=2000))
+
+    pagina, cursor = paginar_por_cursor(cola_recetas(), ORDEN_COLA, limite=2)
+    assert [receta.codigo_receta for receta in pagina] == ['RX-C', 'RX-B']
+    pagina, siguiente = paginar_por_cursor(cola_recetas(), ORDEN_COLA, cursor, limite=2)
+    assert ([receta.codigo_receta for receta in pagina], siguiente) == (['RX-A'], None)
+    with pytest.raises(CursorInvalido):
+        paginar_por_cursor(cola_recetas(), ORDEN_COLA, cursor[:-2] + 'xx')
+
+    uno = User.objects.create_user(username='far1', password='x', dni='40000003')
+    otro = User.objects.create_user(username='far2', password='x', dni='40000004')
+    assert tomar_siguiente(uno).codigo_receta == 'RX-C'
+    assert not tomar_receta(recetas['RX-C'], otro)
+    assert tomar_siguiente(otro).codigo_receta == 'RX-B'
+    assert tomar_receta(recetas['RX-C'], uno)
@@ -14,10 +14,13 @@ from . import views_agenda
 from . import views_seguimiento
 from . import views_farmacia
 from . import views_tendencias
+from . import views_perfilado
+from . import views_eventos
 from . import api_views
 from . import api_views_pacientes
 from . import api_views_notificaciones
 from . import api_views_analisis_origen
+from . import api_views_sincronizacion
 
 
 
@@ -115,6 +118,9 @@ urlpatterns = [
     path('api/marcar-notificacion-leida/<int:notificacion_id>/', api_views_notificaciones.marcar_notificacion_leida, name='marcar_notificacion_leida'),
     path('api/eliminar-notificacion/<int:notificacion_id>/', api_views_notificaciones.eliminar_notificacion, name='eliminar_notificacion'),
     path('api/notificaciones-no-leidas-count/', api_views_notificaciones.notificaciones_no_leidas_count, name='notificaciones_no_leidas_count'),
+    path('api/notificaciones/stream/', views_eventos.stream_notificaciones, name='stream_notificaciones'),
+    path('api/notificaciones/eventos/', views_eventos.long_poll_notificaciones, name='long_poll_notificaciones'),
+    path('api/sincronizacion/', api_views_sincronizacion.api_sincronizacion, name='api_sincronizacion'),
     path('api/limpiar-notificaciones-citas-atendidas/', api_views_notificaciones.limpiar_notificaciones_citas_atendidas, name='limpiar_notificaciones_citas_atendidas'),
     path('api/derivacion/horarios-disponibles/<int:medico_id>/<str:fecha>/', api_views.horarios_disponibles, name='api_derivacion_horarios_disponibles'),
     
@@ -138,19 +144,25 @@ urlpatterns = [
     # === FARMACIA ===
     path('farmacia/', views_farmacia.dashboard_farmacia, name='dashboard_farmacia'),
     path('farmacia/recetas/', views_farmacia.recetas_pendientes, name='recetas_pendientes'),
+    path('farmacia/recetas/siguiente/', views_farmacia.tomar_siguiente_receta, name='tomar_siguiente_receta'),
+    path('farmacia/receta/<int:receta_id>/liberar/', views_farmacia.liberar_receta_view, name='liberar_receta'),
     path('farmacia/receta/<int:receta_id>/', views_farmacia.detalle_receta, name='detalle_receta'),
     path('farmacia/dispensar/<int:receta_id>/', views_farmacia.dispensar_receta, name='dispensar_receta'),
     path('farmacia/inventario/', views_farmacia.inventario_medicamentos, name='inventario_medicamentos'),
     path('farmacia/inventario/entrada/', views_farmacia.entrada_medicamentos, name='entrada_medicamentos'),
+    path('farmacia/inventario/entrada/guia/', views_farmacia.entrada_masiva_medicamentos, name='entrada_masiva_medicamentos'),
     path('farmacia/inventario/ajuste/', views_farmacia.ajuste_inventario, name='ajuste_inventario'),
     path('farmacia/inventario/historial/', views_farmacia.historial_movimientos, name='historial_movimientos'),
     path('farmacia/inventario/medicamento/<int:medicamento_id>/', views_farmacia.detalle_medicamento_inventario, name='detalle_medicamento_inventario'),
     path('farmacia/inventario/reporte/', views_farmacia.reporte_inventario, name='reporte_inventario'),
+    path('farmacia/inventario/reposicion/', views_farmacia.reposicion_inventario, name='reposicion_inventario'),
     path('farmacia/alertas/', views_farmacia.alertas_farmacia, name='alertas_farmacia'),
     
     # APIs para farmacia
     path('api/farmacia/buscar-medicamento/', views_farmacia.api_buscar_medicamento, name='api_buscar_medicamento'),
     path('api/farmacia/estadisticas/', views_farmacia.api_estadisticas_farmacia, name='api_estadisticas_farmacia'),
+    path('api/farmacia/cola-recetas/', views_farmacia.api_cola_recetas, name='api_cola_recetas'),
+    path('api/farmacia/reposicion/', views_farmacia.api_reposicion, name='api_reposicion'),
     
     # Reportes y análisis estadísticos
     # Análisis Temporal
@@ -196,5 +208,8 @@ urlpatterns = [
     path('administrador/reportes-farmacia/consumo-medicamentos/', views.admin_reporte_consumo_medicamentos, name='admin_reporte_consumo_medicamentos'),
     path('administrador/reportes-farmacia/stock-critico/', views.admin_reporte_stock_critico, name='admin_reporte_stock_critico'),
     path('administrador/reportes-farmacia/dispensacion-especialidad/', views.admin_reporte_dispensacion_especialidad, name='admin_reporte_dispensacion_especialidad'),
-    path('administrador/reportes-farmacia/tendencias-consumo/', views.admin_reporte_tendencias_consumo, name='admin_reporte_tendencias_consumo')
+    path('administrador/reportes-farmacia/tendencias-consumo/', views.admin_reporte_tendencias_consumo, name='admin_reporte_tendencias_consumo'),
+
+    # Perfilado bajo demanda (solo staff)
+    path('administrador/perfiles/<str:nombre>/', views_perfilado.descargar_perfil, name='descargar_perfil'),
 ]
@@ -0,0 +1,383 @@
+"""
+Utilidades para medir el rendimiento de los endpoints críticos.
+
+Incluye un generador de datos sintéticos escalable (``generar_dataset``) y el
+catálogo de escenarios que recorre el comando ``benchmark``.
+"""
+import random
+import time as time_module
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Rol, Usuario, Paciente, Especialidad, Medico, Consultorio, DisponibilidadMedica,
+    Cita, Derivacion, Notificacion, Medicamento, MovimientoInventario, RecetaMedica, DetalleReceta
+)
+from .utils_busqueda_medicamentos import invalidar_indice, texto_busqueda
+
+ROLES_BASE = ['Paciente', 'Medico', 'Admision', 'Administrador', 'Farmacéutico']
+
+ESPECIALIDADES_BASE = [
+    ('Medicina General', True),
+    ('Emergencias', True),
+    ('Nutrición', False),
+    ('Obstetricia', False),
+    ('Odontología', True),
+    ('Psicología', False),
+]
+
+# Volumen de datos por unidad de escala
+VOLUMEN_POR_ESCALA = {
+    'medicos': 10,
+    'pacientes': 100,
+    'citas': 2000,
+    'medicamentos': 200,
+    'recetas': 300,
+    'notificaciones': 1000,
+}
+
+ESTADOS_CITA = ['pendiente', 'confirmada', 'atendida', 'atendida', 'atendida', 'cancelada']
+
+
+def percentil(valores, p):
+    """
+    Calcula el percentil ``p`` (0-100) de una lista de valores usando
+    interpolación lineal entre rangos.
+    """
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return float(ordenados[0])
+    posicion = (len(ordenados) - 1) * (p / 100)
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    fraccion = posicion - inferior
+    return float(ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * fraccion)
+
+
+def _crear_usuarios(prefijo, inicial_dni, cantidad, rol):
+    """Crea usuarios en bloque sin contraseña utilizable (se usa force_login)"""
+    usuarios = [
+        Usuario(
+            username=f'{prefijo}{i:06d}',
+            dni=f'{inicial_dni}{i:07d}',
+            nombres=f'{prefijo.capitalize()} {i}',
+            apellidos='Benchmark',
+            password='!',
+            rol=rol,
+        )
+        for i in range(cantidad)
+    ]
+    Usuario.objects.bulk_create(usuarios)
+    return list(Usuario.objects.filter(username__startswith=prefijo).order_by('id'))
+
+
+@transaction.atomic
+def generar_dataset(escala=1, recetas_pendientes=None, semilla=42):
+    """
+    Genera un conjunto de datos sintético proporcional a ``escala``.
+
+    Args:
+        escala (int): Factor multiplicador de los volúmenes base
+        recetas_pendientes (int): Mínimo de recetas pendientes a generar
+        semilla (int): Semilla para obtener siempre el mismo dataset
+
+    Returns:
+        dict: Usuarios representativos por rol e identificadores útiles
+              para construir las peticiones de los escenarios
+    """
+    rng = random.Random(semilla)
+    volumen = {clave: valor * escala for clave, valor in VOLUMEN_POR_ESCALA.items()}
+    if recetas_pendientes:
+        volumen['recetas'] = max(volumen['recetas'], recetas_pendientes)
+    hoy = timezone.now().date()
+
+    roles = {nombre: Rol.objects.get_or_create(nombre=nombre)[0] for nombre in ROLES_BASE}
+
+    especialidades = []
+    for nombre, acceso_directo in ESPECIALIDADES_BASE:
+        especialidad, _ = Especialidad.objects.get_or_create(
+            nombre=nombre, defaults={'acceso_directo': acceso_directo}
+        )
+        especialidades.append(especialidad)
+
+    Consultorio.objects.bulk_create([
+        Consultorio(codigo=f'B{i:03d}', piso=str(1 + i // 10), area='Consulta Externa')
+        for i in range(max(5, escala * 5))
+    ])
+    consultorios = list(Consultorio.objects.filter(codigo__startswith='B'))
+
+    usuarios_medicos = _crear_usuarios('bmedico', 'M', volumen['medicos'], roles['Medico'])
+    Medico.objects.bulk_create([
+        Medico(usuario=usuario, cmp=f'CMP{i:05d}', especialidad=especialidades[i % len(especialidades)])
+        for i, usuario in enumerate(usuarios_medicos)
+    ])
+    medicos = list(Medico.objects.filter(usuario__in=usuarios_medicos).order_by('id'))
+
+    # Turnos de mañana y tarde de lunes a sábado para todos los médicos
+    DisponibilidadMedica.objects.bulk_create([
+        DisponibilidadMedica(
+            medico=medico, dia_semana=dia, hora_inicio=inicio, hora_fin=fin, tipo_turno=turno
+        )
+        for medico in medicos
+        for dia in range(6)
+        for inicio, fin, turno in ((time(8, 0), time(13, 0), 'mañana'), (time(14, 0), time(19, 0), 'tarde'))
+    ])
+
+    usuarios_pacientes = _crear_usuarios('bpaciente', 'P', volumen['pacientes'], roles['Paciente'])
+    Paciente.objects.bulk_create([Paciente(usuario=usuario) for usuario in usuarios_pacientes])
+    pacientes = list(Paciente.objects.filter(usuario__in=usuarios_pacientes).order_by('id'))
+
+    admision = _crear_usuarios('badmision', 'A', 1, roles['Admision'])[0]
+    administrador = _crear_usuarios('badmin', 'D', 1, roles['Administrador'])[0]
+    farmaceutico = _crear_usuarios('bfarmacia', 'F', 1, roles['Farmacéutico'])[0]
+
+    citas = []
+    for _ in range(volumen['citas']):
+        fecha = hoy + timedelta(days=rng.randint(-180, 30))
+        hora_inicio = time(rng.randint(8, 18), rng.choice([0, 30]))
+        hora_fin = (datetime.combine(fecha, hora_inicio) + timedelta(minutes=30)).time()
+        estado = rng.choice(ESTADOS_CITA) if fecha < hoy else rng.choice(['pendiente', 'confirmada'])
+        citas.append(Cita(
+            paciente=rng.choice(pacientes),
+            medico=rng.choice(medicos),
+            consultorio=rng.choice(consultorios),
+            fecha=fecha,
+            hora_inicio=hora_inicio,
+            hora_fin=hora_fin,
+            estado=estado,
+            asistio=True if estado == 'atendida' else None,
+            motivo='Consulta de benchmark',
+        ))
+    Cita.objects.bulk_create(citas, batch_size=1000)
+    ids_citas = list(Cita.objects.filter(motivo='Consulta de benchmark').values_list('id', flat=True))
+
+    Derivacion.objects.bulk_create([
+        Derivacion(
+            paciente=rng.choice(pacientes),
+            medico_origen=rng.choice(medicos),
+            especialidad_destino=rng.choice(especialidades),
+            motivo='Derivación de benchmark',
+        )
+        for _ in range(max(1, volumen['pacientes'] // 5))
+    ])
+
+    nuevos = [
+        Medicamento(
+            codigo=f'BMK{i:06d}',
+            nombre_generico=f'Principio {i}',
+            nombre_comercial=f'Marca {i}',
+            concentracion='500mg',
+            laboratorio=f'Laboratorio {i % 20}',
+            stock_actual=100000,
+            stock_minimo=rng.randint(5, 50),
+            precio_unitario=rng.randint(1, 200),
+            fecha_vencimiento=hoy + timedelta(days=rng.randint(-10, 720)),
+        )
+        for i in range(volumen['medicamentos'])
+    ]
+    # bulk_create no pasa por Medicamento.save()
+    for medicamento in nuevos:
+        medicamento.texto_busqueda = texto_busqueda(medicamento)
+    Medicamento.objects.bulk_create(nuevos, batch_size=1000)
+    invalidar_indice()
+    medicamentos = list(Medicamento.objects.filter(codigo__startswith='BMK'))
+    # El stock inicial (sin lote) queda en el historial para que los movimientos cuadren con stock_actual
+    MovimientoInventario.objects.bulk_create([
+        MovimientoInventario(
+            medicamento=medicamento, tipo_movimiento='entrada', cantidad=medicamento.stock_actual,
+            motivo='Stock inicial de benchmark', stock_anterior=0, stock_nuevo=medicamento.stock_actual,
+        )
+        for medicamento in medicamentos
+    ], batch_size=1000)
+
+    recetas = []
+    for i in range(volumen['recetas']):
+        paciente = rng.choice(pacientes)
+        recetas.append(RecetaMedica(
+            paciente=paciente,
+            medico=rng.choice(medicos),
+            codigo_receta=f'BMK-{i:08d}',
+            urgente=rng.random() < 0.1,
+            # bulk_create no pasa por RecetaMedica.save()
+            fecha_limite=timezone.now() + timedelta(days=30),
+        ))
+    RecetaMedica.objects.bulk_create(recetas, batch_size=1000)
+    recetas = list(RecetaMedica.objects.filter(codigo_receta__startswith='BMK-').order_by('id'))
+
+    DetalleReceta.objects.bulk_create([
+        DetalleReceta(
+            receta=receta,
+            medicamento=medicamento,
+            cantidad_prescrita=rng.randint(1, 30),
+            dosis='1 tableta',
+            frecuencia='Cada 8 horas',
+            duracion_dias=7,
+            instrucciones='Tomar con agua',
+        )
+        for receta in recetas
+        for medicamento in rng.sample(medicamentos, min(3, len(medicamentos)))
+    ], batch_size=1000)
+
+    destinatarios = usuarios_medicos + usuarios_pacientes + [admision, administrador, farmaceutico]
+    Notificacion.objects.bulk_create([
+        Notificacion(
+            usuario=rng.choice(destinatarios),
+            mensaje='Notificación de benchmark',
+            tipo=rng.choice(['confirmacion', 'informacion', 'cancelacion']),
+            leido=rng.random() < 0.5,
+            objeto_relacionado='cita',
+            objeto_id=rng.choice(ids_citas),
+        )
+        for _ in range(volumen['notificaciones'])
+    ], batch_size=1000)
+
+    # Fecha hábil próxima para consultar horarios disponibles
+    fecha_horarios = hoy + timedelta(days=1)
+    while fecha_horarios.weekday() > 5:
+        fecha_horarios += timedelta(days=1)
+
+    return {
+        'escala': escala,
+        'paciente': pacientes[0].usuario,
+        'medico': medicos[0].usuario,
+        'admision': admision,
+        'administrador': administrador,
+        'farmaceutico': farmaceutico,
+        'medico_id': medicos[0].id,
+        'fecha_horarios': fecha_horarios,
+        'recetas_pendientes': [receta.id for receta in recetas],
+        'hoy': hoy,
+    }
+
+
+def _datos_dispensar(datos, iteracion):
+    """Cantidades completas de una receta pendiente distinta en cada iteración"""
+    receta_id = datos['recetas_pendientes'][iteracion % len(datos['recetas_pendientes'])]
+    return {
+        f'cantidad_{detalle_id}': cantidad
+        for detalle_id, cantidad in DetalleReceta.objects.filter(
+            receta_id=receta_id
+        ).values_list('id', 'cantidad_prescrita')
+    }
+
+
+def _url_dispensar(datos, iteracion):
+    receta_id = datos['recetas_pendientes'][iteracion % len(datos['recetas_pendientes'])]
+    return reverse('dispensar_receta', args=[receta_id])
+
+
+def _receta_dispensada(datos, iteracion, respuesta):
+    """La vista redirige tanto si dispensa como si rechaza: se verifica el estado de la receta"""
+    receta_id = datos['recetas_pendientes'][iteracion % len(datos['recetas_pendientes'])]
+    return RecetaMedica.objects.filter(pk=receta_id, estado='dispensada').exists()
+
+
+def _datos_comparativa(datos, iteracion):
+    hoy = datos['hoy']
+    return {
+        'fecha_inicio1': (hoy - timedelta(days=180)).isoformat(),
+        'fecha_fin1': (hoy - timedelta(days=91)).isoformat(),
+        'fecha_inicio2': (hoy - timedelta(days=90)).isoformat(),
+        'fecha_fin2': hoy.isoformat(),
+        'incluir_dimensiones': 'true',
+    }
+
+
+# Escenarios medidos: usuario del dataset que hace la petición, método, URL,
+# parámetros (calculados fuera de la medición), códigos de respuesta esperados
+# y, opcionalmente, una verificación del resultado hecha después de medir
+ESCENARIOS = [
+    {
+        'nombre': 'api_horarios_disponibles',
+        'usuario': 'paciente',
+        'url': lambda datos, i: reverse(
+            'api_horarios_disponibles', args=[datos['medico_id'], datos['fecha_horarios'].isoformat()]
+        ),
+    },
+    {'nombre': 'dashboard_paciente', 'usuario': 'paciente', 'url': lambda datos, i: reverse('dashboard_paciente')},
+    {'nombre': 'dashboard_medico', 'usuario': 'medico', 'url': lambda datos, i: reverse('dashboard_medico')},
+    {'nombre': 'dashboard_admision', 'usuario': 'admision', 'url': lambda datos, i: reverse('dashboard_admision')},
+    {'nombre': 'dashboard_admin', 'usuario': 'administrador', 'url': lambda datos, i: reverse('dashboard_admin')},
+    {'nombre': 'dashboard_farmacia', 'usuario': 'farmaceutico', 'url': lambda datos, i: reverse('dashboard_farmacia')},
+    {
+        'nombre': 'api_comparativa_citas',
+        'usuario': 'administrador',
+        'url': lambda datos, i: reverse('api_comparativa_citas'),
+        'parametros': _datos_comparativa,
+    },
+    {
+        'nombre': 'api_buscar_medicamento',
+        'usuario': 'farmaceutico',
+        'url': lambda datos, i: reverse('api_buscar_medicamento'),
+        'parametros': lambda datos, i: {'q': ('marca 1', 'principio', 'laboratorio 7', 'bmk0000')[i % 4]},
+    },
+    {'nombre': 'api_cola_recetas', 'usuario': 'farmaceutico', 'url': lambda datos, i: reverse('api_cola_recetas')},
+    {
+        'nombre': 'dispensar_receta',
+        'usuario': 'farmaceutico',
+        'metodo': 'post',
+        'url': _url_dispensar,
+        'parametros': _datos_dispensar,
+        'esperado': (302,),
+        'verificar': _receta_dispensada,
+    },
+]
+
+
+def preparar_peticion(escenario, datos, iteracion):
+    """Devuelve (método, url, parámetros) de la petición ``iteracion`` del escenario"""
+    parametros = escenario.get('parametros')
+    return (
+        escenario.get('metodo', 'get'),
+        escenario['url'](datos, iteracion),
+        parametros(datos, iteracion) if parametros else {},
+    )
+
+
+def ejecutar_escenario(escenario, datos, iteraciones, calentamiento=2):
+    """
+    Ejecuta un escenario con el cliente de pruebas de Django.
+
+    Returns:
+        dict: Percentiles de latencia en milisegundos, consultas por petición
+              y número de respuestas con código inesperado o que no pasan
+              la verificación del escenario
+    """
+    from django.test import Client
+
+    client = Client()
+    client.force_login(datos[escenario['usuario']])
+    esperado = escenario.get('esperado', (200,))
+    verificar = escenario.get('verificar')
+
+    for i in range(calentamiento):
+        metodo, url, parametros = preparar_peticion(escenario, datos, i)
+        getattr(client, metodo)(url, parametros)
+
+    latencias = []
+    consultas = []
+    errores = 0
+    for i in range(calentamiento, calentamiento + iteraciones):
+        metodo, url, parametros = preparar_peticion(escenario, datos, i)
+        with CaptureQueriesContext(connection) as contexto:
+            inicio = time_module.perf_counter()
+            respuesta = getattr(client, metodo)(url, parametros)
+            latencias.append((time_module.perf_counter() - inicio) * 1000)
+        consultas.append(len(contexto.captured_queries))
+        if respuesta.status_code not in esperado or (verificar and not verificar(datos, i, respuesta)):
+            errores += 1
+
+    return {
+        'iteraciones': iteraciones,
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+        'consultas': max(consultas) if consultas else 0,
+        'errores': errores,
+    }
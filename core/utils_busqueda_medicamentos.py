@@ -0,0 +1,177 @@
+"""
+Búsqueda de medicamentos compartida por farmacia y prescripción.
+
+Cada medicamento guarda en ``texto_busqueda`` su código, nombres, concentración
+y laboratorio en minúsculas y sin tildes. En PostgreSQL se filtra sobre esa
+columna con un índice de trigramas (pg_trgm, ver migración 0017) y se ordena
+por similitud. En el resto de motores se usa un índice en memoria del catálogo:
+los tokens ordenados (un trie aplanado: un prefijo es un rango contiguo que se
+ubica con búsqueda binaria) más una pasada sobre los tokens únicos para las
+coincidencias en medio de una palabra. El índice se reconstruye cuando algún
+medicamento cambia su texto (misma invalidación por versión que utils_catalogos).
+"""
+import bisect
+import re
+import unicodedata
+
+from django.db import connection
+
+from . import utils_catalogos
+
+CAMPOS_BUSQUEDA = ('codigo', 'nombre_comercial', 'nombre_generico', 'concentracion', 'laboratorio')
+LARGO_TEXTO_BUSQUEDA = 500
+CATALOGO_INDICE = 'medicamento_busqueda'
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni signos: 'Ácido Fólico 5mg/5ml' -> 'acido folico 5mg 5ml'"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return _NO_ALFANUMERICO.sub(' ', texto.lower()).strip()
+
+
+def texto_busqueda(medicamento):
+    """Valor de ``Medicamento.texto_busqueda`` para una instancia"""
+    texto = normalizar(' '.join(getattr(medicamento, campo) or '' for campo in CAMPOS_BUSQUEDA))
+    return texto[:LARGO_TEXTO_BUSQUEDA]
+
+
+class IndicePrefijos:
+    """Índice en memoria de tokens -> ids de medicamento"""
+
+    def __init__(self, filas):
+        por_token = {}
+        nombres = []
+        for pk, texto, nombre in filas:
+            nombres.append((normalizar(nombre), pk))
+            for token in set(texto.split()):
+                por_token.setdefault(token, []).append(pk)
+        # Posición de cada medicamento por nombre: desempata y ubica por rango los
+        # nombres que empiezan con lo escrito
+        nombres.sort()
+        self.nombres = [nombre for nombre, _ in nombres]
+        self.por_rango = [pk for _, pk in nombres]
+        self.rango = {pk: posicion for posicion, pk in enumerate(self.por_rango)}
+        self.tokens = sorted(por_token)
+        self.ids = [por_token[token] for token in self.tokens]
+        # Todos los tokens en un solo texto para buscar subcadenas en C (re) y no en Python
+        self.texto = '\n'.join(self.tokens)
+        self.inicios = []
+        posicion = 0
+        for token in self.tokens:
+            self.inicios.append(posicion)
+            posicion += len(token) + 1
+
+    def coincidencias(self, termino):
+        """
+        Returns:
+            dict: id -> peso (3 token exacto, 2 prefijo de un token, 1 dentro de un token)
+        """
+        pesos = {}
+        i = bisect.bisect_left(self.tokens, termino)
+        while i < len(self.tokens) and self.tokens[i].startswith(termino):
+            peso = 3 if self.tokens[i] == termino else 2
+            for pk in self.ids[i]:
+                if pesos.get(pk, 0) < peso:
+                    pesos[pk] = peso
+            i += 1
+        if len(termino) >= 3:
+            for coincidencia in re.finditer(re.escape(termino), self.texto):
+                j = bisect.bisect_right(self.inicios, coincidencia.start()) - 1
+                for pk in self.ids[j]:
+                    pesos.setdefault(pk, 1)
+        return pesos
+
+    def buscar(self, termino, cantidad=None):
+        """Los ``cantidad`` ids más relevantes que contienen todos los tokens de ``termino``"""
+        tokens = normalizar(termino).split()
+        if not tokens:
+            return []
+        puntajes = None
+        for token in tokens:
+            pesos = self.coincidencias(token)
+            if puntajes is None:
+                puntajes = pesos
+            else:
+                puntajes = {pk: puntaje + pesos[pk] for pk, puntaje in puntajes.items() if pk in pesos}
+            if not puntajes:
+                return []
+        consulta = ' '.join(tokens)
+        # Bono para los medicamentos cuyo nombre comercial empieza con lo escrito
+        desde = bisect.bisect_left(self.nombres, consulta)
+        hasta = bisect.bisect_left(self.nombres, consulta + '\uffff')
+
+        grupos = {}
+        for pk, puntaje in puntajes.items():
+            posicion = self.rango[pk]
+            if desde <= posicion < hasta:
+                puntaje += 2
+            grupos.setdefault(puntaje, []).append(posicion)
+        ordenados = []
+        for puntaje in sorted(grupos, reverse=True):
+            ordenados += sorted(grupos[puntaje])
+            if cantidad is not None and len(ordenados) >= cantidad:
+                break
+        return [self.por_rango[posicion] for posicion in ordenados[:cantidad]]
+
+
+def indice():
+    """Índice en memoria del catálogo de medicamentos, reconstruido si cambió"""
+    from .models import Medicamento
+
+    def construir():
+        return IndicePrefijos(Medicamento.objects.values_list('id', 'texto_busqueda', 'nombre_comercial').iterator())
+
+    return utils_catalogos.en_cache_local(CATALOGO_INDICE, construir)
+
+
+def invalidar_indice():
+    utils_catalogos.invalidar_catalogo(CATALOGO_INDICE)
+
+
+def buscar_medicamentos(termino, limite=10, solo_con_stock=True, forma=None):
+    """
+    Medicamentos activos que coinciden con ``termino``, ordenados por relevancia
+
+    Args:
+        termino (str): Texto escrito por el usuario (código, nombre, laboratorio...)
+        limite (int): Máximo de resultados
+        solo_con_stock (bool): Excluir los medicamentos sin stock
+        forma (str): Filtrar por forma farmacéutica
+
+    Returns:
+        list: Instancias de Medicamento
+    """
+    from .models import Medicamento
+
+    tokens = normalizar(termino).split()
+    if not tokens:
+        return []
+    consulta = Medicamento.objects.filter(activo=True)
+    if solo_con_stock:
+        consulta = consulta.filter(stock_actual__gt=0)
+    if forma:
+        consulta = consulta.filter(forma_farmaceutica__icontains=forma)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        for token in tokens:
+            consulta = consulta.filter(texto_busqueda__contains=token)
+        return list(
+            consulta.annotate(similitud=TrigramSimilarity('texto_busqueda', ' '.join(tokens)))
+            .order_by('-similitud', 'nombre_comercial')[:limite]
+        )
+
+    # Se piden candidatos en orden de relevancia, ampliando la cantidad hasta
+    # completar el límite con los que cumplen los filtros (activo, stock, forma)
+    cantidad = max(limite * 5, 50)
+    while True:
+        candidatos = indice().buscar(termino, cantidad)
+        encontrados = consulta.in_bulk(candidatos)
+        resultados = [encontrados[pk] for pk in candidatos if pk in encontrados]
+        if len(resultados) >= limite or len(candidatos) < cantidad:
+            return resultados[:limite]
+        cantidad *= 4
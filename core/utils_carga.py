@@ -0,0 +1,351 @@
+"""
+Generador de carga concurrente para detectar condiciones de carrera.
+
+Simula una mezcla de roles (pacientes consultando horarios y reservando,
+farmacéuticos dispensando y administradores abriendo reportes) desde varios
+hilos, ya sea contra la aplicación WSGI en el mismo proceso o contra un
+servidor en ejecución. Al terminar verifica invariantes de consistencia:
+citas solapadas y stock negativo.
+"""
+import json
+import random
+import threading
+import time as time_module
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Exists, F, OuterRef
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .models import Usuario, Medico, Cita, Medicamento, RecetaMedica, DetalleReceta
+from .utils_benchmark import percentil
+from .utils_inventario import aplicar_movimientos
+
+ESTADOS_CITA_ACTIVOS = ['pendiente', 'confirmada']
+
+# Mezcla de roles por defecto (peso relativo de hilos por rol)
+MEZCLA_POR_DEFECTO = {'paciente': 6, 'farmaceutico': 3, 'administrador': 1}
+
+ROL_POR_PERFIL = {
+    'paciente': 'Paciente',
+    'farmaceutico': 'Farmacéutico',
+    'administrador': 'Administrador',
+}
+
+
+class ClienteWSGI:
+    """Cliente en proceso: usa el cliente de pruebas de Django sobre la app WSGI"""
+
+    def __init__(self, usuario):
+        from django.test import Client
+        self.client = Client()
+        self.client.force_login(usuario)
+
+    def get(self, url, parametros=None):
+        respuesta = self.client.get(url, parametros or {})
+        return respuesta.status_code, respuesta.content
+
+    def post(self, url, datos):
+        respuesta = self.client.post(url, datos)
+        return respuesta.status_code, respuesta.content
+
+    def cerrar(self):
+        connection.close()
+
+
+class ClienteHTTP:
+    """
+    Cliente contra un servidor en ejecución. La sesión se crea directamente en
+    el backend de sesiones compartido, por lo que no requiere contraseñas.
+    """
+
+    def __init__(self, usuario, url_base):
+        from django.test import Client
+        client = Client()
+        client.force_login(usuario)
+        self.url_base = url_base.rstrip('/')
+        self.csrf = get_random_string(32)
+        self.cookies = f"sessionid={client.cookies['sessionid'].value}; csrftoken={self.csrf}"
+        # Las redirecciones se reportan tal cual para poder validar el código
+        self.opener = urllib.request.build_opener(_SinRedirecciones)
+
+    def _enviar(self, peticion):
+        peticion.add_header('Cookie', self.cookies)
+        try:
+            with self.opener.open(peticion, timeout=30) as respuesta:
+                return respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def get(self, url, parametros=None):
+        consulta = f'?{urllib.parse.urlencode(parametros)}' if parametros else ''
+        return self._enviar(urllib.request.Request(f'{self.url_base}{url}{consulta}'))
+
+    def post(self, url, datos):
+        peticion = urllib.request.Request(
+            f'{self.url_base}{url}', data=urllib.parse.urlencode(datos).encode(), method='POST'
+        )
+        peticion.add_header('X-CSRFToken', self.csrf)
+        peticion.add_header('Referer', f'{self.url_base}{url}')
+        return self._enviar(peticion)
+
+    def cerrar(self):
+        connection.close()
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def reiniciar_stock(stock):
+    """
+    Deja cada medicamento con ``stock`` unidades en un único lote vigente
+
+    Pasa por aplicar_movimientos (ajuste negativo de todo lo que había, por
+    FEFO, y entrada al lote de la prueba) para que lotes, movimientos y
+    stock_actual sigan cuadrando y la dispensación trabaje sobre lotes reales.
+
+    Returns:
+        int: Medicamentos reiniciados
+    """
+    motivo = 'Reinicio de stock para la prueba de carga'
+    vencimiento = timezone.localdate() + timedelta(days=365)
+    lineas = []
+    medicamentos = list(Medicamento.objects.order_by('pk'))
+    for medicamento in medicamentos:
+        if medicamento.stock_actual:
+            lineas.append({
+                'medicamento': medicamento,
+                'tipo_movimiento': 'ajuste_negativo' if medicamento.stock_actual > 0 else 'ajuste_positivo',
+                'cantidad': abs(medicamento.stock_actual),
+                'motivo': motivo,
+            })
+        if stock > 0:
+            lineas.append({
+                'medicamento': medicamento,
+                'tipo_movimiento': 'entrada',
+                'cantidad': stock,
+                'numero_lote': 'PRUEBA-CARGA',
+                'vencimiento_lote': vencimiento,
+                'motivo': motivo,
+            })
+    aplicar_movimientos(lineas)
+    return len(medicamentos)
+
+
+def preparar_contexto(medicos_en_disputa=3):
+    """
+    Reúne de la base de datos los usuarios e identificadores que usan los hilos.
+
+    Los pacientes se concentran en pocos médicos y en el próximo día hábil
+    para provocar competencia real por los mismos horarios.
+    """
+    hoy = timezone.now().date()
+    fecha = hoy + timedelta(days=1)
+    while fecha.weekday() > 5:
+        fecha += timedelta(days=1)
+
+    medicos = list(
+        Medico.objects.filter(especialidad__acceso_directo=True, disponibilidades__activo=True)
+        .values('id', 'especialidad_id').distinct().order_by('id')[:medicos_en_disputa]
+    )
+    usuarios = {
+        perfil: list(Usuario.objects.filter(rol__nombre=rol, is_active=True).order_by('id')[:50])
+        for perfil, rol in ROL_POR_PERFIL.items()
+    }
+    usuarios['paciente'] = [u for u in usuarios['paciente'] if hasattr(u, 'paciente')]
+    return {
+        'fecha': fecha,
+        'hoy': hoy,
+        'medicos': medicos,
+        'usuarios': usuarios,
+        'recetas': list(RecetaMedica.objects.filter(estado='pendiente').values_list('id', flat=True)[:500]),
+    }
+
+
+def accion_paciente(cliente, contexto, rng):
+    """Consulta horarios de un médico disputado y reserva uno de ellos"""
+    medico = rng.choice(contexto['medicos'])
+    fecha = contexto['fecha'].isoformat()
+    inicio = time_module.perf_counter()
+    estado, cuerpo = cliente.get(reverse('api_horarios_disponibles', args=[medico['id'], fecha]))
+    yield 'api_horarios_disponibles', estado, time_module.perf_counter() - inicio, estado == 200
+
+    if estado != 200:
+        return
+    horarios = json.loads(cuerpo).get('horarios', [])
+    if not horarios:
+        return
+    inicio = time_module.perf_counter()
+    estado, _ = cliente.post(reverse('reservar_cita'), {
+        'especialidad': medico['especialidad_id'],
+        'medico': medico['id'],
+        'fecha': fecha,
+        'hora': rng.choice(horarios[:3]),
+        'motivo': 'Prueba de carga',
+    })
+    yield 'reservar_cita', estado, time_module.perf_counter() - inicio, estado in (200, 302)
+
+
+def accion_farmaceutico(cliente, contexto, rng):
+    """Dispensa completa una receta pendiente elegida al azar"""
+    if not contexto['recetas']:
+        return
+    receta_id = rng.choice(contexto['recetas'])
+    cantidades = {
+        f'cantidad_{detalle_id}': cantidad
+        for detalle_id, cantidad in DetalleReceta.objects.filter(
+            receta_id=receta_id
+        ).values_list('id', 'cantidad_prescrita')
+    }
+    inicio = time_module.perf_counter()
+    estado, _ = cliente.post(reverse('dispensar_receta', args=[receta_id]), cantidades)
+    yield 'dispensar_receta', estado, time_module.perf_counter() - inicio, estado in (200, 302)
+
+
+def accion_administrador(cliente, contexto, rng):
+    """Abre uno de los reportes de administración"""
+    hoy = contexto['hoy']
+    nombre, url, parametros = rng.choice([
+        ('dashboard_admin', reverse('dashboard_admin'), None),
+        ('admin_reporte_stock_critico', reverse('admin_reporte_stock_critico'), {'ajax': '1'}),
+        ('api_comparativa_citas', reverse('api_comparativa_citas'), {
+            'fecha_inicio1': (hoy - timedelta(days=60)).isoformat(),
+            'fecha_fin1': (hoy - timedelta(days=31)).isoformat(),
+            'fecha_inicio2': (hoy - timedelta(days=30)).isoformat(),
+            'fecha_fin2': hoy.isoformat(),
+        }),
+    ])
+    inicio = time_module.perf_counter()
+    estado, _ = cliente.get(url, parametros)
+    yield nombre, estado, time_module.perf_counter() - inicio, estado == 200
+
+
+ACCIONES = {
+    'paciente': accion_paciente,
+    'farmaceutico': accion_farmaceutico,
+    'administrador': accion_administrador,
+}
+
+
+def repartir_hilos(total_hilos, mezcla):
+    """Asigna a cada hilo un perfil respetando los pesos de la mezcla"""
+    peso_total = sum(mezcla.values())
+    cantidades = {
+        perfil: max(1, round(total_hilos * peso / peso_total))
+        for perfil, peso in mezcla.items() if peso
+    }
+    # Ajustar el redondeo quitando hilos al perfil más numeroso, sin dejar perfiles vacíos
+    while sum(cantidades.values()) > max(total_hilos, len(cantidades)):
+        cantidades[max(cantidades, key=cantidades.get)] -= 1
+    return [perfil for perfil, cantidad in cantidades.items() for _ in range(cantidad)]
+
+
+def ejecutar_carga(contexto, hilos=8, duracion=10, mezcla=None, url_base=None, semilla=7):
+    """
+    Lanza los hilos de carga durante ``duracion`` segundos.
+
+    Returns:
+        dict: Duración real, total de peticiones y métricas por endpoint
+    """
+    perfiles = repartir_hilos(hilos, mezcla or MEZCLA_POR_DEFECTO)
+    muestras = defaultdict(list)
+    errores = defaultdict(int)
+    excepciones = []
+    candado = threading.Lock()
+    barrera = threading.Barrier(len(perfiles) + 1)
+
+    def trabajador(indice, perfil):
+        rng = random.Random(semilla + indice)
+        usuarios = contexto['usuarios'][perfil]
+        cliente = None
+        try:
+            usuario = usuarios[indice % len(usuarios)]
+            cliente = ClienteHTTP(usuario, url_base) if url_base else ClienteWSGI(usuario)
+            barrera.wait()
+            limite = time_module.monotonic() + duracion
+            while time_module.monotonic() < limite:
+                for nombre, estado, segundos, correcto in ACCIONES[perfil](cliente, contexto, rng):
+                    with candado:
+                        muestras[nombre].append(segundos * 1000)
+                        if not correcto:
+                            errores[nombre] += 1
+        except threading.BrokenBarrierError:
+            pass
+        except Exception as error:
+            with candado:
+                excepciones.append(f'{perfil}#{indice}: {error!r}')
+            barrera.abort()
+        finally:
+            if cliente:
+                cliente.cerrar()
+
+    trabajadores = [
+        threading.Thread(target=trabajador, args=(i, perfil), daemon=True)
+        for i, perfil in enumerate(perfiles)
+    ]
+    for hilo in trabajadores:
+        hilo.start()
+    try:
+        barrera.wait()
+    except threading.BrokenBarrierError:
+        pass
+    inicio = time_module.monotonic()
+    for hilo in trabajadores:
+        hilo.join()
+    transcurrido = time_module.monotonic() - inicio
+
+    total = sum(len(valores) for valores in muestras.values())
+    return {
+        'hilos': dict((perfil, perfiles.count(perfil)) for perfil in set(perfiles)),
+        'duracion_s': round(transcurrido, 2),
+        'peticiones': total,
+        'rendimiento_rps': round(total / transcurrido, 2) if transcurrido else 0.0,
+        'excepciones': excepciones,
+        'endpoints': {
+            nombre: {
+                'peticiones': len(valores),
+                'errores': errores[nombre],
+                'p50_ms': round(percentil(valores, 50), 2),
+                'p95_ms': round(percentil(valores, 95), 2),
+                'p99_ms': round(percentil(valores, 99), 2),
+            }
+            for nombre, valores in sorted(muestras.items())
+        },
+    }
+
+
+def verificar_consistencia():
+    """
+    Verifica los invariantes que las carreras suelen romper.
+
+    Returns:
+        dict: Cantidad de citas activas solapadas para un mismo médico,
+              medicamentos con stock negativo y detalles dispensados por
+              encima de lo prescrito
+    """
+    solapadas = Cita.objects.filter(estado__in=ESTADOS_CITA_ACTIVOS).filter(
+        Exists(
+            Cita.objects.filter(
+                medico_id=OuterRef('medico_id'),
+                fecha=OuterRef('fecha'),
+                estado__in=ESTADOS_CITA_ACTIVOS,
+                hora_inicio__lt=OuterRef('hora_fin'),
+                hora_fin__gt=OuterRef('hora_inicio'),
+            ).exclude(pk=OuterRef('pk'))
+        )
+    ).count()
+    return {
+        'citas_solapadas': solapadas,
+        'stock_negativo': Medicamento.objects.filter(stock_actual__lt=0).count(),
+        'sobre_dispensados': DetalleReceta.objects.filter(
+            cantidad_dispensada__gt=F('cantidad_prescrita')
+        ).count(),
+    }
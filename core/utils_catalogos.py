@@ -0,0 +1,159 @@
+"""
+Caché en memoria de catálogos que casi nunca cambian (especialidades,
+consultorios y roles).
+
+Cada proceso guarda el catálogo completo como estructuras inmutables (tupla
+ordenada e índices por id y por nombre) junto a una versión. La versión vive
+en la caché compartida (CACHES['default']): las señales post_save/post_delete
+la cambian, y cada worker, al notar una versión distinta, recarga el catálogo
+en la siguiente consulta. La versión compartida se revisa como máximo cada
+``CATALOGOS_REVISION_SEGUNDOS`` para no agregar una lectura de caché por acceso.
+"""
+import threading
+import time as time_module
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class Catalogo:
+    """Vista inmutable de todas las filas de un modelo de catálogo"""
+
+    def __init__(self, modelo, objetos, campo_nombre, orden):
+        self.modelo = modelo
+        self.campo_nombre = campo_nombre
+        self.todos = tuple(sorted(objetos, key=lambda objeto: getattr(objeto, orden)))
+        self.por_id = MappingProxyType({objeto.pk: objeto for objeto in self.todos})
+        self.por_nombre = MappingProxyType({
+            getattr(objeto, campo_nombre).strip().lower(): objeto for objeto in reversed(self.todos)
+        })
+
+    def obtener(self, pk):
+        """Como ``Modelo.objects.get(pk=...)``: lanza DoesNotExist si no existe"""
+        try:
+            return self.por_id[int(pk)]
+        except (KeyError, TypeError, ValueError):
+            raise self.modelo.DoesNotExist(f'{self.modelo.__name__} {pk} no existe')
+
+    def buscar(self, nombre):
+        """Primer objeto cuyo nombre es ``nombre`` o lo contiene, sin distinguir mayúsculas"""
+        nombre = nombre.strip().lower()
+        if nombre in self.por_nombre:
+            return self.por_nombre[nombre]
+        for objeto in self.todos:
+            if nombre in getattr(objeto, self.campo_nombre).lower():
+                return objeto
+        raise self.modelo.DoesNotExist(f'{self.modelo.__name__} "{nombre}" no existe')
+
+    def filtrar(self, **condiciones):
+        """Objetos cuyos atributos coinciden exactamente, en el orden del catálogo"""
+        return tuple(
+            objeto for objeto in self.todos
+            if all(getattr(objeto, campo) == valor for campo, valor in condiciones.items())
+        )
+
+    def primero(self):
+        return self.todos[0] if self.todos else None
+
+    def __iter__(self):
+        return iter(self.todos)
+
+    def __len__(self):
+        return len(self.todos)
+
+
+# nombre del catálogo -> (modelo, campo de nombre, campo de orden)
+CATALOGOS = {
+    'especialidad': ('Especialidad', 'nombre', 'nombre'),
+    'consultorio': ('Consultorio', 'codigo', 'pk'),
+    'rol': ('Rol', 'nombre', 'nombre'),
+}
+
+_candado = threading.Lock()
+# nombre -> (versión, Catalogo, momento de la última revisión de la versión)
+_locales = {}
+
+
+def _clave_version(nombre):
+    return f'catalogos:version:{nombre}'
+
+
+def catalogo(nombre):
+    """Devuelve el catálogo ``nombre``, recargándolo si otro proceso lo invalidó"""
+    from django.apps import apps
+
+    def construir():
+        nombre_modelo, campo_nombre, orden = CATALOGOS[nombre]
+        modelo = apps.get_model('core', nombre_modelo)
+        return Catalogo(modelo, modelo.objects.all(), campo_nombre, orden)
+
+    return en_cache_local(nombre, construir)
+
+
+def version_compartida(nombre):
+    """Versión vigente de ``nombre`` en la caché compartida (se crea si no existe)"""
+    version = cache.get(_clave_version(nombre))
+    if version is None:
+        version = time_module.time_ns()
+        cache.add(_clave_version(nombre), version, timeout=None)
+        version = cache.get(_clave_version(nombre), version)
+    return version
+
+
+def en_cache_local(nombre, construir):
+    """
+    Devuelve la estructura local ``nombre``, reconstruyéndola con ``construir()``
+    cuando su versión compartida cambió (ver invalidar_catalogo). Sirve también
+    para índices derivados de un catálogo, como el de búsqueda de medicamentos.
+    """
+    ahora = time_module.monotonic()
+    revision = getattr(settings, 'CATALOGOS_REVISION_SEGUNDOS', 5)
+    local = _locales.get(nombre)
+    if local and ahora - local[2] < revision:
+        return local[1]
+
+    version = version_compartida(nombre)
+    if local and local[0] == version:
+        _locales[nombre] = (version, local[1], ahora)
+        return local[1]
+
+    nuevo = construir()
+    with _candado:
+        _locales[nombre] = (version, nuevo, ahora)
+    return nuevo
+
+
+def _cambiar_version(nombre):
+    with _candado:
+        _locales.pop(nombre, None)
+    cache.set(_clave_version(nombre), time_module.time_ns(), timeout=None)
+
+
+def invalidar_catalogo(nombre):
+    """
+    Fuerza la recarga del catálogo en todos los procesos. Se invalida al
+    instante y otra vez al confirmar la transacción, para que ningún worker
+    se quede con datos leídos antes del commit.
+    """
+    _cambiar_version(nombre)
+    transaction.on_commit(lambda: _cambiar_version(nombre))
+
+
+def limpiar_catalogos():
+    """Vacía la caché local del proceso (pruebas)"""
+    with _candado:
+        _locales.clear()
+
+
+def especialidades():
+    return catalogo('especialidad')
+
+
+def consultorios():
+    return catalogo('consultorio')
+
+
+def roles():
+    return catalogo('rol')
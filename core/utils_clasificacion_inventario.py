@@ -0,0 +1,189 @@
+"""
+Clasificación ABC/XYZ del inventario de farmacia.
+
+Una consulta agrupada por medicamento y mes (``TruncMonth``) trae las unidades
+dispensadas de los últimos ``INVENTARIO_CLASIFICACION_MESES`` meses completos;
+con ellas se arma una matriz medicamentos x meses en NumPy y se clasifica todo
+el catálogo a la vez:
+
+- ABC por valor de consumo (unidades x precio): ordenados de mayor a menor,
+  son A los que empiezan antes del 80% del valor acumulado, B antes del 95% y
+  C el resto (y todos los que no se consumieron).
+- XYZ por el coeficiente de variación de la demanda mensual: X hasta 0.5,
+  Y hasta 1.0 y Z por encima (o sin consumo).
+
+El resultado se guarda en ClasificacionInventario (comando
+``clasificar_inventario``, pensado para ejecutarse cada noche), así los
+reportes y filtros del inventario ordenan y filtran por clase con un JOIN
+indexado en lugar de recalcular el historial.
+"""
+from datetime import datetime, time
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+CLASES_ABC = ('A', 'B', 'C')
+CLASES_XYZ = ('X', 'Y', 'Z')
+
+
+def parametros_clasificacion():
+    return {
+        'meses': getattr(settings, 'INVENTARIO_CLASIFICACION_MESES', 12),
+        'limites_abc': getattr(settings, 'INVENTARIO_LIMITES_ABC', (0.80, 0.95)),
+        'limites_xyz': getattr(settings, 'INVENTARIO_LIMITES_XYZ', (0.5, 1.0)),
+    }
+
+
+def _sumar_meses(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return fecha.replace(year=indice // 12, month=indice % 12 + 1, day=1)
+
+
+def matriz_consumo_mensual(medicamento_ids, meses, hasta=None):
+    """
+    Unidades dispensadas por medicamento en los ``meses`` completos anteriores al mes de ``hasta``
+
+    Returns:
+        numpy.ndarray: Matriz (len(medicamento_ids), meses), una fila por medicamento
+    """
+    from .models import DetalleReceta
+
+    fin = (hasta or timezone.localdate()).replace(day=1)
+    inicio = _sumar_meses(fin, -meses)
+    zona = timezone.get_current_timezone()
+    fila = {medicamento_id: i for i, medicamento_id in enumerate(medicamento_ids)}
+    consumo = np.zeros((len(medicamento_ids), meses))
+    filas = (
+        DetalleReceta.objects.filter(
+            fecha_dispensacion__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+            fecha_dispensacion__lt=timezone.make_aware(datetime.combine(fin, time.min)),
+            cantidad_dispensada__gt=0,
+        ).annotate(mes=TruncMonth('fecha_dispensacion', tzinfo=zona))
+        .values('medicamento_id', 'mes').annotate(total=models.Sum('cantidad_dispensada'))
+        .order_by().values_list('medicamento_id', 'mes', 'total')
+    )
+    for medicamento_id, mes, total in filas:
+        if medicamento_id in fila:
+            mes = timezone.localtime(mes, zona).date() if isinstance(mes, datetime) else mes
+            consumo[fila[medicamento_id], (mes.year - inicio.year) * 12 + mes.month - inicio.month] += total
+    return consumo
+
+
+def clasificar(consumo, precios, limites_abc=(0.80, 0.95), limites_xyz=(0.5, 1.0)):
+    """
+    Clases ABC y XYZ de cada fila de ``consumo``
+
+    Args:
+        consumo (numpy.ndarray): Unidades por medicamento (filas) y período (columnas)
+        precios (numpy.ndarray): Precio unitario de cada medicamento
+
+    Returns:
+        dict: Arreglos 'abc', 'xyz', 'unidades', 'valor', 'acumulada' y 'variacion'
+              (NaN sin consumo), alineados con las filas
+    """
+    unidades = consumo.sum(axis=1)
+    valor = unidades * precios
+    total = valor.sum()
+    orden = np.argsort(-valor, kind='stable')
+    acumulada = np.ones(len(valor))
+    previa = np.ones(len(valor))
+    if total > 0:
+        acumulada[orden] = np.cumsum(valor[orden]) / total
+        # Fracción acumulada antes de sumar el propio medicamento: el que cruza el límite queda dentro
+        previa = acumulada - valor / total
+    abc = np.select(
+        [valor <= 0, previa < limites_abc[0], previa < limites_abc[1]], ['C', 'A', 'B'], default='C'
+    )
+
+    media = consumo.mean(axis=1)
+    desviacion = consumo.std(axis=1, ddof=1) if consumo.shape[1] > 1 else np.zeros(len(media))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variacion = np.where(media > 0, desviacion / media, np.nan)
+    xyz = np.select(
+        [np.isnan(variacion), variacion <= limites_xyz[0], variacion <= limites_xyz[1]], ['Z', 'X', 'Y'], default='Z'
+    )
+    return {'abc': abc, 'xyz': xyz, 'unidades': unidades, 'valor': valor, 'acumulada': acumulada, 'variacion': variacion}
+
+
+def clasificar_inventario(hasta=None):
+    """
+    Recalcula ClasificacionInventario para todos los medicamentos activos
+
+    Returns:
+        int: Medicamentos clasificados
+    """
+    from .models import ClasificacionInventario, Medicamento
+
+    parametros = parametros_clasificacion()
+    medicamentos = list(
+        Medicamento.objects.filter(activo=True).order_by('pk').values_list('id', 'stock_actual', 'precio_unitario')
+    )
+    ids = [medicamento_id for medicamento_id, _, _ in medicamentos]
+    consumo = matriz_consumo_mensual(ids, parametros['meses'], hasta)
+    clases = clasificar(
+        consumo, np.array([float(precio) for _, _, precio in medicamentos]),
+        parametros['limites_abc'], parametros['limites_xyz'],
+    )
+
+    ahora = timezone.now()
+    filas = []
+    for i, (medicamento_id, stock, precio) in enumerate(medicamentos):
+        unidades = int(clases['unidades'][i])
+        variacion = clases['variacion'][i]
+        filas.append(ClasificacionInventario(
+            medicamento_id=medicamento_id,
+            clase_abc=str(clases['abc'][i]),
+            clase_xyz=str(clases['xyz'][i]),
+            unidades_consumidas=unidades,
+            # Los importes se calculan con Decimal; NumPy solo decide las clases
+            valor_consumo=precio * unidades,
+            participacion_acumulada=round(float(clases['acumulada'][i]), 6),
+            coeficiente_variacion=None if np.isnan(variacion) else round(float(variacion), 4),
+            valor_inventario=precio * max(stock, 0),
+            calculado_en=ahora,
+        ))
+    with transaction.atomic():
+        ClasificacionInventario.objects.exclude(medicamento_id__in=ids).delete()
+        ClasificacionInventario.objects.bulk_create(
+            filas, batch_size=1000, update_conflicts=True, unique_fields=['medicamento'],
+            update_fields=[
+                'clase_abc', 'clase_xyz', 'unidades_consumidas', 'valor_consumo', 'participacion_acumulada',
+                'coeficiente_variacion', 'valor_inventario', 'calculado_en',
+            ],
+        )
+    return len(filas)
+
+
+def matriz_clasificacion():
+    """
+    Resumen ABC x XYZ para los reportes
+
+    Returns:
+        list: Una fila por clase ABC: {'clase', 'celdas': [{'clase_xyz', 'medicamentos',
+              'valor_consumo', 'valor_inventario'}, ...], 'medicamentos', 'valor_consumo',
+              'valor_inventario'}
+    """
+    from .models import ClasificacionInventario
+
+    celdas = {
+        (fila['clase_abc'], fila['clase_xyz']): fila
+        for fila in ClasificacionInventario.objects.values('clase_abc', 'clase_xyz').annotate(
+            medicamentos=models.Count('id'),
+            valor_consumo=models.Sum('valor_consumo'),
+            valor_inventario=models.Sum('valor_inventario'),
+        ).order_by()
+    }
+    vacia = {'medicamentos': 0, 'valor_consumo': Decimal(0), 'valor_inventario': Decimal(0)}
+    resumen = []
+    for abc in CLASES_ABC:
+        fila = [{**vacia, 'clase_xyz': xyz, **celdas.get((abc, xyz), {})} for xyz in CLASES_XYZ]
+        resumen.append({
+            'clase': abc,
+            'celdas': fila,
+            **{campo: sum(celda[campo] for celda in fila) for campo in vacia},
+        })
+    return resumen
@@ -0,0 +1,151 @@
+"""
+Cola de trabajo de farmacia.
+
+Las recetas pendientes y vigentes se atienden en orden de prioridad: primero
+las urgentes, luego las que vencen antes y, a igual vencimiento, las más
+antiguas (``ORDEN_COLA``, cubierto por el índice parcial ``receta_cola_idx``).
+La cola se recorre con paginación por cursor (keyset): cada página filtra
+"después de la última fila vista" en lugar de usar OFFSET, así pedir la página
+siguiente cuesta lo mismo sin importar cuántas recetas hay en el historial.
+El cursor va firmado para que no se pueda fabricar.
+
+Para que dos farmacéuticos no atiendan la misma receta, abrirla la reserva con
+un UPDATE condicionado (libre, ya suya o con la reserva vencida a los
+``FARMACIA_RESERVA_RECETA_MINUTOS``); solo uno de dos intentos simultáneos
+modifica la fila.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import models
+from django.utils import timezone
+
+ORDEN_COLA = ('-urgente', 'fecha_limite', 'fecha_prescripcion', 'id')
+SAL_CURSOR = 'core.cola_recetas'
+
+
+class CursorInvalido(ValueError):
+    """El cursor no es de esta cola o fue modificado"""
+
+
+def _campos(orden):
+    return [campo.lstrip('-') for campo in orden]
+
+
+def codificar_cursor(objeto, orden):
+    """Cursor firmado con los valores de ``orden`` de la última fila de una página"""
+    valores = []
+    for campo in _campos(orden):
+        valor = getattr(objeto, campo)
+        valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else valor)
+    return signing.dumps([list(orden), valores], salt=SAL_CURSOR, compress=True)
+
+
+def leer_cursor(cursor, modelo, orden):
+    try:
+        orden_cursor, valores = signing.loads(cursor, salt=SAL_CURSOR)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise CursorInvalido('Cursor inválido')
+    if orden_cursor != list(orden) or len(valores) != len(orden):
+        raise CursorInvalido('El cursor corresponde a otro orden')
+    return [modelo._meta.get_field(campo).to_python(valor) for campo, valor in zip(_campos(orden), valores)]
+
+
+def _despues_de(orden, valores):
+    """Filas posteriores a ``valores`` en ``orden``: (a > x) o (a = x y b > y) o ..."""
+    condicion = models.Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        comparacion = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= models.Q(**iguales, **{f'{nombre}__{comparacion}': valor})
+        iguales[nombre] = valor
+    return condicion
+
+
+def paginar_por_cursor(consulta, orden, cursor=None, limite=25):
+    """
+    Página de ``consulta`` ordenada por ``orden`` (el último campo debe ser único)
+
+    Returns:
+        tuple: (lista de objetos, cursor de la página siguiente o None)
+
+    Raises:
+        CursorInvalido: Si ``cursor`` no es válido para este orden
+    """
+    consulta = consulta.order_by(*orden)
+    if cursor:
+        consulta = consulta.filter(_despues_de(orden, leer_cursor(cursor, consulta.model, orden)))
+    filas = list(consulta[:limite + 1])
+    siguiente = codificar_cursor(filas[limite - 1], orden) if len(filas) > limite else None
+    return filas[:limite], siguiente
+
+
+def cola_recetas(consulta=None):
+    """Recetas pendientes que aún pueden dispensarse"""
+    from .models import RecetaMedica
+
+    consulta = RecetaMedica.objects.all() if consulta is None else consulta
+    return consulta.filter(estado='pendiente', fecha_limite__gte=timezone.now())
+
+
+def _reservas_vencidas_antes():
+    return timezone.now() - timedelta(minutes=getattr(settings, 'FARMACIA_RESERVA_RECETA_MINUTOS', 10))
+
+
+def disponible_para(usuario):
+    """Condición: la receta no está reservada por otro farmacéutico"""
+    return (
+        models.Q(tomada_por__isnull=True) | models.Q(tomada_por=usuario)
+        | models.Q(tomada_en__lt=_reservas_vencidas_antes())
+    )
+
+
+def reservada_por_otro(receta, usuario):
+    return (
+        receta.tomada_por_id is not None and receta.tomada_por_id != usuario.pk
+        and receta.tomada_en >= _reservas_vencidas_antes()
+    )
+
+
+def tomar_receta(receta, usuario):
+    """
+    Reserva la receta para ``usuario`` (o renueva su reserva)
+
+    Returns:
+        bool: False si otro farmacéutico la tiene reservada o ya no está pendiente
+    """
+    from .models import RecetaMedica
+
+    ahora = timezone.now()
+    tomada = RecetaMedica.objects.filter(pk=receta.pk, estado='pendiente').filter(
+        disponible_para(usuario)
+    ).update(tomada_por=usuario, tomada_en=ahora)
+    if tomada:
+        receta.tomada_por, receta.tomada_en = usuario, ahora
+    return bool(tomada)
+
+
+def liberar_receta(receta, usuario):
+    """Quita la reserva de ``usuario`` sobre la receta"""
+    from .models import RecetaMedica
+
+    RecetaMedica.objects.filter(pk=receta.pk, tomada_por=usuario).update(tomada_por=None, tomada_en=None)
+    if receta.tomada_por_id == usuario.pk:
+        receta.tomada_por, receta.tomada_en = None, None
+
+
+def tomar_siguiente(usuario, intentos=5):
+    """
+    Reserva la receta más prioritaria que nadie está atendiendo
+
+    Returns:
+        RecetaMedica | None
+    """
+    candidatas = cola_recetas().filter(disponible_para(usuario)).order_by(*ORDEN_COLA)
+    for receta in candidatas[:intentos]:
+        # Si otro farmacéutico la tomó entre la lectura y la reserva, se pasa a la siguiente
+        if tomar_receta(receta, usuario):
+            return receta
+    return None
@@ -0,0 +1,106 @@
+"""
+Estadísticas del dashboard de farmacia, precalculadas y en caché.
+
+Las series de dispensaciones diarias salen de una sola consulta agrupada por
+día (``TruncDate``) sobre un rango de ``fecha_dispensacion`` (usa el índice
+por estado y fecha), completada con ceros para los días sin dispensaciones.
+Los resultados se guardan en la caché compartida con una clave versionada; la
+versión cambia cuando se registra una dispensación, un movimiento de
+inventario o una receta (ver ``invalidar_estadisticas``), y además vencen a los
+``FARMACIA_ESTADISTICAS_TTL`` segundos porque dependen de la fecha actual.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import utils_catalogos
+
+VERSION_ESTADISTICAS = 'estadisticas_farmacia'
+
+
+def dias_series():
+    """Longitudes de serie disponibles (FARMACIA_SERIE_DIAS)"""
+    return tuple(sorted(getattr(settings, 'FARMACIA_SERIE_DIAS', (7, 30, 90))))
+
+
+def invalidar_estadisticas():
+    utils_catalogos.invalidar_catalogo(VERSION_ESTADISTICAS)
+
+
+def en_cache(nombre, calcular):
+    """Valor ``nombre`` de la caché de farmacia; se recalcula con ``calcular()`` si falta o cambió la versión"""
+    clave = f'farmacia:{nombre}:{timezone.localdate().isoformat()}:{utils_catalogos.version_compartida(VERSION_ESTADISTICAS)}'
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, getattr(settings, 'FARMACIA_ESTADISTICAS_TTL', 300))
+    return valor
+
+
+def _calcular_series():
+    from .models import RecetaMedica
+
+    hoy = timezone.localdate()
+    maximo = dias_series()[-1]
+    inicio = hoy - timedelta(days=maximo - 1)
+    conteos = dict(
+        RecetaMedica.objects.filter(
+            estado='dispensada',
+            fecha_dispensacion__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+        ).annotate(dia=TruncDate('fecha_dispensacion', tzinfo=timezone.get_current_timezone()))
+        .values('dia').annotate(total=models.Count('id')).order_by().values_list('dia', 'total')
+    )
+    completa = [(inicio + timedelta(days=i), conteos.get(inicio + timedelta(days=i), 0)) for i in range(maximo)]
+    return {dias: completa[-dias:] for dias in dias_series()}
+
+
+def series_dispensaciones():
+    """
+    Returns:
+        dict: dias -> lista de (fecha, recetas dispensadas) terminando hoy, para cada FARMACIA_SERIE_DIAS
+    """
+    return en_cache('series', _calcular_series)
+
+
+def _calcular_resumen():
+    from .models import DetalleReceta, Medicamento, RecetaMedica
+    from .utils_vencimientos import medicamentos_por_vencer, resumen_vencimientos
+
+    ahora = timezone.now()
+    return {
+        'recetas_pendientes': RecetaMedica.objects.filter(estado='pendiente').count(),
+        'medicamentos_stock_critico': Medicamento.objects.filter(
+            activo=True, stock_actual__lte=models.F('stock_minimo')
+        ).count(),
+        # Vencidos o que vencen en 30 días, de la tabla que mantiene barrer_vencimientos
+        'medicamentos_proximos_vencer': medicamentos_por_vencer(30).count(),
+        'vencimientos': resumen_vencimientos(),
+        'medicamentos_populares': list(
+            DetalleReceta.objects.filter(receta__fecha_prescripcion__gte=ahora - timedelta(days=30))
+            .values('medicamento__nombre_comercial', 'medicamento__nombre_generico')
+            .annotate(total_prescrito=models.Sum('cantidad_prescrita'))
+            .order_by('-total_prescrito')[:5]
+        ),
+        'medicamentos_top': list(
+            DetalleReceta.objects.filter(fecha_dispensacion__gte=ahora - timedelta(days=7))
+            .values('medicamento__nombre_comercial')
+            .annotate(total=models.Sum('cantidad_dispensada'))
+            .order_by('-total')[:5]
+        ),
+    }
+
+
+def resumen_farmacia():
+    """
+    Returns:
+        dict: recetas_pendientes, recetas_dispensadas_hoy, medicamentos_stock_critico,
+              medicamentos_proximos_vencer, vencimientos (por tramo), medicamentos_populares
+              (30 días, prescritos) y medicamentos_top (7 días, dispensados)
+    """
+    resumen = dict(en_cache('resumen', _calcular_resumen))
+    resumen['recetas_dispensadas_hoy'] = series_dispensaciones()[dias_series()[0]][-1][1]
+    return resumen
@@ -0,0 +1,244 @@
+"""
+Bus de eventos de notificaciones en proceso para el stream SSE.
+
+Cada proceso (worker) tiene un único hilo que consulta la base de datos por
+todos sus suscriptores a la vez: notificaciones nuevas (por id creciente) y
+cambios de contador. Los distintos workers se coordinan a través de un archivo
+de señal: quien crea o lee notificaciones actualiza su fecha de modificación
+al confirmar la transacción, y el hilo solo consulta la base cuando ese
+archivo cambió (o cada ``EVENTOS_REVISION_MAXIMA`` segundos por seguridad).
+Con usuarios inactivos el costo es un ``os.stat`` por intervalo.
+
+Los resúmenes (notificaciones agrupadas) no cambian de id al sumar eventos:
+las filas ya entregadas que siguen sin leer y cuyo ``updated_at`` avanzó se
+envían como evento 'actualizacion'.
+"""
+import asyncio
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time as time_module
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# updated_at se fija antes del COMMIT: se vuelve a mirar este margen hacia atrás
+# para no perder actualizaciones que confirmaron después de la consulta anterior
+MARGEN_ACTUALIZACIONES = timedelta(seconds=5)
+
+
+def ruta_senal():
+    return Path(getattr(
+        settings, 'EVENTOS_ARCHIVO_SENAL', Path(tempfile.gettempdir()) / 'citame-notificaciones.senal'
+    ))
+
+
+def _tocar_senal():
+    try:
+        ruta = ruta_senal()
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.touch()
+    except OSError:
+        logger.warning('No se pudo actualizar el archivo de señal de notificaciones', exc_info=True)
+
+
+def senalar_cambio():
+    """Avisa a todos los workers que hay notificaciones o contadores nuevos"""
+    transaction.on_commit(_tocar_senal)
+
+
+def serializar_notificacion(notificacion):
+    datos = {
+        'id': notificacion['id'],
+        'mensaje': notificacion['mensaje'],
+        'tipo': notificacion['tipo'],
+        'importante': notificacion['importante'],
+        'url': notificacion['url_redireccion'],
+        'fecha_envio': notificacion['fecha_envio'].isoformat(),
+    }
+    if 'updated_at' in notificacion:
+        datos['actualizada'] = notificacion['updated_at'].isoformat()
+    return datos
+
+
+def consultar_cambios(usuario_ids, ultimo_id, contadores_conocidos, actualizadas_desde=None):
+    """
+    Busca en tres consultas los eventos pendientes de un conjunto de usuarios.
+
+    Args:
+        usuario_ids: Usuarios suscritos
+        ultimo_id (int): Mayor id de notificación ya entregado
+        contadores_conocidos (dict): Último contador enviado por usuario
+        actualizadas_desde (datetime): Marca de la consulta anterior; None
+            no busca actualizaciones (primera consulta)
+
+    Returns:
+        tuple: (eventos por usuario, nuevo último id, contadores actuales,
+               nueva marca de actualizaciones) donde cada evento es
+               (tipo, id o None, datos)
+    """
+    from .models import Notificacion, ContadorNotificaciones
+
+    inicio = timezone.now()
+    campos = ('id', 'usuario_id', 'mensaje', 'tipo', 'importante', 'url_redireccion', 'fecha_envio')
+    eventos = {}
+    if actualizadas_desde is not None:
+        # Solo filas ya entregadas: las nuevas llegan abajo como 'notificacion'
+        actualizadas = (
+            Notificacion.objects.filter(
+                pk__lte=ultimo_id, usuario_id__in=usuario_ids, leido=False, updated_at__gt=actualizadas_desde,
+            ).order_by('updated_at', 'pk')
+            .values(*campos, 'updated_at')
+        )
+        for notificacion in actualizadas:
+            eventos.setdefault(notificacion['usuario_id'], []).append(
+                ('actualizacion', None, serializar_notificacion(notificacion))
+            )
+
+    nuevas = (
+        Notificacion.objects.filter(pk__gt=ultimo_id, usuario_id__in=usuario_ids, leido=False)
+        .order_by('pk')
+        .values(*campos)
+    )
+    for notificacion in nuevas:
+        eventos.setdefault(notificacion['usuario_id'], []).append(
+            ('notificacion', notificacion['id'], serializar_notificacion(notificacion))
+        )
+        ultimo_id = max(ultimo_id, notificacion['id'])
+
+    contadores = dict(
+        ContadorNotificaciones.objects.filter(pk__in=usuario_ids).values_list('usuario_id', 'no_leidas')
+    )
+    for usuario_id, no_leidas in contadores.items():
+        if contadores_conocidos.get(usuario_id) != no_leidas:
+            eventos.setdefault(usuario_id, []).append(('contador', None, {'no_leidas': max(no_leidas, 0)}))
+    marca = inicio - MARGEN_ACTUALIZACIONES
+    if actualizadas_desde is not None:
+        marca = max(marca, actualizadas_desde)
+    return eventos, ultimo_id, contadores, marca
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión; se consume desde un hilo (WSGI)"""
+
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self.cola = queue.Queue(maxsize=100)
+
+    def entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except queue.Full:
+            pass
+
+    def esperar(self, timeout):
+        try:
+            return self.cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SuscripcionAsync(Suscripcion):
+    """Cola de eventos consumida desde el event loop (ASGI), sin ocupar hilos"""
+
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=100)
+
+    def _poner(self, evento):
+        if not self.cola.full():
+            self.cola.put_nowait(evento)
+
+    def entregar(self, evento):
+        self.loop.call_soon_threadsafe(self._poner, evento)
+
+    async def esperar(self, timeout):
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BusNotificaciones:
+    """Reparte a las suscripciones del proceso los cambios detectados por un único hilo"""
+
+    def __init__(self):
+        self.candado = threading.Lock()
+        self.suscripciones = {}
+        self.hilo = None
+        self.ultimo_id = None
+        self.actualizadas_desde = None
+        self.contadores = {}
+
+    def suscribir(self, suscripcion):
+        with self.candado:
+            self.suscripciones.setdefault(suscripcion.usuario_id, set()).add(suscripcion)
+            if self.hilo is None or not self.hilo.is_alive():
+                self.hilo = threading.Thread(target=self._ejecutar, name='bus-notificaciones', daemon=True)
+                self.hilo.start()
+
+    def desuscribir(self, suscripcion):
+        with self.candado:
+            suscripciones = self.suscripciones.get(suscripcion.usuario_id)
+            if suscripciones:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self.suscripciones[suscripcion.usuario_id]
+                    self.contadores.pop(suscripcion.usuario_id, None)
+
+    def _ejecutar(self):
+        from .models import Notificacion
+
+        intervalo = getattr(settings, 'EVENTOS_INTERVALO', 2)
+        revision_maxima = getattr(settings, 'EVENTOS_REVISION_MAXIMA', 30)
+        ultima_senal, ultima_revision = None, 0.0
+        try:
+            if self.ultimo_id is None:
+                self.actualizadas_desde = timezone.now()
+                self.ultimo_id = Notificacion.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            while True:
+                time_module.sleep(intervalo)
+                with self.candado:
+                    if not self.suscripciones:
+                        self.hilo = None
+                        return
+                    usuario_ids = list(self.suscripciones)
+                    nuevos = [uid for uid in usuario_ids if uid not in self.contadores]
+
+                try:
+                    senal = os.stat(ruta_senal()).st_mtime_ns
+                except OSError:
+                    senal = None
+                vencida = time_module.monotonic() - ultima_revision >= revision_maxima
+                if senal == ultima_senal and not nuevos and not vencida:
+                    continue
+                ultima_senal, ultima_revision = senal, time_module.monotonic()
+
+                close_old_connections()
+                eventos, self.ultimo_id, contadores, self.actualizadas_desde = consultar_cambios(
+                    usuario_ids, self.ultimo_id, self.contadores, self.actualizadas_desde
+                )
+                with self.candado:
+                    # Los usuarios sin fila de contador quedan como conocidos para no consultarlos en cada vuelta
+                    self.contadores.update({uid: contadores.get(uid) for uid in usuario_ids if uid in self.suscripciones})
+                    for usuario_id, eventos_usuario in eventos.items():
+                        for suscripcion in self.suscripciones.get(usuario_id, ()):
+                            for evento in eventos_usuario:
+                                suscripcion.entregar(evento)
+        except Exception:
+            logger.exception('El hilo del bus de notificaciones se detuvo')
+            with self.candado:
+                self.hilo = None
+        finally:
+            close_old_connections()
+
+
+bus = BusNotificaciones()
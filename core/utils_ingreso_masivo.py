@@ -0,0 +1,295 @@
+"""
+Ingreso masivo de mercadería desde la guía de remisión del proveedor (CSV).
+
+``validar_guia`` recorre el archivo fila por fila, valida el formato de cada
+línea y resuelve todos los códigos y lotes con una consulta por tabla; devuelve
+las líneas listas y los errores con su número de línea, y sirve además de
+vista previa (stock antes y después, lote nuevo o existente). ``aplicar_guia``
+registra todas las líneas en una sola transacción: bloquea los medicamentos en
+orden de id (mismo orden que utils_inventario), crea los lotes nuevos con un
+``bulk_create``, suma las cantidades a lotes y medicamentos con ``bulk_update``
+sobre expresiones F y guarda los MovimientoInventario con otro ``bulk_create``.
+
+Columnas: codigo y cantidad (obligatorias); lote, vencimiento (AAAA-MM-DD o
+DD/MM/AAAA) y precio_unitario (opcionales). Se aceptan ``,`` o ``;`` como
+separador.
+
+Entre la vista previa y el registro la guía se guarda en la caché
+(``guardar_guia``); la sesión solo conserva la clave.
+"""
+import csv
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+
+from .utils_estadisticas_farmacia import invalidar_estadisticas
+from .utils_inventario import _actualizar_vencimiento
+
+COLUMNAS_OBLIGATORIAS = ('codigo', 'cantidad')
+COLUMNAS_OPCIONALES = ('lote', 'vencimiento', 'precio_unitario')
+LARGO_LOTE = 50
+PRECIO_MAXIMO = Decimal('99999999.99')
+
+
+class GuiaInvalida(Exception):
+    """El archivo no se puede leer como guía (encabezado, tamaño); no hay errores por línea"""
+
+
+def _fecha(texto):
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Fecha de vencimiento inválida: {texto}')
+
+
+def _precio(texto):
+    try:
+        precio = Decimal(texto.replace(',', '.')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Precio inválido: {texto}')
+    if not Decimal(0) <= precio <= PRECIO_MAXIMO:
+        raise ValueError(f'Precio fuera de rango: {texto}')
+    return precio
+
+
+def _leer_fila(fila, hoy):
+    """Valida el formato de una fila; devuelve el dict de la línea o lanza ValueError"""
+    codigo = fila.get('codigo', '').strip()
+    if not codigo:
+        raise ValueError('Falta el código del medicamento')
+    try:
+        cantidad = int(fila.get('cantidad', '').strip())
+    except ValueError:
+        raise ValueError(f"Cantidad inválida: {fila.get('cantidad', '')}")
+    if cantidad <= 0:
+        raise ValueError('La cantidad debe ser positiva')
+    numero_lote = (fila.get('lote') or '').strip()
+    if len(numero_lote) > LARGO_LOTE:
+        raise ValueError(f'El lote supera los {LARGO_LOTE} caracteres')
+    texto = (fila.get('vencimiento') or '').strip()
+    vencimiento = _fecha(texto) if texto else None
+    if vencimiento and vencimiento < hoy:
+        raise ValueError(f'El lote venció el {vencimiento:%d/%m/%Y}')
+    texto = (fila.get('precio_unitario') or '').strip()
+    return {
+        'codigo': codigo,
+        'cantidad': cantidad,
+        'numero_lote': numero_lote,
+        'vencimiento': vencimiento,
+        'precio_unitario': _precio(texto) if texto else None,
+    }
+
+
+def validar_guia(archivo):
+    """
+    Valida una guía CSV sin modificar el inventario (vista previa)
+
+    Args:
+        archivo: Texto de la guía o iterable de líneas de texto
+
+    Returns:
+        dict: 'lineas' (dicts con numero, medicamento, cantidad, numero_lote,
+              vencimiento, precio_unitario, lote_nuevo, stock_anterior y
+              stock_nuevo), 'errores' (pares (numero de línea, mensaje)) y
+              'unidades' (total de unidades de las líneas válidas)
+
+    Raises:
+        GuiaInvalida: Encabezado sin las columnas obligatorias o demasiadas líneas
+    """
+    from .models import LoteMedicamento, Medicamento
+
+    if isinstance(archivo, str):
+        archivo = archivo.lstrip('\ufeff').splitlines()
+    filas = iter(archivo)
+    encabezado = next(filas, '')
+    separador = ';' if encabezado.count(';') > encabezado.count(',') else ','
+    columnas = [columna.strip().lower() for columna in next(csv.reader([encabezado], delimiter=separador), [])]
+    faltantes = [columna for columna in COLUMNAS_OBLIGATORIAS if columna not in columnas]
+    if faltantes:
+        raise GuiaInvalida(f"Faltan columnas en el encabezado: {', '.join(faltantes)}")
+    maximo = getattr(settings, 'INGRESO_MASIVO_MAX_LINEAS', 5000)
+
+    hoy = timezone.localdate()
+    lineas, errores = [], []
+    for numero, valores in enumerate(csv.reader(filas, delimiter=separador), start=2):
+        if not any(valor.strip() for valor in valores):
+            continue
+        if numero - 1 > maximo:
+            raise GuiaInvalida(f'La guía supera las {maximo} líneas')
+        try:
+            linea = _leer_fila(dict(zip(columnas, valores)), hoy)
+        except ValueError as error:
+            errores.append((numero, str(error)))
+            continue
+        linea['numero'] = numero
+        lineas.append(linea)
+
+    medicamentos = Medicamento.objects.in_bulk({linea['codigo'] for linea in lineas}, field_name='codigo')
+    validas = []
+    for linea in lineas:
+        medicamento = medicamentos.get(linea.pop('codigo'))
+        if medicamento is None:
+            errores.append((linea['numero'], 'Medicamento no encontrado'))
+        elif not medicamento.activo:
+            errores.append((linea['numero'], f'{medicamento.nombre_comercial} está inactivo'))
+        else:
+            linea['medicamento'] = medicamento
+            # Sin número de lote se agrupa por vencimiento, igual que registrar_entrada
+            linea['vencimiento'] = linea['vencimiento'] or medicamento.fecha_vencimiento
+            linea['numero_lote'] = linea['numero_lote'] or f"S/N-{linea['vencimiento']:%Y%m%d}"
+            validas.append(linea)
+
+    existentes = {
+        (lote.medicamento_id, lote.numero_lote): lote
+        for lote in LoteMedicamento.objects.filter(
+            medicamento_id__in={linea['medicamento'].pk for linea in validas},
+            numero_lote__in={linea['numero_lote'] for linea in validas},
+        )
+    }
+    # Lotes nuevos ya vistos en la guía: una línea posterior debe traer el mismo vencimiento
+    en_guia = {}
+    stock = {}
+    lineas = []
+    for linea in validas:
+        medicamento = linea['medicamento']
+        clave = (medicamento.pk, linea['numero_lote'])
+        lote = existentes.get(clave)
+        if lote is not None and lote.fecha_vencimiento != linea['vencimiento']:
+            errores.append((linea['numero'], (
+                f"El lote {lote.numero_lote} ya existe con vencimiento {lote.fecha_vencimiento:%d/%m/%Y}"
+            )))
+            continue
+        previa = en_guia.setdefault(clave, linea) if lote is None else None
+        if previa is not None and previa['vencimiento'] != linea['vencimiento']:
+            errores.append((linea['numero'], (
+                f"El lote {linea['numero_lote']} figura en la línea {previa['numero']} "
+                f"con vencimiento {previa['vencimiento']:%d/%m/%Y}"
+            )))
+            continue
+        linea['lote_nuevo'] = lote is None
+        linea['stock_anterior'] = stock.get(medicamento.pk, medicamento.stock_actual)
+        linea['stock_nuevo'] = stock[medicamento.pk] = linea['stock_anterior'] + linea['cantidad']
+        lineas.append(linea)
+
+    errores.sort()
+    return {'lineas': lineas, 'errores': errores, 'unidades': sum(linea['cantidad'] for linea in lineas)}
+
+
+def _clave_guia(referencia):
+    return f'guia_ingreso:{referencia}'
+
+
+def guardar_guia(texto):
+    """
+    Guarda el texto de la guía hasta que se registre o venza (``INGRESO_MASIVO_GUIA_TTL``)
+
+    Returns:
+        str: Referencia para ``obtener_guia``
+    """
+    referencia = uuid.uuid4().hex
+    cache.set(_clave_guia(referencia), texto, getattr(settings, 'INGRESO_MASIVO_GUIA_TTL', 3600))
+    return referencia
+
+
+def obtener_guia(referencia):
+    """Texto de la guía guardada, o None si la referencia no existe o venció"""
+    return cache.get(_clave_guia(referencia)) if referencia else None
+
+
+def descartar_guia(referencia):
+    if referencia:
+        cache.delete(_clave_guia(referencia))
+
+
+def aplicar_guia(lineas, usuario=None, proveedor='', numero_factura='', motivo='Ingreso por guía de remisión'):
+    """
+    Registra en una transacción las líneas devueltas por ``validar_guia``
+
+    El stock anterior y nuevo de cada movimiento se recalcula con los valores
+    bloqueados, así es exacto aunque el inventario cambió desde la vista previa.
+
+    Returns:
+        list: MovimientoInventario creados, en el orden de ``lineas``
+    """
+    from .models import LoteMedicamento, Medicamento, MovimientoInventario
+
+    if not lineas:
+        return []
+    ids = sorted({linea['medicamento'].pk for linea in lineas})
+    ahora = timezone.now()
+    with transaction.atomic():
+        stock = dict(
+            Medicamento.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'stock_actual')
+        )
+        lotes = {
+            (lote.medicamento_id, lote.numero_lote): lote
+            for lote in LoteMedicamento.objects.filter(
+                medicamento_id__in=ids, numero_lote__in={linea['numero_lote'] for linea in lineas},
+            )
+        }
+        nuevos, sumas, precios, movimientos = [], {}, {}, []
+        for linea in lineas:
+            pk = linea['medicamento'].pk
+            clave = (pk, linea['numero_lote'])
+            if clave not in lotes:
+                lotes[clave] = LoteMedicamento(
+                    medicamento_id=pk, numero_lote=linea['numero_lote'],
+                    fecha_vencimiento=linea['vencimiento'], cantidad=0,
+                )
+                nuevos.append(lotes[clave])
+            sumas[clave] = sumas.get(clave, 0) + linea['cantidad']
+            if linea['precio_unitario'] is not None:
+                precios[pk] = linea['precio_unitario']
+            anterior = stock[pk]
+            stock[pk] += linea['cantidad']
+            movimientos.append(MovimientoInventario(
+                medicamento=linea['medicamento'],
+                usuario=usuario,
+                tipo_movimiento='entrada',
+                cantidad=linea['cantidad'],
+                motivo=motivo,
+                lote_referencia=linea['numero_lote'],
+                proveedor=proveedor,
+                numero_factura=numero_factura,
+                precio_unitario_momento=linea['precio_unitario'],
+                stock_anterior=anterior,
+                stock_nuevo=stock[pk],
+            ))
+
+        # Los lotes nuevos se crean vacíos y reciben su cantidad junto con los existentes
+        LoteMedicamento.objects.bulk_create(nuevos, batch_size=500)
+        existentes = []
+        for clave, cantidad in sumas.items():
+            lote = lotes[clave]
+            existentes.append(LoteMedicamento(pk=lote.pk, cantidad=models.F('cantidad') + cantidad))
+        LoteMedicamento.objects.bulk_update(existentes, ['cantidad'], batch_size=500)
+
+        entradas = {}
+        for linea in lineas:
+            entradas[linea['medicamento'].pk] = entradas.get(linea['medicamento'].pk, 0) + linea['cantidad']
+        Medicamento.objects.bulk_update([
+            Medicamento(
+                pk=pk,
+                stock_actual=models.F('stock_actual') + cantidad,
+                precio_unitario=precios.get(pk, models.F('precio_unitario')),
+                updated_at=ahora,
+            )
+            for pk, cantidad in entradas.items()
+        ], ['stock_actual', 'precio_unitario', 'updated_at'], batch_size=500)
+        _actualizar_vencimiento(*ids)
+
+        for movimiento, linea in zip(movimientos, lineas):
+            movimiento.lote = lotes[(linea['medicamento'].pk, linea['numero_lote'])]
+        MovimientoInventario.objects.bulk_create(movimientos, batch_size=500)
+        invalidar_estadisticas()
+
+    for linea in lineas:
+        linea['medicamento'].stock_actual = stock[linea['medicamento'].pk]
+    return movimientos
@@ -0,0 +1,323 @@
+"""
+Movimientos de inventario de farmacia sin condiciones de carrera.
+
+El stock nunca se lee, modifica y guarda desde Python: cada línea se aplica
+con un ``UPDATE ... SET stock_actual = stock_actual ± n`` condicionado a que
+alcance el stock (``WHERE stock_actual >= n`` en las salidas), y el stock
+resultante se obtiene con ``RETURNING`` cuando la base de datos lo permite.
+Todas las líneas de una operación (p. ej. una receta completa) van en una
+sola transacción y en orden de ``medicamento_id``, de modo que dos
+dispensaciones simultáneas bloquean las filas en el mismo orden y no se
+producen interbloqueos. Los MovimientoInventario se insertan en un solo
+``bulk_create`` con el stock anterior y nuevo exactos.
+
+Las existencias se llevan por lote (LoteMedicamento): las entradas crean o
+incrementan un lote y las salidas se reparten entre lotes primero el que vence
+antes (FEFO), generando un movimiento por lote. ``Medicamento.stock_actual``
+sigue siendo el total desnormalizado, así las búsquedas del catálogo leen una
+sola tabla.
+"""
+from datetime import date
+
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .utils_estadisticas_farmacia import invalidar_estadisticas
+
+TIPOS_ENTRADA = ('entrada', 'ajuste_positivo', 'devolucion')
+TIPOS_SALIDA = ('salida', 'ajuste_negativo', 'vencimiento', 'dañado')
+
+
+class StockInsuficiente(Exception):
+    """Una salida pide más unidades de las disponibles; la operación completa se revierte"""
+
+    def __init__(self, medicamento, cantidad):
+        self.medicamento = medicamento
+        self.cantidad = cantidad
+        nombre = getattr(medicamento, 'nombre_comercial', medicamento)
+        super().__init__(f'No hay suficiente stock de {nombre}')
+
+
+def _soporta_returning():
+    # MariaDB/MySQL no admiten UPDATE ... RETURNING
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def _actualizar_stock(medicamento_id, delta, campos_extra=None):
+    """
+    Suma ``delta`` al stock si el resultado no queda negativo
+
+    Returns:
+        int | None: Stock nuevo, o None si no alcanzaba
+    """
+    from .models import Medicamento
+
+    campos = {'updated_at': timezone.now(), **(campos_extra or {})}
+    if _soporta_returning():
+        q = connection.ops.quote_name
+        tabla, stock, pk = q(Medicamento._meta.db_table), q('stock_actual'), q(Medicamento._meta.pk.column)
+        asignaciones = ''.join(
+            f', {q(Medicamento._meta.get_field(campo).column)} = %s' for campo in campos
+        )
+        valores = [
+            Medicamento._meta.get_field(campo).get_db_prep_save(valor, connection)
+            for campo, valor in campos.items()
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {tabla} SET {stock} = {stock} + %s{asignaciones} '
+                f'WHERE {pk} = %s AND {stock} + %s >= 0 RETURNING {stock}',
+                [delta, *valores, medicamento_id, delta],
+            )
+            fila = cursor.fetchone()
+        return fila[0] if fila else None
+
+    # El UPDATE deja la fila bloqueada hasta el final de la transacción: la lectura es consistente
+    filas = Medicamento.objects.filter(pk=medicamento_id, stock_actual__gte=-delta).update(
+        stock_actual=models.F('stock_actual') + delta, **campos
+    )
+    if not filas:
+        return None
+    return Medicamento.objects.filter(pk=medicamento_id).values_list('stock_actual', flat=True).get()
+
+
+def asignar_fefo(lotes, cantidad, sin_lote, numero_preferido=None, hoy=None):
+    """
+    Reparte ``cantidad`` entre los lotes, primero el que vence antes (FEFO)
+
+    Args:
+        lotes (list): LoteMedicamento con existencias, ordenados por vencimiento
+        cantidad (int): Unidades a retirar
+        sin_lote (int): Unidades del medicamento que no pertenecen a ningún lote
+        numero_preferido (str): Lote elegido por el usuario; se toma primero si existe
+        hoy (date): Si se indica, los lotes vencidos a esa fecha no se usan
+
+    Returns:
+        list | None: Pares (lote o None, unidades), o None si no alcanza
+    """
+    usables = [lote for lote in lotes if hoy is None or lote.fecha_vencimiento >= hoy]
+    usables.sort(key=lambda lote: lote.numero_lote != numero_preferido)
+    asignacion = []
+    for lote in usables:
+        if cantidad <= 0:
+            break
+        tomado = min(lote.cantidad, cantidad)
+        asignacion.append((lote, tomado))
+        cantidad -= tomado
+    # Lo que no cubren los lotes sale del stock sin lote (cargas anteriores a los lotes, ajustes)
+    if cantidad > 0:
+        if cantidad > sin_lote:
+            return None
+        asignacion.append((None, cantidad))
+    return asignacion
+
+
+def _retirar_de_lotes(medicamento, cantidad, stock_anterior, tipo_movimiento, numero_preferido):
+    from .models import LoteMedicamento
+
+    lotes = list(LoteMedicamento.objects.filter(medicamento_id=medicamento.pk, cantidad__gt=0))
+    sin_lote = max(stock_anterior - sum(lote.cantidad for lote in lotes), 0)
+    # Al paciente nunca se le entrega un lote vencido; las bajas por vencimiento o daño sí lo retiran
+    hoy = timezone.localdate() if tipo_movimiento == 'salida' else None
+    asignacion = asignar_fefo(lotes, cantidad, sin_lote, numero_preferido, hoy)
+    if asignacion is None:
+        raise StockInsuficiente(medicamento, cantidad)
+    for lote, tomado in asignacion:
+        if lote is not None:
+            LoteMedicamento.objects.filter(pk=lote.pk).update(cantidad=models.F('cantidad') - tomado)
+            lote.cantidad -= tomado
+    return asignacion
+
+
+def _ingresar_a_lote(medicamento, cantidad, numero_lote, vencimiento):
+    from .models import LoteMedicamento
+
+    lote, creado = LoteMedicamento.objects.get_or_create(
+        medicamento_id=medicamento.pk, numero_lote=numero_lote,
+        defaults={'fecha_vencimiento': vencimiento or medicamento.fecha_vencimiento, 'cantidad': cantidad},
+    )
+    if not creado:
+        LoteMedicamento.objects.filter(pk=lote.pk).update(cantidad=models.F('cantidad') + cantidad)
+        lote.cantidad += cantidad
+    return [(lote, cantidad)]
+
+
+def _actualizar_vencimiento(*medicamento_ids):
+    """Medicamento.fecha_vencimiento pasa a ser el vencimiento más próximo con existencias"""
+    from .models import LoteMedicamento, Medicamento
+
+    proximo = LoteMedicamento.objects.filter(
+        medicamento_id=models.OuterRef('pk'), cantidad__gt=0
+    ).order_by('fecha_vencimiento').values('fecha_vencimiento')[:1]
+    Medicamento.objects.filter(pk__in=medicamento_ids).update(
+        fecha_vencimiento=Coalesce(models.Subquery(proximo), models.F('fecha_vencimiento'))
+    )
+
+
+def _aplicar_lineas(lineas, usuario):
+    """Aplica las líneas y devuelve, por línea, la lista de movimientos (sin insertar)"""
+    from .models import MovimientoInventario
+
+    orden = sorted(range(len(lineas)), key=lambda i: lineas[i]['medicamento'].pk)
+    por_linea = [None] * len(lineas)
+    for i in orden:
+        linea = dict(lineas[i])
+        medicamento = linea.pop('medicamento')
+        numero_lote = linea.pop('numero_lote', None)
+        vencimiento_lote = linea.pop('vencimiento_lote', None)
+        cantidad = linea['cantidad']
+        if cantidad <= 0:
+            raise ValueError('La cantidad del movimiento debe ser positiva')
+        salida = linea['tipo_movimiento'] in TIPOS_SALIDA
+        delta = -cantidad if salida else cantidad
+        # Bloquea la fila del medicamento: los lotes de un mismo medicamento se tocan de a uno
+        stock_nuevo = _actualizar_stock(medicamento.pk, delta, linea.pop('actualizar', None))
+        if stock_nuevo is None:
+            raise StockInsuficiente(medicamento, cantidad)
+        stock = stock_nuevo - delta
+
+        if salida:
+            asignacion = _retirar_de_lotes(medicamento, cantidad, stock, linea['tipo_movimiento'], numero_lote)
+        elif numero_lote:
+            asignacion = _ingresar_a_lote(medicamento, cantidad, numero_lote, vencimiento_lote)
+        else:
+            asignacion = [(None, cantidad)]
+        if any(lote is not None for lote, _ in asignacion):
+            _actualizar_vencimiento(medicamento.pk)
+
+        medicamento.stock_actual = stock_nuevo
+        por_linea[i] = []
+        for lote, unidades in asignacion:
+            anterior, stock = stock, stock + (-unidades if salida else unidades)
+            por_linea[i].append(MovimientoInventario(
+                medicamento=medicamento,
+                usuario=usuario,
+                lote=lote,
+                stock_anterior=anterior,
+                stock_nuevo=stock,
+                **{
+                    **linea,
+                    'cantidad': unidades,
+                    'lote_referencia': lote.numero_lote if lote else linea.get('lote_referencia', ''),
+                },
+            ))
+    return por_linea
+
+
+def aplicar_movimientos(lineas, usuario=None):
+    """
+    Aplica varias líneas de inventario de forma atómica
+
+    Args:
+        lineas (list): Dicts con medicamento, tipo_movimiento, cantidad (positiva)
+                       y opcionalmente numero_lote y vencimiento_lote (lote al
+                       que entra o del que se prefiere sacar), motivo,
+                       lote_referencia, proveedor, precio_unitario_momento,
+                       numero_factura, observaciones y 'actualizar' (campos de
+                       Medicamento a fijar junto al stock)
+        usuario (Usuario): Responsable de los movimientos
+
+    Returns:
+        list: MovimientoInventario creados, en el orden de ``lineas``; una
+              salida que abarca varios lotes genera un movimiento por lote
+
+    Raises:
+        StockInsuficiente: Si alguna salida no alcanza; no se aplica ninguna línea
+    """
+    from .models import MovimientoInventario
+
+    with transaction.atomic():
+        movimientos = [movimiento for grupo in _aplicar_lineas(lineas, usuario) for movimiento in grupo]
+        MovimientoInventario.objects.bulk_create(movimientos)
+        invalidar_estadisticas()
+    return movimientos
+
+
+def dispensar_detalles(receta, cantidades, usuario=None):
+    """
+    Dispensa en una transacción varias líneas de una receta, repartiendo cada
+    una entre los lotes vigentes por orden de vencimiento
+
+    Args:
+        receta (RecetaMedica): Receta dispensada
+        cantidades (list): Tuplas (detalle, cantidad, lote preferido); se ignoran cantidades <= 0
+        usuario (Usuario): Farmacéutico (por defecto el de la receta)
+
+    Returns:
+        list: MovimientoInventario creados
+
+    Raises:
+        StockInsuficiente: Nada queda dispensado
+    """
+    from .models import DetalleReceta, MovimientoInventario
+
+    cantidades = [(detalle, cantidad, lote) for detalle, cantidad, lote in cantidades if cantidad > 0]
+    ahora = timezone.now()
+    with transaction.atomic():
+        por_linea = _aplicar_lineas([
+            {
+                'medicamento': detalle.medicamento,
+                'tipo_movimiento': 'salida',
+                'cantidad': cantidad,
+                'numero_lote': lote or None,
+                'motivo': f'Dispensación receta {receta.codigo_receta}',
+                'lote_referencia': lote,
+            }
+            for detalle, cantidad, lote in cantidades
+        ], usuario or receta.farmaceutico)
+        movimientos = [movimiento for grupo in por_linea for movimiento in grupo]
+        MovimientoInventario.objects.bulk_create(movimientos)
+        invalidar_estadisticas()
+        for (detalle, cantidad, _), grupo in zip(cantidades, por_linea):
+            lotes = ', '.join(dict.fromkeys(m.lote_referencia for m in grupo if m.lote_referencia))
+            campos = {'cantidad_dispensada': models.F('cantidad_dispensada') + cantidad, 'fecha_dispensacion': ahora}
+            if lotes:
+                campos['lote_dispensado'] = lotes[:50]
+            DetalleReceta.objects.filter(pk=detalle.pk).update(**campos)
+            detalle.cantidad_dispensada += cantidad
+            detalle.fecha_dispensacion = ahora
+            if lotes:
+                detalle.lote_dispensado = lotes[:50]
+    return movimientos
+
+
+def registrar_entrada(medicamento, cantidad, usuario=None, numero_lote='', fecha_vencimiento=None,
+                      precio_unitario=None, **datos):
+    """
+    Ingreso de mercadería a un lote (se crea si no existe). Sin número de lote
+    se agrupa por vencimiento en un lote 'S/N-AAAAMMDD'.
+    """
+    if isinstance(fecha_vencimiento, str):
+        fecha_vencimiento = date.fromisoformat(fecha_vencimiento) if fecha_vencimiento else None
+    fecha_vencimiento = fecha_vencimiento or medicamento.fecha_vencimiento
+    actualizar = {'precio_unitario': precio_unitario} if precio_unitario else {}
+    movimiento, = aplicar_movimientos([{
+        'medicamento': medicamento,
+        'tipo_movimiento': 'entrada',
+        'cantidad': cantidad,
+        'numero_lote': numero_lote.strip() or f'S/N-{fecha_vencimiento:%Y%m%d}',
+        'vencimiento_lote': fecha_vencimiento,
+        'precio_unitario_momento': precio_unitario or None,
+        'actualizar': actualizar,
+        **datos,
+    }], usuario=usuario)
+    return movimiento
+
+
+def ajustar_stock(medicamento, cantidad, positivo, usuario=None, motivo=''):
+    """
+    Ajuste de inventario; el negativo se descuenta de los lotes por FEFO
+
+    Returns:
+        list: MovimientoInventario creados (uno por lote afectado)
+
+    Raises:
+        StockInsuficiente: Si el ajuste negativo supera el stock
+    """
+    return aplicar_movimientos([{
+        'medicamento': medicamento,
+        'tipo_movimiento': 'ajuste_positivo' if positivo else 'ajuste_negativo',
+        'cantidad': cantidad,
+        'motivo': motivo,
+    }], usuario=usuario)
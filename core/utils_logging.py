@@ -0,0 +1,94 @@
+"""
+Logging asíncrono y estructurado.
+
+``ColaHandler`` es el único handler que ejecuta el hilo de la petición: solo
+resuelve el mensaje y encola el registro. Un ``QueueListener`` en segundo plano
+escribe en consola (texto) y en archivo (una línea JSON por registro).
+Se configura desde ``LOGGING`` en settings.
+"""
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Atributos estándar de LogRecord; el resto se considera contexto adicional (extra=...)
+_ATRIBUTOS_ESTANDAR = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+FORMATO_TEXTO = '%(levelname)s %(asctime)s %(module)s %(process)d %(thread)d %(message)s'
+
+
+class FormateadorJSON(logging.Formatter):
+    """Serializa cada registro como un objeto JSON en una sola línea"""
+
+    def format(self, record):
+        datos = {
+            'fecha': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'modulo': record.module,
+            'funcion': record.funcName,
+            'linea': record.lineno,
+            'proceso': record.process,
+            'hilo': record.thread,
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_ESTANDAR and not clave.startswith('_'):
+                datos[clave] = valor
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ColaHandler(QueueHandler):
+    """
+    Encola los registros y los escribe desde un hilo dedicado.
+
+    Args:
+        archivo (str): Ruta del archivo JSON de logs (opcional)
+        consola (bool): Escribir también en stderr en formato de texto
+        capacidad (int): Máximo de registros pendientes; si la cola se llena
+                         se descartan registros en lugar de bloquear la petición
+    """
+
+    def __init__(self, archivo=None, consola=True, capacidad=10000):
+        super().__init__(queue.Queue(maxsize=capacidad))
+        destinos = []
+        if consola:
+            handler_consola = logging.StreamHandler()
+            handler_consola.setFormatter(logging.Formatter(FORMATO_TEXTO))
+            destinos.append(handler_consola)
+        if archivo:
+            handler_archivo = logging.FileHandler(archivo, encoding='utf-8')
+            handler_archivo.setFormatter(FormateadorJSON())
+            destinos.append(handler_archivo)
+        self.destinos = destinos
+        self.listener = QueueListener(self.queue, *destinos, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.detener)
+
+    def prepare(self, record):
+        # Solo se resuelve el mensaje en el hilo de la petición (los argumentos
+        # pueden ser objetos del ORM); el formateo y la E/S quedan para el listener
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def detener(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for destino in self.destinos:
+            destino.close()
+
+    def close(self):
+        self.detener()
+        super().close()
@@ -1,4 +1,12 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils import timezone
+
+from .utils_eventos import senalar_cambio
+from .utils_sincronizacion import registrar_cambios
 
 def generar_url_redireccion(tipo_objeto, objeto_id):
     """
@@ -56,3 +64,254 @@ def crear_notificacion(usuario, mensaje, tipo, importante=False, objeto_relacion
         objeto_id=objeto_id,
         url_redireccion=url_redireccion
     )
+
+def _normalizar_destinatario(destinatario):
+    """Convierte un usuario, un id o un dict con campos propios en un dict con 'usuario_id'"""
+    if isinstance(destinatario, dict):
+        datos = dict(destinatario)
+        usuario = datos.pop('usuario', None)
+        if usuario is not None:
+            datos['usuario_id'] = getattr(usuario, 'pk', usuario)
+        return datos
+    return {'usuario_id': getattr(destinatario, 'pk', destinatario)}
+
+def crear_notificaciones_masivas(destinatarios, mensaje=None, tipo='informacion', importante=False,
+                                 objeto_relacionado=None, objeto_id=None, creador=None):
+    """
+    Crea varias notificaciones con un solo INSERT y ajusta los contadores de
+    no leídas en una sola sentencia UPDATE.
+    
+    Args:
+        destinatarios: QuerySet de usuarios, o iterable de usuarios, ids o dicts.
+                       Un dict ('usuario' o 'usuario_id' más cualquier campo de la
+                       notificación) permite cambiar el mensaje, tipo, etc. de ese destinatario
+        mensaje, tipo, importante, objeto_relacionado, objeto_id: Valores comunes
+        creador: Usuario que originó el aviso; nunca se le notifica a sí mismo
+        
+    Returns:
+        list: Notificaciones creadas
+    """
+    from .models import Notificacion, Cita, Usuario
+    
+    if isinstance(destinatarios, models.QuerySet):
+        if destinatarios.model is Usuario:
+            destinatarios = destinatarios.values_list('pk', flat=True)
+        destinatarios = list(destinatarios)
+    
+    comunes = {
+        'mensaje': mensaje,
+        'tipo': tipo,
+        'importante': importante,
+        'objeto_relacionado': objeto_relacionado,
+        'objeto_id': objeto_id,
+    }
+    creador_id = creador.pk if creador else None
+    filas, vistos = [], set()
+    for destinatario in destinatarios:
+        datos = {**comunes, **_normalizar_destinatario(destinatario)}
+        # Una sola notificación por usuario y objeto en cada llamada, y nunca al creador
+        clave = (datos['usuario_id'], datos['objeto_relacionado'], datos['objeto_id'])
+        if clave in vistos or datos['usuario_id'] == creador_id:
+            continue
+        vistos.add(clave)
+        filas.append(datos)
+    if not filas:
+        return []
+    
+    # La URL depende solo del objeto relacionado: se resuelve una vez por objeto
+    urls = {}
+    for datos in filas:
+        clave = (datos['objeto_relacionado'], datos['objeto_id'])
+        if 'url_redireccion' not in datos:
+            if clave not in urls:
+                urls[clave] = generar_url_redireccion(*clave) if all(clave) else None
+            datos['url_redireccion'] = urls[clave]
+    
+    notificaciones = Notificacion.objects.bulk_create([Notificacion(**datos) for datos in filas])
+    registrar_cambios(notificaciones)
+    
+    # Mismo criterio que NotificacionQuerySet.activas(), con una consulta para todas las citas
+    cita_ids = {n.objeto_id for n in notificaciones if n.objeto_relacionado == 'cita' and n.objeto_id is not None}
+    citas_vigentes = set(
+        Cita.objects.filter(pk__in=cita_ids).exclude(estado='atendida').values_list('pk', flat=True)
+    ) if cita_ids else set()
+    deltas = Counter(
+        n.usuario_id for n in notificaciones
+        if not n.leido and (n.objeto_relacionado != 'cita' or n.objeto_id is None or n.objeto_id in citas_vigentes)
+    )
+    if deltas:
+        ajustar_contadores(deltas)
+    else:
+        senalar_cambio()
+    return notificaciones
+
+def notificar_rol(nombre_rol, mensaje, tipo='informacion', importante=False,
+                  objeto_relacionado=None, objeto_id=None, creador=None,
+                  agrupar_por=None, mensaje_resumen=None):
+    """
+    Notifica a todos los usuarios de un rol (farmacéuticos, admisión, ...)
+    con un número fijo de consultas, sin importar cuántos sean.
+    
+    Con ``agrupar_por`` (clave de evento) y ``mensaje_resumen`` los eventos
+    se acumulan en un resumen por usuario (ver crear_notificaciones_agrupadas).
+    
+    Returns:
+        list | int: Notificaciones creadas, o cantidad de resúmenes si se agrupa
+    """
+    from .models import Usuario
+    
+    destinatarios = Usuario.objects.filter(rol__nombre=nombre_rol)
+    if agrupar_por:
+        return crear_notificaciones_agrupadas(
+            destinatarios, agrupar_por, mensaje, mensaje_resumen, tipo=tipo, importante=importante,
+            objeto_relacionado=objeto_relacionado, objeto_id=objeto_id, creador=creador,
+        )
+    return crear_notificaciones_masivas(
+        destinatarios, mensaje=mensaje, tipo=tipo, importante=importante,
+        objeto_relacionado=objeto_relacionado, objeto_id=objeto_id, creador=creador,
+    )
+
+# Eventos que se conservan en la lista de un resumen
+MAX_ELEMENTOS_RESUMEN = 20
+
+def clave_resumen(clave, ahora=None, ventana=None):
+    """Clave de agrupación de la ventana de tiempo actual, p. ej. 'nueva_cita:482113'"""
+    ventana = ventana or getattr(settings, 'NOTIFICACIONES_VENTANA_AGRUPACION', 3600)
+    ahora = ahora or timezone.now()
+    return f'{clave}:{int(ahora.timestamp()) // ventana}'
+
+def crear_notificaciones_agrupadas(destinatarios, clave, mensaje, mensaje_resumen, tipo='informacion',
+                                   importante=False, objeto_relacionado=None, objeto_id=None,
+                                   creador=None, ventana=None):
+    """
+    Agrupa eventos del mismo tipo en un único resumen por destinatario y
+    ventana de tiempo: el primer evento crea la notificación y los siguientes
+    actualizan la misma fila (cantidad, mensaje y lista de eventos) en lugar
+    de insertar otra. Al leerse el resumen, el siguiente evento abre uno nuevo.
+    
+    Args:
+        destinatarios: Igual que en crear_notificaciones_masivas (sin dicts)
+        clave (str): Tipo de evento, p. ej. 'nueva_cita'
+        mensaje (str): Mensaje del evento individual
+        mensaje_resumen (str): Mensaje con varios eventos; admite {cantidad}
+        ventana (int): Segundos de la ventana (por defecto NOTIFICACIONES_VENTANA_AGRUPACION)
+        
+    Returns:
+        int: Cantidad de resúmenes creados o actualizados
+    
+    El resumen no guarda objeto_relacionado (agrupa varios objetos), así que no
+    desaparece al atenderse una de sus citas; su URL apunta al último evento.
+    """
+    from .models import Notificacion, Usuario
+    
+    if isinstance(destinatarios, models.QuerySet) and destinatarios.model is Usuario:
+        destinatarios = destinatarios.values_list('pk', flat=True)
+    creador_id = creador.pk if creador else None
+    usuario_ids = {getattr(d, 'pk', d) for d in destinatarios} - {creador_id}
+    if not usuario_ids:
+        return 0
+    
+    ahora = timezone.now()
+    clave_agrupacion = clave_resumen(clave, ahora, ventana)
+    url_redireccion = generar_url_redireccion(objeto_relacionado, objeto_id) if objeto_relacionado and objeto_id else None
+    elemento = {
+        'mensaje': mensaje,
+        'objeto_relacionado': objeto_relacionado,
+        'objeto_id': objeto_id,
+        'fecha': ahora.isoformat(),
+    }
+    
+    with transaction.atomic():
+        # Bloquea a los destinatarios (en orden de id) antes de buscar sus resúmenes:
+        # otro proceso que agrupe la misma clave espera aquí y, al continuar, encuentra
+        # el resumen ya creado y le suma su evento en lugar de intentar insertar otro
+        list(Usuario.objects.select_for_update().filter(pk__in=usuario_ids).order_by('pk').values_list('pk', flat=True))
+        abiertos = list(
+            Notificacion.objects.select_for_update()
+            .filter(usuario_id__in=usuario_ids, clave_agrupacion=clave_agrupacion, leido=False)
+        )
+        for resumen in abiertos:
+            resumen.cantidad += 1
+            resumen.elementos = [elemento] + resumen.elementos[:MAX_ELEMENTOS_RESUMEN - 1]
+            resumen.mensaje = mensaje_resumen.format(cantidad=resumen.cantidad)
+            resumen.fecha_envio = ahora
+            resumen.url_redireccion = url_redireccion
+            resumen.importante = resumen.importante or importante
+            resumen.updated_at = ahora
+        Notificacion.objects.bulk_update(
+            abiertos, ['cantidad', 'elementos', 'mensaje', 'fecha_envio', 'url_redireccion', 'importante', 'updated_at']
+        )
+        
+        nuevos = usuario_ids - {resumen.usuario_id for resumen in abiertos}
+        creados = Notificacion.objects.bulk_create([
+            Notificacion(
+                usuario_id=usuario_id, mensaje=mensaje, tipo=tipo, importante=importante,
+                url_redireccion=url_redireccion, clave_agrupacion=clave_agrupacion,
+                cantidad=1, elementos=[elemento],
+            )
+            for usuario_id in sorted(nuevos)
+        ])
+        # El contador sube solo por las filas realmente insertadas
+        ajustar_contadores(Counter(notificacion.usuario_id for notificacion in creados))
+        registrar_cambios([*abiertos, *creados])
+    if abiertos:
+        senalar_cambio()
+    return len(usuario_ids)
+
+def contar_no_leidas(usuario_id):
+    """Cuenta desde la tabla de notificaciones (fuente de verdad del contador)"""
+    from .models import Notificacion
+    return Notificacion.objects.filter(usuario_id=usuario_id, leido=False).activas().count()
+
+def recalcular_contador(usuario_id):
+    """
+    Recalcula y guarda el contador de un usuario
+    
+    Returns:
+        int: Cantidad de notificaciones activas no leídas
+    """
+    from .models import ContadorNotificaciones
+    
+    no_leidas = contar_no_leidas(usuario_id)
+    ContadorNotificaciones.objects.update_or_create(usuario_id=usuario_id, defaults={'no_leidas': no_leidas})
+    return no_leidas
+
+def obtener_no_leidas(usuario):
+    """
+    Devuelve el contador de notificaciones no leídas con una consulta por clave
+    primaria. Si el usuario aún no tiene contador, se calcula y se guarda.
+    """
+    from .models import ContadorNotificaciones
+    
+    no_leidas = ContadorNotificaciones.objects.filter(pk=usuario.pk).values_list('no_leidas', flat=True).first()
+    if no_leidas is None:
+        no_leidas = recalcular_contador(usuario.pk)
+    return max(no_leidas, 0)
+
+def ajustar_contadores(deltas):
+    """
+    Suma o resta en una sola sentencia UPDATE los contadores de varios usuarios
+    
+    Args:
+        deltas (dict): {usuario_id: variación}
+        
+    Los usuarios sin fila de contador se omiten: su contador se calculará
+    completo la próxima vez que se lea.
+    """
+    from django.db.models import Case, F, IntegerField, Value, When
+    from .models import ContadorNotificaciones
+    
+    deltas = {usuario_id: delta for usuario_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if len(deltas) == 1:
+        (usuario_id, delta), = deltas.items()
+        variacion = Value(delta)
+    else:
+        variacion = Case(
+            *[When(pk=usuario_id, then=Value(delta)) for usuario_id, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ContadorNotificaciones.objects.filter(pk__in=deltas).update(no_leidas=F('no_leidas') + variacion)
+    senalar_cambio()
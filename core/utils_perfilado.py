@@ -0,0 +1,102 @@
+"""
+Perfilado bajo demanda de una petición individual.
+
+Un usuario staff obtiene un token firmado (comando ``token_perfilado``) y lo
+envía en el parámetro ``_perfil`` o en la cabecera ``X-Perfil-Token``. La
+petición se ejecuta dentro de cProfile (determinista, archivo ``.prof``) o de
+pyinstrument (muestreo, HTML con flamegraph) si está instalado. Los archivos
+se guardan fuera de MEDIA_ROOT y se descargan desde una vista solo para staff.
+"""
+import cProfile
+import re
+import time as time_module
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import get_random_string
+
+SALT_PERFILADO = 'core.perfilado'
+MODOS_PERFILADO = ('cprofile', 'pyinstrument')
+NOMBRE_ARCHIVO_VALIDO = re.compile(r'^[\w\-]+\.(prof|html)$')
+
+
+def directorio_perfiles():
+    directorio = Path(getattr(settings, 'PERFILADO_DIR', Path(settings.BASE_DIR) / 'perfiles'))
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def generar_token(usuario, modo='cprofile'):
+    """Token firmado que habilita el perfilado para ``usuario``"""
+    if modo not in MODOS_PERFILADO:
+        raise ValueError(f'Modo de perfilado desconocido: {modo}')
+    return signing.dumps({'u': usuario.pk, 'm': modo}, salt=SALT_PERFILADO)
+
+
+def validar_token(token, usuario):
+    """
+    Devuelve el modo de perfilado si el token es válido, no expiró y
+    pertenece a ``usuario``; en cualquier otro caso devuelve None.
+    """
+    vigencia = getattr(settings, 'PERFILADO_TOKEN_VIGENCIA', 3600)
+    try:
+        datos = signing.loads(token, salt=SALT_PERFILADO, max_age=vigencia)
+    except signing.BadSignature:
+        return None
+    if datos.get('u') != usuario.pk or datos.get('m') not in MODOS_PERFILADO:
+        return None
+    return datos['m']
+
+
+def perfiles_ultima_hora():
+    limite = time_module.time() - 3600
+    return sum(
+        1 for archivo in directorio_perfiles().iterdir()
+        if NOMBRE_ARCHIVO_VALIDO.match(archivo.name) and archivo.stat().st_mtime >= limite
+    )
+
+
+def cupo_disponible():
+    """Verifica el tope de perfiles por hora (compartido entre procesos vía disco)"""
+    return perfiles_ultima_hora() < getattr(settings, 'PERFILADO_MAX_POR_HORA', 10)
+
+
+def _nombre_archivo(request, extension):
+    ruta = re.sub(r'[^\w]+', '-', request.path).strip('-')[:60] or 'raiz'
+    return f"{time_module.strftime('%Y%m%d-%H%M%S')}-{ruta}-{get_random_string(6)}.{extension}"
+
+
+def perfilar(request, get_response, modo):
+    """
+    Ejecuta ``get_response`` bajo el perfilador indicado y guarda el resultado.
+
+    Returns:
+        tuple: (respuesta, nombre del archivo generado)
+    """
+    if modo == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            modo = 'cprofile'
+
+    if modo == 'pyinstrument':
+        perfilador = Profiler()
+        perfilador.start()
+        try:
+            respuesta = get_response(request)
+        finally:
+            perfilador.stop()
+        nombre = _nombre_archivo(request, 'html')
+        (directorio_perfiles() / nombre).write_text(perfilador.output_html(), encoding='utf-8')
+        return respuesta, nombre
+
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        respuesta = get_response(request)
+    finally:
+        perfilador.disable()
+    nombre = _nombre_archivo(request, 'prof')
+    perfilador.dump_stats(directorio_perfiles() / nombre)
+    return respuesta, nombre
@@ -0,0 +1,191 @@
+"""
+Análisis de planes de ejecución de las consultas críticas.
+
+Captura el SQL que generan los escenarios de ``utils_benchmark`` (reportes,
+dashboards y rutas calientes), ejecuta ``EXPLAIN`` sobre cada consulta y
+detecta recorridos secuenciales sobre tablas grandes. Para cada hallazgo
+propone un índice compuesto (o parcial) a partir de los predicados del WHERE.
+Lo usa el comando ``plan_consultas``.
+"""
+import hashlib
+import json
+import re
+
+from django.apps import apps
+from django.db import connection, models
+from django.test.utils import CaptureQueriesContext
+
+from .utils_benchmark import preparar_peticion
+
+# Literales numéricos y de texto, para agrupar consultas que solo difieren en parámetros
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# Alias de tabla que genera el ORM: "core_cita" U0, "core_medico" T3, ...
+_ALIAS = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([A-Z]\d+)"?(?=[\s,)]|$)')
+_FIN_WHERE = re.compile(r'\s(?:GROUP BY|ORDER BY|LIMIT|HAVING)\s')
+
+
+def huella_consulta(sql):
+    """Identificador estable de la forma de una consulta (sin literales)"""
+    normalizada = _LITERALES.sub('?', sql)
+    normalizada = re.sub(r'\(\?(?:,\s*\?)+\)', '(?)', normalizada)
+    return hashlib.sha1(normalizada.encode()).hexdigest()[:12]
+
+
+def capturar_consultas(escenarios, datos):
+    """
+    Ejecuta una petición de cada escenario y devuelve las consultas SELECT
+    distintas que se emitieron, junto al escenario que las originó.
+    """
+    from django.test import Client
+
+    consultas = {}
+    for escenario in escenarios:
+        client = Client()
+        client.force_login(datos[escenario['usuario']])
+        metodo, url, parametros = preparar_peticion(escenario, datos, 0)
+        with CaptureQueriesContext(connection) as contexto:
+            getattr(client, metodo)(url, parametros)
+        for consulta in contexto.captured_queries:
+            sql = consulta['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            consultas.setdefault(huella_consulta(sql), {'sql': sql, 'escenario': escenario['nombre']})
+    return consultas
+
+
+def explicar(sql):
+    """
+    Ejecuta EXPLAIN sobre ``sql`` y devuelve las tablas (o alias) recorridas
+    secuencialmente, junto al plan en texto para el reporte.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            detalles = [fila[-1] for fila in cursor.fetchall()]
+            recorridas = [
+                detalle.split()[1] for detalle in detalles
+                if detalle.startswith('SCAN ') and ' USING ' not in detalle
+            ]
+            return recorridas, '\n'.join(detalles)
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            recorridas = []
+            pendientes = [plan[0]['Plan']]
+            while pendientes:
+                nodo = pendientes.pop()
+                if nodo.get('Node Type') == 'Seq Scan':
+                    recorridas.append(nodo.get('Alias') or nodo['Relation Name'])
+                pendientes.extend(nodo.get('Plans', []))
+            return recorridas, json.dumps(plan, indent=2)
+    raise NotImplementedError(f'EXPLAIN no soportado para {connection.vendor}')
+
+
+def resolver_tabla(sql, nombre):
+    """Traduce un alias del ORM (U0, T3) a su tabla real"""
+    for tabla, alias in _ALIAS.findall(sql):
+        if alias == nombre:
+            return tabla
+    return nombre
+
+
+def filas_por_tabla(tabla, cache):
+    if tabla not in cache:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(tabla)}')
+            cache[tabla] = cursor.fetchone()[0]
+    return cache[tabla]
+
+
+def modelo_de_tabla(tabla):
+    for modelo in apps.get_models():
+        if modelo._meta.db_table == tabla:
+            return modelo
+    return None
+
+
+def proponer_indice(sql, tabla, referencia):
+    """
+    Propone un índice para ``tabla`` a partir de los predicados del WHERE:
+    primero las columnas comparadas por igualdad y al final la primera
+    columna de rango. Las comparaciones contra un booleano falso se
+    convierten en condición de índice parcial.
+
+    Args:
+        referencia (str): Nombre con el que la tabla aparece en el SQL (tabla o alias)
+    """
+    modelo = modelo_de_tabla(tabla)
+    if modelo is None or ' WHERE ' not in sql:
+        return None
+    where = _FIN_WHERE.split(sql.split(' WHERE ', 1)[1], 1)[0]
+
+    campos_por_columna = {campo.column: campo for campo in modelo._meta.concrete_fields}
+    patron = re.compile(
+        rf'"{re.escape(referencia)}"\."(\w+)"\s*(=|IN\b|IS\b|>=|<=|>|<|BETWEEN\b)\s*([^\s,)]*)',
+        re.IGNORECASE,
+    )
+    igualdad, rango, condicion = [], [], None
+    for columna, operador, valor in patron.findall(where):
+        campo = campos_por_columna.get(columna)
+        if campo is None:
+            continue
+        if isinstance(campo, models.BooleanField) and operador == '=' and valor.lower() in ('0', 'false'):
+            condicion = {campo.name: False}
+        elif operador.upper() in ('=', 'IN', 'IS'):
+            if campo.name not in igualdad:
+                igualdad.append(campo.name)
+        elif campo.name not in rango:
+            rango.append(campo.name)
+
+    campos = igualdad + [nombre for nombre in rango[:1] if nombre not in igualdad]
+    if condicion:
+        campos = [nombre for nombre in campos if nombre not in condicion]
+    if not campos:
+        return None
+    return {
+        'modelo': modelo.__name__,
+        'campos': campos,
+        'condicion': condicion,
+    }
+
+
+def formatear_indice(propuesta):
+    """Representación como ``models.Index`` lista para copiar en ``Meta.indexes``"""
+    nombre = f"{propuesta['modelo'].lower()[:8]}_{'_'.join(c[:6] for c in propuesta['campos'])}"[:26] + '_idx'
+    extra = ''
+    if propuesta['condicion']:
+        filtro = ', '.join(f'{campo}={valor}' for campo, valor in propuesta['condicion'].items())
+        extra = f', condition=Q({filtro})'
+    return f"models.Index(fields={propuesta['campos']!r}, name='{nombre}'{extra})"
+
+
+def analizar_planes(consultas, min_filas=1000):
+    """
+    Explica cada consulta y devuelve los recorridos secuenciales sobre
+    tablas con al menos ``min_filas`` filas.
+
+    Returns:
+        list: Hallazgos con huella, escenario, tabla, filas, propuesta y plan
+    """
+    hallazgos = []
+    filas_cache = {}
+    for huella, consulta in consultas.items():
+        recorridas, plan = explicar(consulta['sql'])
+        for referencia in dict.fromkeys(recorridas):
+            tabla = resolver_tabla(consulta['sql'], referencia)
+            filas = filas_por_tabla(tabla, filas_cache) if modelo_de_tabla(tabla) else 0
+            if filas < min_filas:
+                continue
+            propuesta = proponer_indice(consulta['sql'], tabla, referencia)
+            hallazgos.append({
+                'clave': f'{huella}:{tabla}',
+                'escenario': consulta['escenario'],
+                'tabla': tabla,
+                'filas': filas,
+                'propuesta': formatear_indice(propuesta) if propuesta else None,
+                'sql': consulta['sql'],
+                'plan': plan,
+            })
+    return hallazgos
@@ -0,0 +1,192 @@
+"""
+Recordatorios de citas.
+
+``generar_recordatorios`` busca las citas vigentes que empiezan dentro de la
+ventana de anticipación y aún no tienen recordatorio, las marca
+(``Cita.recordatorio_enviado``) y crea sus notificaciones en bloque. Cada lote
+se procesa en una transacción: si el proceso se interrumpe, las citas no
+marcadas se toman en la siguiente ejecución y ninguna se recuerda dos veces.
+
+Opcionalmente los recordatorios se entregan también por un canal externo
+configurable en ``RECORDATORIOS_BACKEND`` (ruta a una clase con método
+``enviar``), p. ej. 'core.utils_recordatorios.BackendConsola'.
+"""
+import json
+import logging
+import sys
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .utils_notificaciones import crear_notificaciones_masivas
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_A_RECORDAR = ('pendiente', 'confirmada')
+
+CAMPOS_CITA = (
+    'id', 'fecha', 'hora_inicio', 'paciente__usuario_id', 'paciente__usuario__email',
+    'paciente__usuario__telefono', 'medico__usuario__nombres', 'medico__usuario__apellidos',
+    'consultorio__codigo',
+)
+
+
+class BackendRecordatorios:
+    """Canal externo de recordatorios; las subclases implementan ``enviar``"""
+
+    def enviar(self, recordatorios):
+        """
+        Args:
+            recordatorios (list): Dicts con cita_id, usuario_id, email, telefono, asunto y mensaje
+
+        Returns:
+            int: Cantidad de recordatorios entregados
+        """
+        raise NotImplementedError
+
+
+class BackendConsola(BackendRecordatorios):
+    """Escribe los recordatorios en la salida estándar (desarrollo)"""
+
+    def __init__(self, salida=None):
+        self.salida = salida or sys.stdout
+
+    def enviar(self, recordatorios):
+        for recordatorio in recordatorios:
+            self.salida.write(f"[recordatorio] {recordatorio['email'] or recordatorio['telefono']}: {recordatorio['mensaje']}\n")
+        return len(recordatorios)
+
+
+class BackendArchivo(BackendRecordatorios):
+    """Agrega los recordatorios como líneas JSON a RECORDATORIOS_ARCHIVO (pruebas locales)"""
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or getattr(settings, 'RECORDATORIOS_ARCHIVO', 'recordatorios.jsonl')
+
+    def enviar(self, recordatorios):
+        with open(self.ruta, 'a', encoding='utf-8') as archivo:
+            for recordatorio in recordatorios:
+                archivo.write(json.dumps(recordatorio, ensure_ascii=False, default=str) + '\n')
+        return len(recordatorios)
+
+
+class BackendEmail(BackendRecordatorios):
+    """Envía los recordatorios por correo reutilizando una sola conexión SMTP por lote"""
+
+    def enviar(self, recordatorios):
+        mensajes = [
+            EmailMessage(recordatorio['asunto'], recordatorio['mensaje'], to=[recordatorio['email']])
+            for recordatorio in recordatorios if recordatorio['email']
+        ]
+        if not mensajes:
+            return 0
+        with get_connection(fail_silently=False) as conexion:
+            return conexion.send_messages(mensajes)
+
+
+def obtener_backend():
+    """Instancia el backend configurado, o None si solo se crean notificaciones"""
+    ruta = getattr(settings, 'RECORDATORIOS_BACKEND', None)
+    return import_string(ruta)() if ruta else None
+
+
+def filtro_ventana(desde, hasta):
+    """
+    Condición sobre (fecha, hora_inicio) para las citas que empiezan entre
+    ``desde`` y ``hasta`` (datetimes locales), usable por el índice de la cita
+    """
+    if desde.date() == hasta.date():
+        return models.Q(fecha=desde.date(), hora_inicio__gte=desde.time(), hora_inicio__lt=hasta.time())
+    return (
+        models.Q(fecha=desde.date(), hora_inicio__gte=desde.time())
+        | models.Q(fecha__gt=desde.date(), fecha__lt=hasta.date())
+        | models.Q(fecha=hasta.date(), hora_inicio__lt=hasta.time())
+    )
+
+
+def citas_por_recordar(desde, hasta):
+    from .models import Cita
+
+    return Cita.objects.filter(
+        filtro_ventana(desde, hasta),
+        recordatorio_enviado__isnull=True,
+        estado__in=ESTADOS_A_RECORDAR,
+    )
+
+
+def _armar_recordatorio(cita):
+    cuando = f"{cita['fecha'].strftime('%d/%m/%Y')} a las {cita['hora_inicio'].strftime('%H:%M')}"
+    medico = f"{cita['medico__usuario__nombres']} {cita['medico__usuario__apellidos']}"
+    return {
+        'cita_id': cita['id'],
+        'usuario_id': cita['paciente__usuario_id'],
+        'email': cita['paciente__usuario__email'],
+        'telefono': cita['paciente__usuario__telefono'],
+        'asunto': 'Recordatorio de cita',
+        'mensaje': f"Recuerde su cita con {medico} el {cuando} en el consultorio {cita['consultorio__codigo']}.",
+    }
+
+
+def _procesar_lote(desde, hasta, tamano_lote, ahora):
+    from .models import Cita
+
+    with transaction.atomic():
+        candidatas = citas_por_recordar(desde, hasta).order_by('fecha', 'hora_inicio', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            # Dos ejecuciones simultáneas se reparten las citas en lugar de esperarse
+            candidatas = candidatas.select_for_update(skip_locked=True, of=('self',))
+        citas = list(candidatas.values(*CAMPOS_CITA)[:tamano_lote])
+        if not citas:
+            return []
+        Cita.objects.filter(pk__in=[cita['id'] for cita in citas]).update(recordatorio_enviado=ahora)
+        recordatorios = [_armar_recordatorio(cita) for cita in citas]
+        crear_notificaciones_masivas(
+            [
+                {'usuario_id': r['usuario_id'], 'mensaje': r['mensaje'], 'objeto_id': r['cita_id']}
+                for r in recordatorios
+            ],
+            tipo='recordatorio',
+            importante=True,
+            objeto_relacionado='cita',
+        )
+    return recordatorios
+
+
+def generar_recordatorios(horas=None, tamano_lote=None, backend=None, ahora=None):
+    """
+    Crea los recordatorios de las citas que empiezan en las próximas ``horas``
+
+    Args:
+        horas (float): Anticipación (por defecto RECORDATORIOS_ANTICIPACION_HORAS)
+        tamano_lote (int): Citas por lote (por defecto RECORDATORIOS_LOTE)
+        backend (BackendRecordatorios): Canal externo; None para solo notificar
+
+    Returns:
+        dict: {'citas': n, 'entregados': n, 'fallidos': n}
+    """
+    horas = horas or getattr(settings, 'RECORDATORIOS_ANTICIPACION_HORAS', 24)
+    tamano_lote = tamano_lote or getattr(settings, 'RECORDATORIOS_LOTE', 1000)
+    ahora = ahora or timezone.now()
+    desde = timezone.localtime(ahora).replace(tzinfo=None)
+    hasta = desde + timedelta(hours=horas)
+
+    resultado = {'citas': 0, 'entregados': 0, 'fallidos': 0}
+    while True:
+        recordatorios = _procesar_lote(desde, hasta, tamano_lote, ahora)
+        if not recordatorios:
+            break
+        resultado['citas'] += len(recordatorios)
+        if backend is not None:
+            # La notificación ya quedó registrada: un fallo del canal externo no la revierte
+            try:
+                resultado['entregados'] += backend.enviar(recordatorios)
+            except Exception:
+                logger.exception('Fallo el envío de %s recordatorios', len(recordatorios))
+                resultado['fallidos'] += len(recordatorios)
+        if len(recordatorios) < tamano_lote:
+            break
+    return resultado
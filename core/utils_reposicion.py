@@ -0,0 +1,156 @@
+"""
+Pronóstico de reposición de medicamentos.
+
+Una sola consulta agregada trae el consumo diario (unidades dispensadas) de
+todos los medicamentos en la ventana de análisis; con él se arma una matriz
+medicamentos x días en NumPy y se calculan a la vez, para todo el catálogo,
+la demanda media, su variabilidad, los días de cobertura del stock actual, el
+punto de reorden y la cantidad sugerida a pedir:
+
+    stock de seguridad = z · σ · √(tiempo de entrega)
+    punto de reorden   = media · tiempo de entrega + stock de seguridad
+    cantidad sugerida  = media · (tiempo de entrega + días a cubrir) + stock de seguridad - stock
+
+El punto de reorden nunca es menor que el ``stock_minimo`` configurado a mano.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .utils_estadisticas_farmacia import en_cache
+
+# Orden de urgencia de los estados
+ESTADOS_REPOSICION = ('agotado', 'reponer', 'vigilar', 'normal')
+
+# Más allá de este horizonte no se estima fecha de agotamiento (con mucho
+# stock y poca demanda la fecha quedaría fuera del rango de ``date``)
+HORIZONTE_AGOTAMIENTO_DIAS = 3650
+
+ORDENES = {
+    'urgencia': None,
+    'cantidad': 'cantidad_sugerida',
+    'cobertura': 'dias_cobertura',
+    'nombre': 'nombre_comercial',
+}
+
+
+def parametros_reposicion():
+    return {
+        'dias': getattr(settings, 'REPOSICION_DIAS_HISTORIAL', 90),
+        'tiempo_entrega': getattr(settings, 'REPOSICION_TIEMPO_ENTREGA_DIAS', 7),
+        'dias_cubrir': getattr(settings, 'REPOSICION_DIAS_COBERTURA', 30),
+        'factor_seguridad': getattr(settings, 'REPOSICION_FACTOR_SEGURIDAD', 1.65),
+    }
+
+
+def matriz_consumo(medicamento_ids, dias, hasta=None):
+    """
+    Consumo diario de cada medicamento en los ``dias`` que terminan en ``hasta``
+
+    Returns:
+        numpy.ndarray: Matriz (len(medicamento_ids), dias), una fila por medicamento
+    """
+    from .models import DetalleReceta
+
+    hasta = hasta or timezone.localdate()
+    inicio = hasta - timedelta(days=dias - 1)
+    fila = {medicamento_id: i for i, medicamento_id in enumerate(medicamento_ids)}
+    consumo = np.zeros((len(medicamento_ids), dias))
+    filas = (
+        DetalleReceta.objects.filter(
+            fecha_dispensacion__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+            fecha_dispensacion__lt=timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min)),
+            cantidad_dispensada__gt=0,
+        ).annotate(dia=TruncDate('fecha_dispensacion', tzinfo=timezone.get_current_timezone()))
+        .values('medicamento_id', 'dia').annotate(total=models.Sum('cantidad_dispensada'))
+        .order_by().values_list('medicamento_id', 'dia', 'total')
+    )
+    for medicamento_id, dia, total in filas:
+        if medicamento_id in fila:
+            consumo[fila[medicamento_id], (dia - inicio).days] += total
+    return consumo
+
+
+def _calcular_pronostico():
+    from .models import Medicamento
+
+    parametros = parametros_reposicion()
+    medicamentos = list(
+        Medicamento.objects.filter(activo=True).order_by('pk')
+        .values('id', 'codigo', 'nombre_comercial', 'nombre_generico', 'stock_actual', 'stock_minimo')
+    )
+    if not medicamentos:
+        return []
+    consumo = matriz_consumo([m['id'] for m in medicamentos], parametros['dias'])
+    stock = np.array([m['stock_actual'] for m in medicamentos], dtype=float)
+    stock_minimo = np.array([m['stock_minimo'] for m in medicamentos], dtype=float)
+    entrega = parametros['tiempo_entrega']
+
+    media = consumo.mean(axis=1)
+    desviacion = consumo.std(axis=1, ddof=1) if consumo.shape[1] > 1 else np.zeros(len(medicamentos))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(media > 0, np.maximum(stock, 0) / media, np.inf)
+        variacion = np.where(media > 0, desviacion / media, 0.0)
+    seguridad = parametros['factor_seguridad'] * desviacion * math.sqrt(entrega)
+    punto_reorden = np.maximum(np.ceil(media * entrega + seguridad), stock_minimo)
+    objetivo = media * (entrega + parametros['dias_cubrir']) + seguridad
+    cantidad = np.maximum(np.ceil(objetivo - stock), 0)
+    # Hasta el punto de reorden al menos, aunque no haya consumo registrado
+    cantidad = np.where(stock <= punto_reorden, np.maximum(cantidad, punto_reorden - stock), cantidad)
+
+    estado = np.select(
+        [stock <= 0, stock <= punto_reorden, cobertura < entrega + parametros['dias_cubrir']],
+        [0, 1, 2], default=3,
+    )
+    # Urgencia: primero el estado, luego menos días de cobertura, luego mayor demanda
+    orden = np.lexsort((-media, cobertura, estado))
+
+    hoy = timezone.localdate()
+    resultado = []
+    for i in orden:
+        dias_cobertura = None if math.isinf(cobertura[i]) else round(float(cobertura[i]), 1)
+        resultado.append({
+            **medicamentos[i],
+            'demanda_diaria': round(float(media[i]), 2),
+            'desviacion': round(float(desviacion[i]), 2),
+            'coeficiente_variacion': round(float(variacion[i]), 2),
+            'dias_cobertura': dias_cobertura,
+            'fecha_agotamiento': (
+                hoy + timedelta(days=int(cobertura[i])) if cobertura[i] <= HORIZONTE_AGOTAMIENTO_DIAS else None
+            ),
+            'stock_seguridad': int(math.ceil(seguridad[i])),
+            'punto_reorden': int(punto_reorden[i]),
+            'cantidad_sugerida': int(cantidad[i]),
+            'estado': ESTADOS_REPOSICION[estado[i]],
+        })
+    return resultado
+
+
+def pronostico_reposicion(orden='urgencia', estados=None):
+    """
+    Pronóstico de todos los medicamentos activos (en caché hasta el próximo movimiento)
+
+    Args:
+        orden (str): 'urgencia', 'cantidad', 'cobertura' o 'nombre'
+        estados (iterable): Limitar a estos estados de ESTADOS_REPOSICION
+
+    Returns:
+        list: Dicts por medicamento con demanda_diaria, desviacion, dias_cobertura,
+              fecha_agotamiento, punto_reorden, cantidad_sugerida y estado
+    """
+    filas = en_cache('reposicion', _calcular_pronostico)
+    if estados:
+        filas = [fila for fila in filas if fila['estado'] in estados]
+    campo = ORDENES.get(orden)
+    if campo == 'dias_cobertura':
+        filas = sorted(filas, key=lambda fila: (fila['dias_cobertura'] is None, fila['dias_cobertura'] or 0))
+    elif campo == 'cantidad_sugerida':
+        filas = sorted(filas, key=lambda fila: -fila['cantidad_sugerida'])
+    elif campo:
+        filas = sorted(filas, key=lambda fila: fila[campo])
+    return filas
@@ -0,0 +1,126 @@
+"""
+Retención de notificaciones.
+
+Las notificaciones leídas o inactivas (de citas atendidas o inexistentes) más
+antiguas que lo indicado por ``NOTIFICACIONES_RETENCION`` se mueven a
+NotificacionArchivada o se eliminan, según su tipo. Se procesan en lotes
+pequeños recorridos por clave primaria (keyset), cada uno en su propia
+transacción, para no mantener bloqueos largos sobre la tabla principal.
+
+Cada lote vuelve a aplicar la política dentro de su transacción, con las
+filas bloqueadas: una notificación que cambió desde que se seleccionó (p. ej.
+volvió a marcarse como no leída) se conserva. Se eliminan con ``delete()``,
+así las señales registran la baja para la sincronización y ajustan el
+contador si hiciera falta.
+"""
+import time as time_module
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+ACCIONES_RETENCION = ('archivar', 'eliminar', 'conservar')
+
+# Política usada para los tipos que no figuran en settings
+POLITICA_POR_DEFECTO = {'accion': 'conservar', 'dias': None}
+
+CAMPOS_ARCHIVO = (
+    'id', 'usuario_id', 'mensaje', 'tipo', 'importante',
+    'objeto_relacionado', 'objeto_id', 'fecha_envio', 'fecha_lectura',
+)
+
+
+def politicas_retencion(tipos=None):
+    """
+    Devuelve {tipo: política} validando la configuración
+
+    Raises:
+        ValueError: Si una política tiene una acción desconocida o no indica días
+    """
+    from .models import TIPO_NOTIFICACION_CHOICES
+
+    configuradas = getattr(settings, 'NOTIFICACIONES_RETENCION', {})
+    politicas = {}
+    for tipo, _ in TIPO_NOTIFICACION_CHOICES:
+        if tipos and tipo not in tipos:
+            continue
+        politica = {**POLITICA_POR_DEFECTO, **configuradas.get(tipo, {})}
+        if politica['accion'] not in ACCIONES_RETENCION:
+            raise ValueError(f"Acción de retención desconocida para '{tipo}': {politica['accion']}")
+        if politica['accion'] != 'conservar' and politica['dias'] is None:
+            raise ValueError(f"La política de retención de '{tipo}' debe indicar 'dias'")
+        politicas[tipo] = politica
+    return politicas
+
+
+def notificaciones_retirables(politicas, ahora=None):
+    """QuerySet con las notificaciones que la política permite retirar de la tabla principal"""
+    from .models import Notificacion
+
+    ahora = ahora or timezone.now()
+    vencidas = models.Q(pk__in=[])
+    for tipo, politica in politicas.items():
+        if politica['accion'] != 'conservar':
+            limite = ahora - timedelta(days=politica['dias'])
+            vencidas |= models.Q(tipo=tipo, fecha_envio__lt=limite)
+    return Notificacion.objects.filter(vencidas).depurables()
+
+
+def _procesar_lote(ids, politicas, ahora):
+    from .models import Notificacion, NotificacionArchivada
+
+    with transaction.atomic():
+        filas = list(
+            notificaciones_retirables(politicas, ahora).filter(pk__in=ids)
+            .select_for_update().order_by('pk').values(*CAMPOS_ARCHIVO)
+        )
+        retirar = [fila['id'] for fila in filas]
+        archivar = [
+            NotificacionArchivada(notificacion_id=fila.pop('id'), **fila)
+            for fila in filas if politicas[fila['tipo']]['accion'] == 'archivar'
+        ]
+        NotificacionArchivada.objects.bulk_create(archivar)
+        Notificacion.objects.filter(pk__in=retirar).delete()
+    return len(archivar), len(retirar) - len(archivar)
+
+
+def purgar_notificaciones(tamano_lote=None, tipos=None, pausa=0, max_lotes=None, simular=False, ahora=None):
+    """
+    Aplica la política de retención en lotes
+
+    Args:
+        tamano_lote (int): Filas por lote (por defecto NOTIFICACIONES_RETENCION_LOTE)
+        tipos (list): Limitar a estos tipos de notificación
+        pausa (float): Segundos de espera entre lotes, para ceder la base a las peticiones
+        max_lotes (int): Detenerse tras esta cantidad de lotes
+        simular (bool): Solo contar lo que se retiraría
+
+    Returns:
+        dict: {'archivadas': n, 'eliminadas': n, 'lotes': n}
+    """
+    tamano_lote = tamano_lote or getattr(settings, 'NOTIFICACIONES_RETENCION_LOTE', 500)
+    politicas = politicas_retencion(tipos)
+    ahora = ahora or timezone.now()
+    retirables = notificaciones_retirables(politicas, ahora).order_by('pk')
+    resultado = {'archivadas': 0, 'eliminadas': 0, 'lotes': 0}
+
+    if simular:
+        for tipo in retirables.values_list('tipo', flat=True).iterator():
+            clave = 'archivadas' if politicas[tipo]['accion'] == 'archivar' else 'eliminadas'
+            resultado[clave] += 1
+        return resultado
+
+    ultimo_id = 0
+    while max_lotes is None or resultado['lotes'] < max_lotes:
+        ids = list(retirables.filter(pk__gt=ultimo_id).values_list('pk', flat=True)[:tamano_lote])
+        if not ids:
+            break
+        archivadas, eliminadas = _procesar_lote(ids, politicas, ahora)
+        resultado['archivadas'] += archivadas
+        resultado['eliminadas'] += eliminadas
+        resultado['lotes'] += 1
+        ultimo_id = ids[-1]
+        if pausa:
+            time_module.sleep(pausa)
+    return resultado
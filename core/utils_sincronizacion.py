@@ -0,0 +1,165 @@
+"""
+Sincronización incremental para clientes móviles y SPA.
+
+Cada alta, cambio o baja de citas, notificaciones, derivaciones y recetas
+deja una fila en RegistroCambio (por señales, o explícitamente en las
+operaciones masivas que no las disparan). El cliente guarda la marca de agua
+que le devuelve el servidor y en la siguiente petición recibe solo las filas
+que cambiaron desde entonces, más las ids eliminadas. Las notificaciones
+que dejan de estar activas (su cita se atendió o se eliminó) también llegan
+como eliminadas.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+# modelo sincronizado -> (modelo Django, campo del dueño en RegistroCambio, campos enviados)
+MODELOS_SINCRONIZADOS = {
+    'cita': ('Cita', 'paciente_id', (
+        'id', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'motivo', 'medico_id',
+        'medico__usuario__nombres', 'medico__usuario__apellidos', 'medico__especialidad__nombre',
+        'consultorio__codigo', 'updated_at',
+    )),
+    'notificacion': ('Notificacion', 'usuario_id', (
+        'id', 'mensaje', 'tipo', 'leido', 'importante', 'url_redireccion', 'objeto_relacionado',
+        'objeto_id', 'cantidad', 'fecha_envio', 'updated_at',
+    )),
+    'derivacion': ('Derivacion', 'paciente_id', (
+        'id', 'especialidad_destino__nombre', 'fecha_derivacion', 'motivo', 'estado',
+        'vigencia_dias', 'cita_agendada', 'updated_at',
+    )),
+    'receta': ('RecetaMedica', 'paciente_id', (
+        'id', 'codigo_receta', 'estado', 'fecha_prescripcion', 'fecha_dispensacion',
+        'urgente', 'vigencia_dias', 'cita_id', 'updated_at',
+    )),
+}
+
+NOMBRES_POR_CLASE = {nombre_clase: modelo for modelo, (nombre_clase, _, _) in MODELOS_SINCRONIZADOS.items()}
+
+
+def _modelo(nombre):
+    from django.apps import apps
+    return apps.get_model('core', MODELOS_SINCRONIZADOS[nombre][0])
+
+
+def cambio_para(instancia, operacion='cambio'):
+    """RegistroCambio (sin guardar) para una instancia de un modelo sincronizado"""
+    from .models import RegistroCambio
+
+    modelo = NOMBRES_POR_CLASE[type(instancia).__name__]
+    campo_dueno = MODELOS_SINCRONIZADOS[modelo][1]
+    return RegistroCambio(
+        modelo=modelo, objeto_id=instancia.pk, operacion=operacion,
+        **{campo_dueno: getattr(instancia, campo_dueno)},
+    )
+
+
+def registrar_cambios(instancias, operacion='cambio'):
+    """Registra en un solo INSERT los cambios de operaciones masivas (update, bulk_create, ...)"""
+    from .models import RegistroCambio
+
+    cambios = [cambio_para(instancia, operacion) for instancia in instancias]
+    if cambios:
+        RegistroCambio.objects.bulk_create(cambios)
+
+
+def marca_actual():
+    from .models import RegistroCambio
+    return RegistroCambio.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def _filas(nombre, dueno, ids=None):
+    modelo = _modelo(nombre)
+    _, campo_dueno, campos = MODELOS_SINCRONIZADOS[nombre]
+    consulta = modelo.objects.filter(**{campo_dueno: dueno})
+    if nombre == 'notificacion':
+        # Misma visibilidad en la completa y en la incremental: las que salen
+        # de activas() llegan como eliminadas
+        consulta = consulta.activas()
+    consulta = consulta.order_by()
+    if ids is not None:
+        consulta = consulta.filter(pk__in=ids)
+    return list(consulta.values(*campos))
+
+
+def sincronizar(usuario, desde=None, limite=None):
+    """
+    Cambios visibles para ``usuario`` posteriores a la marca ``desde``
+
+    Args:
+        usuario: Usuario autenticado (sus citas, derivaciones y recetas como paciente)
+        desde (int): Marca devuelta por la sincronización anterior; None para todo
+        limite (int): Máximo de entradas del registro por respuesta
+
+    Returns:
+        dict: {'marca', 'completo', 'hay_mas', 'cambios': {modelo: [filas]},
+               'eliminados': {modelo: [ids]}}
+
+    Si ``desde`` es anterior al registro conservado (ver purgar_registro_cambios)
+    se responde con el estado completo y ``completo=True``: el cliente debe
+    reemplazar sus datos en lugar de combinarlos.
+    """
+    from .models import Paciente, RegistroCambio
+
+    limite = limite or getattr(settings, 'SINCRONIZACION_LIMITE', 500)
+    dueno = {
+        'usuario_id': usuario.pk,
+        'paciente_id': Paciente.objects.filter(usuario=usuario).values_list('pk', flat=True).first(),
+    }
+    primera = RegistroCambio.objects.order_by('pk').values_list('pk', flat=True).first()
+    respuesta = {'completo': False, 'hay_mas': False, 'cambios': {}, 'eliminados': {}}
+
+    if desde is None or (primera is not None and desde < primera - 1):
+        # La marca se toma antes de leer: un cambio concurrente se repite, no se pierde
+        respuesta['marca'] = marca_actual()
+        respuesta['completo'] = True
+        for nombre, (_, campo_dueno, _) in MODELOS_SINCRONIZADOS.items():
+            respuesta['cambios'][nombre] = _filas(nombre, dueno[campo_dueno]) if dueno[campo_dueno] else []
+        return respuesta
+
+    filtro_dueno = models.Q(usuario_id=usuario.pk)
+    if dueno['paciente_id']:
+        filtro_dueno |= models.Q(paciente_id=dueno['paciente_id'])
+    # Las entradas muy recientes se dejan para la próxima vez: una transacción
+    # que aún no confirmó puede tener un id menor y quedaría detrás de la marca
+    margen = timezone.now() - timedelta(seconds=getattr(settings, 'SINCRONIZACION_MARGEN_SEGUNDOS', 2))
+    entradas = list(
+        RegistroCambio.objects.filter(filtro_dueno, pk__gt=desde, fecha__lte=margen)
+        .order_by('pk').values_list('pk', 'modelo', 'objeto_id', 'operacion')[:limite + 1]
+    )
+    respuesta['hay_mas'] = len(entradas) > limite
+    entradas = entradas[:limite]
+    respuesta['marca'] = entradas[-1][0] if entradas else desde
+
+    # Vale la última operación de cada objeto
+    ultimas = {}
+    for _, nombre, objeto_id, operacion in entradas:
+        ultimas.setdefault(nombre, {})[objeto_id] = operacion
+    for nombre, operaciones in ultimas.items():
+        campo_dueno = MODELOS_SINCRONIZADOS[nombre][1]
+        cambiados = [objeto_id for objeto_id, operacion in operaciones.items() if operacion == 'cambio']
+        filas = _filas(nombre, dueno[campo_dueno], cambiados) if cambiados else []
+        presentes = {fila['id'] for fila in filas}
+        respuesta['cambios'][nombre] = filas
+        respuesta['eliminados'][nombre] = sorted(
+            objeto_id for objeto_id in operaciones if objeto_id not in presentes
+        )
+    return respuesta
+
+
+def purgar_registro_cambios(dias=None):
+    """
+    Elimina las entradas del registro más antiguas que ``dias``; los clientes
+    con una marca anterior recibirán una sincronización completa
+
+    Returns:
+        int: Entradas eliminadas
+    """
+    from .models import RegistroCambio
+
+    dias = dias or getattr(settings, 'SINCRONIZACION_RETENCION_DIAS', 30)
+    limite = timezone.now() - timedelta(days=dias)
+    eliminadas, _ = RegistroCambio.objects.filter(fecha__lt=limite).delete()
+    return eliminadas
@@ -0,0 +1,204 @@
+"""
+Snapshots de inventario.
+
+Cada noche ``tomar_snapshot`` guarda, por medicamento, el saldo y la
+valorización al cierre del día anterior (SnapshotInventario). El stock de un
+medicamento en cualquier fecha se obtiene partiendo del punto conocido más
+cercano (el snapshot anterior, el posterior o el stock actual) y aplicando
+solo los movimientos entre ese punto y la fecha pedida, en lugar de sumar el
+historial completo de MovimientoInventario.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .utils_inventario import TIPOS_ENTRADA
+
+
+def fin_del_dia(fecha):
+    """Instante (aware, hora local) en que termina ``fecha``"""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def _neto():
+    """Suma de los movimientos con signo: entradas positivas y salidas negativas"""
+    return Coalesce(models.Sum(models.Case(
+        models.When(tipo_movimiento__in=TIPOS_ENTRADA, then=models.F('cantidad')),
+        default=-models.F('cantidad'),
+    )), 0)
+
+
+def netos_por_medicamento(desde=None, hasta=None, medicamento_ids=None):
+    """Variación neta del stock por medicamento entre ``desde`` (incluido) y ``hasta`` (excluido)"""
+    from .models import MovimientoInventario
+
+    consulta = MovimientoInventario.objects.all()
+    if desde is not None:
+        consulta = consulta.filter(fecha_movimiento__gte=desde)
+    if hasta is not None:
+        consulta = consulta.filter(fecha_movimiento__lt=hasta)
+    if medicamento_ids is not None:
+        consulta = consulta.filter(medicamento_id__in=medicamento_ids)
+    return dict(consulta.values('medicamento_id').annotate(neto=_neto()).order_by().values_list('medicamento_id', 'neto'))
+
+
+def tomar_snapshot(fecha=None):
+    """
+    Registra el saldo de cierre de ``fecha`` (por defecto ayer) de cada medicamento
+
+    El saldo se calcula desde el stock actual descontando los movimientos
+    posteriores al cierre, así el comando puede ejecutarse con retraso. Volver
+    a ejecutarlo para la misma fecha reemplaza los valores.
+
+    Returns:
+        int: Snapshots escritos
+    """
+    from .models import Medicamento, MovimientoInventario, SnapshotInventario
+
+    fecha = fecha or timezone.localdate() - timedelta(days=1)
+    corte = fin_del_dia(fecha)
+    posteriores = (
+        MovimientoInventario.objects.filter(medicamento=models.OuterRef('pk'), fecha_movimiento__gte=corte)
+        .order_by().values('medicamento').annotate(neto=_neto()).values('neto')
+    )
+    with transaction.atomic():
+        # Stock actual y movimientos posteriores al cierre en una sola sentencia: una
+        # dispensación confirmada entre dos lecturas separadas se contaría en una sola
+        medicamentos = Medicamento.objects.filter(created_at__lt=corte).annotate(
+            stock_cierre=models.F('stock_actual') - Coalesce(
+                models.Subquery(posteriores, output_field=models.IntegerField()), 0
+            ),
+        ).values_list('id', 'stock_cierre', 'precio_unitario')
+        snapshots = [
+            SnapshotInventario(
+                medicamento_id=medicamento_id, fecha=fecha, corte=corte,
+                stock=stock, precio_unitario=precio, valor=stock * precio,
+            )
+            for medicamento_id, stock, precio in medicamentos.iterator()
+        ]
+        SnapshotInventario.objects.bulk_create(
+            snapshots, batch_size=500, update_conflicts=True,
+            unique_fields=['medicamento', 'fecha'], update_fields=['corte', 'stock', 'precio_unitario', 'valor'],
+        )
+    return len(snapshots)
+
+
+def stock_en_fecha(medicamento, fecha):
+    """
+    Stock y valorización de un medicamento al cierre de ``fecha``
+
+    Returns:
+        dict: {'fecha', 'stock', 'precio_unitario', 'valor', 'origen', 'movimientos'}
+              donde ``origen`` es la fecha del snapshot usado o 'stock_actual' y
+              ``movimientos`` la cantidad de movimientos reproducidos
+    """
+    from .models import MovimientoInventario, SnapshotInventario
+
+    corte = fin_del_dia(fecha)
+    snapshots = SnapshotInventario.objects.filter(medicamento=medicamento)
+    puntos = [
+        (snapshot.corte, snapshot.stock, snapshot.precio_unitario, snapshot.fecha)
+        for snapshot in (
+            snapshots.filter(fecha__lte=fecha).order_by('-fecha').first(),
+            snapshots.filter(fecha__gt=fecha).order_by('fecha').first(),
+        ) if snapshot is not None
+    ]
+    puntos.append((timezone.now(), medicamento.stock_actual, medicamento.precio_unitario, 'stock_actual'))
+    momento, stock, precio, origen = min(puntos, key=lambda punto: abs(punto[0] - corte))
+
+    if momento <= corte:
+        desde, hasta, signo = momento, corte, 1
+    else:
+        desde, hasta, signo = corte, momento, -1
+    tramo = MovimientoInventario.objects.filter(
+        medicamento=medicamento, fecha_movimiento__gte=desde, fecha_movimiento__lt=hasta
+    ).aggregate(neto=_neto(), movimientos=models.Count('id'))
+    stock += signo * tramo['neto']
+    return {
+        'fecha': fecha,
+        'stock': stock,
+        'precio_unitario': precio,
+        'valor': stock * precio,
+        'origen': origen,
+        'movimientos': tramo['movimientos'],
+    }
+
+
+def verificar_consistencia(medicamento_ids=None):
+    """
+    Compara ``stock_actual`` con el último snapshot más los movimientos
+    posteriores (o el historial completo si el medicamento no tiene snapshot)
+
+    Returns:
+        list: Dicts con medicamento_id, codigo, nombre, stock_actual, esperado,
+              diferencia y desde (fecha del snapshot o None) de cada desvío
+    """
+    from .models import Medicamento, MovimientoInventario, SnapshotInventario
+
+    ultimo = SnapshotInventario.objects.filter(medicamento=models.OuterRef('pk')).order_by('-fecha')
+    posteriores = (
+        MovimientoInventario.objects.filter(
+            medicamento=models.OuterRef('pk'), fecha_movimiento__gte=models.OuterRef('snapshot_corte')
+        ).order_by().values('medicamento').annotate(neto=_neto()).values('neto')
+    )
+    medicamentos = Medicamento.objects.all()
+    if medicamento_ids is not None:
+        medicamentos = medicamentos.filter(pk__in=medicamento_ids)
+    filas = list(
+        medicamentos.annotate(
+            snapshot_fecha=models.Subquery(ultimo.values('fecha')[:1]),
+            snapshot_corte=models.Subquery(ultimo.values('corte')[:1]),
+            snapshot_stock=models.Subquery(ultimo.values('stock')[:1]),
+        ).annotate(
+            neto_posterior=Coalesce(models.Subquery(posteriores), 0),
+        ).order_by('pk').values(
+            'id', 'codigo', 'nombre_comercial', 'stock_actual', 'snapshot_fecha', 'snapshot_stock', 'neto_posterior',
+        )
+    )
+    sin_snapshot = [fila['id'] for fila in filas if fila['snapshot_fecha'] is None]
+    historial = netos_por_medicamento(medicamento_ids=sin_snapshot) if sin_snapshot else {}
+
+    desvios = []
+    for fila in filas:
+        if fila['snapshot_fecha'] is None:
+            esperado = historial.get(fila['id'], 0)
+        else:
+            esperado = fila['snapshot_stock'] + fila['neto_posterior']
+        if esperado != fila['stock_actual']:
+            desvios.append({
+                'medicamento_id': fila['id'],
+                'codigo': fila['codigo'],
+                'nombre': fila['nombre_comercial'],
+                'stock_actual': fila['stock_actual'],
+                'esperado': esperado,
+                'diferencia': fila['stock_actual'] - esperado,
+                'desde': fila['snapshot_fecha'],
+            })
+    return desvios
+
+
+def valorizacion_mensual(meses=12, hasta=None):
+    """
+    Unidades y valor total del inventario al último snapshot de cada mes
+
+    Returns:
+        list: Dicts {'mes', 'fecha', 'unidades', 'valor', 'medicamentos'} en orden cronológico
+    """
+    from .models import SnapshotInventario
+
+    hasta = hasta or timezone.localdate()
+    inicio = (hasta.replace(day=1) - timedelta(days=31 * (meses - 1))).replace(day=1)
+    cierres = list(
+        SnapshotInventario.objects.filter(fecha__gte=inicio, fecha__lte=hasta)
+        .annotate(mes=TruncMonth('fecha')).values('mes').annotate(ultima=models.Max('fecha'))
+        .order_by().values_list('ultima', flat=True)
+    )
+    totales = (
+        SnapshotInventario.objects.filter(fecha__in=cierres)
+        .values('fecha').annotate(
+            unidades=models.Sum('stock'), valor=models.Sum('valor'), medicamentos=models.Count('id'),
+        ).order_by('fecha')
+    )
+    return [{'mes': fila['fecha'].replace(day=1), **fila} for fila in totales]
@@ -0,0 +1,189 @@
+"""
+Barrido de vencimientos de recetas y medicamentos.
+
+Las recetas pendientes o parciales cuya ``fecha_limite`` ya pasó pasan al
+estado 'vencida' con un UPDATE por lote de ``TAMANO_LOTE`` (índice
+receta_estado_limite_idx), así las listas filtran en SQL sin evaluar
+``esta_vigente()`` receta por receta. Cada lote va en su propia transacción
+corta y omite las recetas bloqueadas en ese momento (p. ej. una dispensación
+en curso): quedan para el próximo barrido.
+
+Los lotes con existencias que vencen pronto se agrupan en tramos
+(FARMACIA_TRAMOS_VENCIMIENTO, 7/30/90 días por defecto) y se guardan en la tabla
+AlertaVencimiento, que leen las alertas y los dashboards de farmacia en lugar
+de recalcular los vencimientos en cada vista. El comando ``barrer_vencimientos``
+hace ambas cosas y está pensado para ejecutarse cada noche (y, si se quiere,
+cada hora).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .utils_estadisticas_farmacia import invalidar_estadisticas
+from .utils_sincronizacion import registrar_cambios
+
+ESTADOS_POR_VENCER = ('pendiente', 'parcial')
+TAMANO_LOTE = 1000
+
+
+def tramos_vencimiento():
+    return tuple(sorted(getattr(settings, 'FARMACIA_TRAMOS_VENCIMIENTO', (7, 30, 90))))
+
+
+def tramo_de(fecha_vencimiento, hoy):
+    """0 si ya venció, el primer tramo que la contiene, o None si vence después del último"""
+    dias = (fecha_vencimiento - hoy).days
+    if dias < 0:
+        return 0
+    return next((tramo for tramo in tramos_vencimiento() if dias <= tramo), None)
+
+
+def completar_fecha_limite():
+    """Calcula fecha_limite de las recetas creadas sin pasar por save() (bulk_create, cargas)"""
+    from .models import RecetaMedica
+
+    recetas = list(RecetaMedica.objects.filter(fecha_limite__isnull=True).only('id', 'fecha_prescripcion', 'vigencia_dias'))
+    for receta in recetas:
+        receta.fecha_limite = receta.fecha_prescripcion + timedelta(days=receta.vigencia_dias or 0)
+    RecetaMedica.objects.bulk_update(recetas, ['fecha_limite'], batch_size=1000)
+    return len(recetas)
+
+
+def _vencer_lote(desde, ahora):
+    from .models import RecetaMedica
+
+    with transaction.atomic():
+        candidatas = RecetaMedica.objects.filter(
+            estado__in=ESTADOS_POR_VENCER, fecha_limite__lt=ahora, pk__gt=desde,
+        ).order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            candidatas = candidatas.select_for_update(skip_locked=True)
+        lote = list(candidatas.values_list('pk', 'paciente_id')[:TAMANO_LOTE])
+        if lote:
+            RecetaMedica.objects.filter(pk__in=[pk for pk, _ in lote]).update(
+                estado='vencida', tomada_por=None, tomada_en=None, updated_at=ahora,
+            )
+            # update() no dispara post_save: el cambio de estado se registra para la sincronización
+            registrar_cambios(RecetaMedica(pk=pk, paciente_id=paciente_id) for pk, paciente_id in lote)
+    return lote
+
+
+def vencer_recetas(ahora=None):
+    """
+    Marca como 'vencidas' las recetas pendientes o parciales fuera de vigencia
+
+    Returns:
+        int: Recetas vencidas
+    """
+    ahora = ahora or timezone.now()
+    vencidas, ultimo_id = 0, 0
+    while True:
+        lote = _vencer_lote(ultimo_id, ahora)
+        if not lote:
+            break
+        vencidas += len(lote)
+        ultimo_id = lote[-1][0]
+    if vencidas:
+        invalidar_estadisticas()
+    return vencidas
+
+
+def recalcular_alertas_vencimiento(hoy=None):
+    """
+    Reemplaza la tabla AlertaVencimiento con los lotes con existencias de
+    medicamentos activos vencidos o que vencen dentro del último tramo, más
+    el stock sin lote de esos medicamentos
+
+    Returns:
+        int: Alertas registradas
+    """
+    from .models import AlertaVencimiento, LoteMedicamento, Medicamento
+
+    hoy = hoy or timezone.localdate()
+    ahora = timezone.now()
+    horizonte = hoy + timedelta(days=tramos_vencimiento()[-1])
+    lotes = LoteMedicamento.objects.filter(
+        cantidad__gt=0, medicamento__activo=True, fecha_vencimiento__lte=horizonte,
+    ).values_list('id', 'medicamento_id', 'fecha_vencimiento', 'cantidad')
+    # Stock que no está en ningún lote (cargas anteriores a los lotes, ajustes):
+    # su único vencimiento conocido es el del medicamento
+    sin_lote = Medicamento.objects.filter(activo=True, fecha_vencimiento__lte=horizonte).annotate(
+        en_lotes=Coalesce(models.Sum('lotes__cantidad', filter=models.Q(lotes__cantidad__gt=0)), 0),
+    ).filter(stock_actual__gt=models.F('en_lotes')).values_list(
+        models.Value(None, output_field=models.IntegerField()), 'id', 'fecha_vencimiento',
+        models.F('stock_actual') - models.F('en_lotes'),
+    )
+    alertas = [
+        AlertaVencimiento(
+            lote_id=lote_id, medicamento_id=medicamento_id, fecha_vencimiento=vencimiento,
+            cantidad=cantidad, tramo=tramo_de(vencimiento, hoy), calculado_en=ahora,
+        )
+        for consulta in (lotes, sin_lote)
+        for lote_id, medicamento_id, vencimiento, cantidad in consulta.iterator()
+    ]
+    with transaction.atomic():
+        AlertaVencimiento.objects.all().delete()
+        AlertaVencimiento.objects.bulk_create(alertas, batch_size=1000)
+    invalidar_estadisticas()
+    return len(alertas)
+
+
+def barrer_vencimientos(ahora=None):
+    """
+    Returns:
+        dict: fechas_completadas, recetas_vencidas y alertas_vencimiento
+    """
+    ahora = ahora or timezone.now()
+    return {
+        'fechas_completadas': completar_fecha_limite(),
+        'recetas_vencidas': vencer_recetas(ahora),
+        'alertas_vencimiento': recalcular_alertas_vencimiento(timezone.localdate(ahora)),
+    }
+
+
+def medicamentos_por_vencer(hasta_tramo, incluir_vencidos=True):
+    """
+    Un registro por medicamento con lotes en los tramos hasta ``hasta_tramo``
+
+    Returns:
+        QuerySet: values con medicamento_id, nombre_comercial, codigo,
+                  vencimiento (el más próximo) y unidades
+    """
+    from .models import AlertaVencimiento
+
+    alertas = AlertaVencimiento.objects.filter(tramo__lte=hasta_tramo)
+    if not incluir_vencidos:
+        alertas = alertas.filter(tramo__gt=0)
+    return (
+        alertas.values('medicamento_id')
+        .annotate(
+            nombre_comercial=models.F('medicamento__nombre_comercial'),
+            codigo=models.F('medicamento__codigo'),
+            vencimiento=models.Min('fecha_vencimiento'),
+            unidades=models.Sum('cantidad'),
+        ).order_by('vencimiento', 'medicamento_id')
+    )
+
+
+def resumen_vencimientos():
+    """
+    Returns:
+        list: Por tramo (0 = vencidos), dicts {'tramo', 'lotes', 'medicamentos', 'unidades'}
+    """
+    from .models import AlertaVencimiento
+
+    conteos = {
+        fila['tramo']: fila
+        for fila in AlertaVencimiento.objects.values('tramo').annotate(
+            lotes=models.Count('lote'),
+            medicamentos=models.Count('medicamento', distinct=True),
+            unidades=models.Sum('cantidad'),
+        ).order_by()
+    }
+    return [
+        conteos.get(tramo, {'tramo': tramo, 'lotes': 0, 'medicamentos': 0, 'unidades': 0})
+        for tramo in (0, *tramos_vencimiento())
+    ]
@@ -17,6 +17,10 @@ from django.db.models import Sum
 from core.models import DetalleReceta, Medicamento
 from django.contrib.auth.models import Group
 from core.models import Especialidad
+from .utils_notificaciones import obtener_no_leidas
+from .utils_reposicion import pronostico_reposicion
+from .utils_vencimientos import medicamentos_por_vencer, resumen_vencimientos
+from . import utils_catalogos
 
 # Vistas pÃºblicas
 def home(request):
@@ -57,7 +61,7 @@ def registro_view(request):
     """Vista de registro de usuarios con selecciÃ³n de rol"""
     # Cargar todas las especialidades para el formulario
     from .models import Especialidad
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     if request.method == 'POST':
         form = RegistroPacienteForm(request.POST)
@@ -83,7 +87,7 @@ def registro_view(request):
                 
                 try:
                     if especialidad_id and especialidad_id.isdigit():
-                        especialidad = Especialidad.objects.get(id=especialidad_id)
+                        especialidad = utils_catalogos.especialidades().obtener(especialidad_id)
                     else:
                         # Si no se seleccionÃ³ especialidad, usar General como predeterminada
                         especialidad, _ = Especialidad.objects.get_or_create(nombre='General')
@@ -342,12 +346,7 @@ def api_dashboard(request):
             } for cita in proximas_citas]
             
             # Notificaciones no leídas
-            notificaciones = Notificacion.objects.filter(
-                usuario=user,
-                leido=False
-            ).count()
-            
-            data['notificaciones_no_leidas'] = notificaciones
+            data['notificaciones_no_leidas'] = obtener_no_leidas(user)
             
             # Menú para pacientes
             menu = [
@@ -385,12 +384,7 @@ def api_dashboard(request):
             } for cita in citas_hoy]
             
             # Notificaciones no leídas
-            notificaciones = Notificacion.objects.filter(
-                usuario=user,
-                leido=False
-            ).count()
-            
-            data['notificaciones_no_leidas'] = notificaciones
+            data['notificaciones_no_leidas'] = obtener_no_leidas(user)
             
             # Menú para médicos
             menu = [
@@ -428,12 +422,7 @@ def api_dashboard(request):
         } for cita in citas_hoy]
         
         # Notificaciones no leídas
-        notificaciones = Notificacion.objects.filter(
-            usuario=user,
-            leido=False
-        ).count()
-        
-        data['notificaciones_no_leidas'] = notificaciones
+        data['notificaciones_no_leidas'] = obtener_no_leidas(user)
         
         # Menú para personal de admisión
         menu = [
@@ -463,12 +452,7 @@ def api_dashboard(request):
         }
         
         # Notificaciones no leídas
-        notificaciones = Notificacion.objects.filter(
-            usuario=user,
-            leido=False
-        ).count()
-        
-        data['notificaciones_no_leidas'] = notificaciones
+        data['notificaciones_no_leidas'] = obtener_no_leidas(user)
         
         menu = [
             {
@@ -684,12 +668,7 @@ def tendencias_citas(request):
             } for cita in proximas_citas]
             
             # Notificaciones no leÃ­das
-            notificaciones = Notificacion.objects.filter(
-                usuario=user,
-                leido=False
-            ).count()
-            
-            data['notificaciones_no_leidas'] = notificaciones
+            data['notificaciones_no_leidas'] = obtener_no_leidas(user)
             
             # MenÃº para pacientes
             menu = [
@@ -727,12 +706,7 @@ def tendencias_citas(request):
             } for cita in citas_hoy]
             
             # Notificaciones no leÃ­das
-            notificaciones = Notificacion.objects.filter(
-                usuario=user,
-                leido=False
-            ).count()
-            
-            data['notificaciones_no_leidas'] = notificaciones
+            data['notificaciones_no_leidas'] = obtener_no_leidas(user)
             
             # MenÃº para mÃ©dicos
             menu = [
@@ -773,12 +747,7 @@ def tendencias_citas(request):
         } for cita in citas_hoy]
         
         # Notificaciones no leÃ­das
-        notificaciones = Notificacion.objects.filter(
-            usuario=user,
-            leido=False
-        ).count()
-        
-        data['notificaciones_no_leidas'] = notificaciones
+        data['notificaciones_no_leidas'] = obtener_no_leidas(user)
         
         # MenÃº para personal de admisiÃ³n
         menu = [
@@ -811,12 +780,7 @@ def tendencias_citas(request):
         }
         
         # Notificaciones no leÃ­das
-        notificaciones = Notificacion.objects.filter(
-            usuario=user,
-            leido=False
-        ).count()
-        
-        data['notificaciones_no_leidas'] = notificaciones
+        data['notificaciones_no_leidas'] = obtener_no_leidas(user)
         
         menu = [
             {
@@ -1021,8 +985,7 @@ id=notificacion_id, usuario=request.user)
 def contador_notificaciones(request):
     """Devuelve el nÃºmero de notificaciones no leÃ­das del usuario"""
     try:
-        no_leidas = Notificacion.objects.filter(usuario=request.user, 
-leido=False).count()
+        no_leidas = obtener_no_leidas(request.user)
         return JsonResponse({'success': True, 'no_leidas': no_leidas})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -1039,7 +1002,7 @@ def comparativas_citas(request):
         return redirect('dashboard_view')
     
     # Obtener todas las especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Configurar fechas predeterminadas (mes actual)
     hoy = timezone.now().date()
@@ -1093,14 +1056,11 @@ def api_comparativa_citas(request):
     try:
         # Verificar que el usuario tenga rol de administrador
         if not request.user.rol or request.user.rol.nombre != 'Administrador':
-            logger.warning(f"Acceso denegado: Usuario {request.user.username} no tiene rol de Administrador")
+            logger.warning("Acceso denegado: Usuario %s no tiene rol de Administrador", request.user.username)
             return JsonResponse({'error': 'No tienes permisos para acceder a esta información', 'status': 'error'}, status=403)
             
-        # Preparar logger para seguimiento detallado
-        logger.info("API comparativa_citas - Iniciando procesamiento")
-    
         # Log de parámetros recibidos en la petición
-        logger.info(f"API comparativa_citas - Parámetros recibidos: {request.GET}")
+        logger.debug("API comparativa_citas - Parámetros recibidos: %s", request.GET)
         
         # Obtener parámetros de filtro para el primer período
         periodo1 = request.GET.get('periodo1', 'mensual')
@@ -1119,7 +1079,12 @@ def api_comparativa_citas(request):
         # Verificar si se solicitan dimensiones adicionales
         incluir_dimensiones = request.GET.get('incluir_dimensiones') == 'true'
         
-        logger.info(f"Parámetros procesados: periodo1={periodo1}, fecha_inicio1={fecha_inicio1}, fecha_fin1={fecha_fin1}, periodo2={periodo2}, fecha_inicio2={fecha_inicio2}, fecha_fin2={fecha_fin2}, especialidad={especialidad_id}, medico={medico_id}, incluir_dimensiones={incluir_dimensiones}")
+        logger.debug(
+            "Parámetros procesados: periodo1=%s, fecha_inicio1=%s, fecha_fin1=%s, periodo2=%s, fecha_inicio2=%s, "
+            "fecha_fin2=%s, especialidad=%s, medico=%s, incluir_dimensiones=%s",
+            periodo1, fecha_inicio1, fecha_fin1, periodo2, fecha_inicio2, fecha_fin2,
+            especialidad_id, medico_id, incluir_dimensiones
+        )
         
         # Convertir fechas a objetos date
         fecha_inicio1 = datetime.strptime(fecha_inicio1, '%Y-%m-%d').date() if fecha_inicio1 else None
@@ -1129,30 +1094,23 @@ def api_comparativa_citas(request):
         
         # Función para obtener datos de citas según filtros
         def obtener_datos_periodo(fecha_inicio, fecha_fin, especialidad_id, medico_id):
-            import logging
-            logger = logging.getLogger(__name__)
-            
             # Log de parámetros recibidos
-            logger.info(f"obtener_datos_periodo - Parámetros: fecha_inicio={fecha_inicio}, fecha_fin={fecha_fin}, especialidad_id={especialidad_id}, medico_id={medico_id}")
+            logger.debug(
+                "obtener_datos_periodo - Parámetros: fecha_inicio=%s, fecha_fin=%s, especialidad_id=%s, medico_id=%s",
+                fecha_inicio, fecha_fin, especialidad_id, medico_id
+            )
             
             # Consulta base para citas
             query = Cita.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
-            logger.info(f"Citas encontradas en rango de fechas: {query.count()}")
             
             # Aplicar filtros adicionales si se proporcionan y son válidos
             # Si especialidad_id es '0' o 'Todas', no aplicar filtro (mostrar todas)
             if especialidad_id and especialidad_id not in ['0', 'Todas'] and especialidad_id.isdigit():
                 query = query.filter(medico__especialidad_id=especialidad_id)
-                logger.info(f"Aplicando filtro de especialidad {especialidad_id}, citas restantes: {query.count()}")
-            else:
-                logger.info(f"No se aplica filtro de especialidad, valor recibido: {especialidad_id}")
             
             # Si medico_id es '0' o 'Todos', no aplicar filtro (mostrar todos)
             if medico_id and medico_id not in ['0', 'Todos'] and medico_id.isdigit():
                 query = query.filter(medico__id=medico_id)  # Corregido: medico__id en lugar de medico_id
-                logger.info(f"Aplicando filtro de médico {medico_id}, citas restantes: {query.count()}")
-            else:
-                logger.info(f"No se aplica filtro de médico, valor recibido: {medico_id}")
             
             # Contar citas por estado (usando los nombres exactos de la base de datos, en minúsculas)
             pendientes = query.filter(estado='pendiente').count()
@@ -1164,7 +1122,10 @@ def api_comparativa_citas(request):
             total = pendientes + confirmadas + atendidas + canceladas
             
             # Log con resultados finales
-            logger.info(f"Resultados finales: total={total}, pendientes={pendientes}, confirmadas={confirmadas}, atendidas={atendidas}, canceladas={canceladas}")
+            logger.debug(
+                "Resultados finales: total=%s, pendientes=%s, confirmadas=%s, atendidas=%s, canceladas=%s",
+                total, pendientes, confirmadas, atendidas, canceladas
+            )
             
             # Calcular porcentaje de asistencia (citas atendidas dividido por el total)
             porcentaje_asistencia = round((atendidas / total) * 100, 2) if total > 0 else 0
@@ -1180,11 +1141,11 @@ def api_comparativa_citas(request):
         
         # Función para obtener datos por especialidad
         def obtener_datos_especialidades(fecha_inicio, fecha_fin, especialidad_id, medico_id):
-            logger.info(f"Obteniendo datos por especialidad: periodo {fecha_inicio} - {fecha_fin}")
+            logger.debug("Obteniendo datos por especialidad: periodo %s - %s", fecha_inicio, fecha_fin)
             
             # Si se ha seleccionado una especialidad específica, no tiene sentido mostrar la comparativa por especialidades
             if especialidad_id and especialidad_id not in ['0', 'Todas'] and especialidad_id.isdigit():
-                logger.info(f"Se ha seleccionado una especialidad específica ({especialidad_id}), no se muestra comparativa por especialidades")
+                logger.debug("Se ha seleccionado una especialidad específica (%s), no se muestra comparativa por especialidades", especialidad_id)
                 return []
             
             # En lugar de buscar a través de la relación inversa compleja, primero obtenemos todos los médicos con citas
@@ -1199,8 +1160,6 @@ def api_comparativa_citas(request):
                 medicos__id__in=ids_medicos_con_citas
             ).distinct()
             
-            logger.info(f"Encontradas {especialidades.count()} especialidades con citas en el período")
-            
             resultados = []
             
             for especialidad in especialidades:
@@ -1239,7 +1198,7 @@ def api_comparativa_citas(request):
         
         # Función para obtener datos por día de la semana
         def obtener_datos_dias_semana(fecha_inicio, fecha_fin, especialidad_id, medico_id):
-            logger.info(f"Obteniendo datos por día de la semana: periodo {fecha_inicio} - {fecha_fin}")
+            logger.debug("Obteniendo datos por día de la semana: periodo %s - %s", fecha_inicio, fecha_fin)
             
             dias_semana = {
                 'lunes': {'pendientes': 0, 'confirmadas': 0, 'atendidas': 0, 'canceladas': 0, 'total': 0},
@@ -1261,8 +1220,6 @@ def api_comparativa_citas(request):
             if medico_id and medico_id not in ['0', 'Todos'] and medico_id.isdigit():
                 query = query.filter(medico__id=medico_id)  # Corregido: medico__id en lugar de medico_id
             
-            logger.info(f"Analizando {query.count()} citas para datos por día de la semana")
-            
             # Para cada cita, incrementar el contador correspondiente
             for cita in query:
                 # Convertir número de día de semana (0-6, donde 0 es lunes) a nombre
@@ -1282,13 +1239,13 @@ def api_comparativa_citas(request):
                     dias_semana[dia_semana][mapeo_estados[cita.estado]] += 1
                     dias_semana[dia_semana]['total'] += 1
                 else:
-                    logger.warning(f"Estado de cita no reconocido: {cita.estado}")
+                    logger.warning("Estado de cita no reconocido: %s", cita.estado)
             
             return dias_semana
         
         # Función para obtener datos por horario (mañana vs tarde)
         def obtener_datos_horarios(fecha_inicio, fecha_fin, especialidad_id, medico_id):
-            logger.info(f"Obteniendo datos por horario: periodo {fecha_inicio} - {fecha_fin}")
+            logger.debug("Obteniendo datos por horario: periodo %s - %s", fecha_inicio, fecha_fin)
             
             # Definir horarios (12:00 como límite entre mañana y tarde)
             horarios = {
@@ -1306,8 +1263,6 @@ def api_comparativa_citas(request):
             if medico_id and medico_id not in ['0', 'Todos'] and medico_id.isdigit():
                 query = query.filter(medico__id=medico_id)  # Corregido: medico__id en lugar de medico_id
             
-            logger.info(f"Analizando {query.count()} citas para datos por horario")
-            
             # Para cada cita, incrementar el contador correspondiente
             for cita in query:
                 # Determinar si es mañana o tarde basado en la hora_inicio
@@ -1326,7 +1281,7 @@ def api_comparativa_citas(request):
                     horarios[horario][mapeo_estados[cita.estado]] += 1
                     horarios[horario]['total'] += 1
                 else:
-                    logger.warning(f"Estado de cita no reconocido: {cita.estado}")
+                    logger.warning("Estado de cita no reconocido: %s", cita.estado)
             
             return horarios
         
@@ -1350,7 +1305,7 @@ def api_comparativa_citas(request):
             campos_requeridos = ['pendientes', 'confirmadas', 'atendidas', 'canceladas', 'total', 'porcentaje_asistencia']
             for key in campos_requeridos:
                 if key not in periodo or periodo[key] is None:
-                    logger.warning(f"Campo {key} faltante o nulo en datos del período, estableciendo a 0")
+                    logger.warning("Campo %s faltante o nulo en datos del período, estableciendo a 0", key)
                     periodo[key] = 0
                     
             # Verificación adicional del porcentaje de asistencia
@@ -1360,10 +1315,10 @@ def api_comparativa_citas(request):
             else:
                 periodo['porcentaje_asistencia'] = 0
                 
-            logger.info(f"Datos del período validados: {periodo}")
+            logger.debug("Datos del período validados: %s", periodo)
 
         # Registrar en el log las variaciones calculadas
-        logger.info(f"Variaciones calculadas entre periodos: {variaciones}")
+        logger.debug("Variaciones calculadas entre periodos: %s", variaciones)
         
         # Calcular variaciones porcentuales
         variaciones_porcentuales = {}
@@ -1381,7 +1336,7 @@ def api_comparativa_citas(request):
             else:
                 variaciones_porcentuales[key] = 0.0
         
-        logger.info(f"Variaciones porcentuales calculadas: {variaciones_porcentuales}")
+        logger.debug("Variaciones porcentuales calculadas: %s", variaciones_porcentuales)
         
         # Verificar si hay datos (al menos una cita en alguno de los periodos)
         if datos_periodo1['total'] > 0 or datos_periodo2['total'] > 0:
@@ -1399,7 +1354,10 @@ def api_comparativa_citas(request):
                 'variaciones_porcentuales': variaciones_porcentuales,
                 'status': 'success'
             }
-            logger.info(f"API comparativa_citas - Devolviendo datos con éxito: {datos_periodo1['total']} citas en periodo 1, {datos_periodo2['total']} citas en periodo 2")
+            logger.debug(
+                "API comparativa_citas - Devolviendo datos con éxito: %s citas en periodo 1, %s citas en periodo 2",
+                datos_periodo1['total'], datos_periodo2['total']
+            )
         else:
             # No hay datos, pero aun así devolver una estructura válida para evitar errores en el frontend
             response = {
@@ -1416,18 +1374,18 @@ def api_comparativa_citas(request):
                 'status': 'success',
                 'message': 'No se encontraron citas para los períodos y filtros seleccionados'
             }
-            logger.warning(f"API comparativa_citas - No se encontraron citas para los filtros seleccionados")
+            logger.debug("API comparativa_citas - No se encontraron citas para los filtros seleccionados")
         
         # Agregar dimensiones adicionales si se solicitan
         if incluir_dimensiones:
-            logger.info("Se solicitaron dimensiones adicionales, procesando datos...")
+            logger.debug("Se solicitaron dimensiones adicionales, procesando datos...")
             
             # Combinar datos de ambos períodos para las dimensiones adicionales
             # (Usar el rango de fechas más amplio entre los dos períodos)
             fecha_inicio_combinada = min(fecha_inicio1, fecha_inicio2)
             fecha_fin_combinada = max(fecha_fin1, fecha_fin2)
             
-            logger.info(f"Rango combinado para dimensiones adicionales: {fecha_inicio_combinada} - {fecha_fin_combinada}")
+            logger.debug("Rango combinado para dimensiones adicionales: %s - %s", fecha_inicio_combinada, fecha_fin_combinada)
             
             # Obtener datos para las diferentes dimensiones
             datos_especialidades = obtener_datos_especialidades(fecha_inicio_combinada, fecha_fin_combinada, especialidad_id, medico_id)
@@ -1441,20 +1399,16 @@ def api_comparativa_citas(request):
                 'horarios': datos_horarios
             }
             
-            logger.info(f"Datos de dimensiones adicionales agregados: {len(datos_especialidades)} especialidades, {len(datos_dias_semana)} días, {len(datos_horarios)} horarios")
+            logger.debug(
+                "Datos de dimensiones adicionales agregados: %s especialidades, %s días, %s horarios",
+                len(datos_especialidades), len(datos_dias_semana), len(datos_horarios)
+            )
         
         return JsonResponse(response)
     
     except Exception as e:
-        import traceback
-        import sys
-        # Obtener la traza completa del error
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        # Convertir la traza en texto para el log
-        trace_details = traceback.format_exception(exc_type, exc_value, exc_traceback)
-        # Registrar el error completo en el log
-        logger.error(f"Error en api_comparativa_citas: {str(e)}")
-        logger.error(f"Traza completa: {''.join(trace_details)}")
+        # Registrar el error con la traza completa en el log
+        logger.exception("Error en api_comparativa_citas: %s", e)
         
         # Devolver una respuesta con estructura segura que no causará errores en el frontend
         # Generamos una respuesta mínima pero válida que el frontend puede manejar
@@ -1566,7 +1520,7 @@ def tasas_asistencia(request):
         return redirect('dashboard_view')
     
     # Obtener todas las especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Renderizar la plantilla
     return render(request, 'admin/tasas_asistencia.html', {
@@ -1801,16 +1755,27 @@ def admin_reporte_stock_critico(request):
     if not request.user.is_authenticated or not user_is_admin(request.user):
         return render(request, '403.html')
     if request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.GET.get('ajax'):
-        hoy = timezone.now().date()
-        proximos_vencer = Medicamento.objects.filter(fecha_vencimiento__lte=hoy+timedelta(days=30), activo=True)
+        # Lotes vencidos o que vencen en 30 días, precalculados por barrer_vencimientos
+        por_vencer = list(medicamentos_por_vencer(30))
+        proximos_vencer = [
+            {'nombre_comercial': fila['nombre_comercial'], 'fecha_vencimiento': fila['vencimiento'], 'stock_actual': fila['unidades']}
+            for fila in por_vencer
+        ]
+        ids_por_vencer = [fila['medicamento_id'] for fila in por_vencer]
         stock_critico = Medicamento.objects.filter(stock_actual__lte=models.F('stock_minimo'), activo=True)
         # Para la gráfica: nombre y cantidad en riesgo (stock crítico o próximos a vencer)
-        en_riesgo = Medicamento.objects.filter(activo=True).filter(models.Q(stock_actual__lte=models.F('stock_minimo')) | models.Q(fecha_vencimiento__lte=hoy+timedelta(days=30)))
+        en_riesgo = Medicamento.objects.filter(activo=True).filter(models.Q(stock_actual__lte=models.F('stock_minimo')) | models.Q(pk__in=ids_por_vencer))
         labels = [m.nombre_comercial for m in en_riesgo]
         data = [m.stock_actual for m in en_riesgo]
         return JsonResponse({
             'stock_critico': list(stock_critico.values('nombre_comercial', 'stock_actual', 'stock_minimo', 'fecha_vencimiento')),
-            'proximos_vencer': list(proximos_vencer.values('nombre_comercial', 'fecha_vencimiento', 'stock_actual')),
+            'proximos_vencer': proximos_vencer,
+            'vencimientos': resumen_vencimientos(),
+            # Los que se agotan antes de que llegue un pedido, según el consumo reciente
+            'reposicion': [
+                {**fila, 'fecha_agotamiento': fila['fecha_agotamiento'] and fila['fecha_agotamiento'].isoformat()}
+                for fila in pronostico_reposicion(estados=('agotado', 'reponer'))[:20]
+            ],
             'grafico': {'labels': labels, 'data': data}
         })
     return render(request, 'admin/reportes_farmacia_stock_critico.html', {})
@@ -12,7 +12,8 @@ import json
 from .models import Paciente, Especialidad, Medico, Consultorio, Cita, Derivacion, Notificacion, DisponibilidadMedica, Usuario
 from .decorators import admision_required
 from .views_paciente import obtener_horarios_disponibles
-from .utils_notificaciones import crear_notificacion
+from .utils_notificaciones import crear_notificacion, crear_notificaciones_agrupadas
+from . import utils_catalogos
 
 @login_required
 @admision_required
@@ -20,7 +21,7 @@ def registrar_cita(request):
     """Vista para que el personal de admisión registre citas para pacientes"""
     
     # Obtener especialidades disponibles
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Variables para el formulario
     pacientes = []
@@ -66,7 +67,7 @@ def registrar_cita(request):
                 
                 # Obtener médico y consultorio
                 medico = Medico.objects.get(id=medico_id)
-                consultorio = Consultorio.objects.first()  # Simplificado para el ejemplo
+                consultorio = utils_catalogos.consultorios().primero()  # Simplificado para el ejemplo
                 
                 # Verificar disponibilidad
                 citas_existentes = Cita.objects.filter(
@@ -104,10 +105,12 @@ def registrar_cita(request):
                         creador=request.user
                     )
                     
-                    # Crear notificación para el médico
-                    crear_notificacion(
-                        usuario=medico.usuario,
+                    # Notificar al médico; las reservas de la misma ventana se agrupan en un resumen
+                    crear_notificaciones_agrupadas(
+                        [medico.usuario],
+                        'nueva_cita',
                         mensaje=f'Nueva cita agendada con {paciente.usuario.nombres} {paciente.usuario.apellidos} para el {fecha_obj.strftime("%d/%m/%Y")} a las {hora_obj.strftime("%H:%M")}.',
+                        mensaje_resumen='Tienes {cantidad} nuevas citas agendadas.',
                         tipo='informacion',
                         objeto_relacionado='cita',
                         objeto_id=cita.id,
@@ -124,7 +127,7 @@ def registrar_cita(request):
             paciente_seleccionado = Paciente.objects.get(id=paciente_id)
         
         if especialidad_id:
-            especialidad_seleccionada = Especialidad.objects.get(id=especialidad_id)
+            especialidad_seleccionada = utils_catalogos.especialidades().obtener(especialidad_id)
             medicos = Medico.objects.filter(especialidad=especialidad_seleccionada)
         
         if medico_id:
@@ -135,7 +135,7 @@ def mi_agenda(request):
     try:
         # Verificar que el usuario tenga un médico asociado
         try:
-            medico = Medico.objects.get(usuario=request.user)
+            medico = request.user.medico
         except Medico.DoesNotExist:
             messages.error(request, 'No tienes un perfil de médico asociado a tu cuenta.')
             return redirect('dashboard_medico')
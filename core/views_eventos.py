@@ -0,0 +1,180 @@
+import json
+import threading
+import time as time_module
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .models import Notificacion
+from .utils_eventos import bus, Suscripcion, SuscripcionAsync, serializar_notificacion
+from .utils_notificaciones import obtener_no_leidas
+
+# Intervalo de comentarios keep-alive para que proxies no corten la conexión
+LATIDO_SEGUNDOS = 15
+
+
+class _CuposEspera:
+    """
+    Conexiones que esperan eventos en este proceso WSGI. Cada una ocupa un
+    hilo del servidor: pasado EVENTOS_MAX_ESPERAS_WSGI el resto de los
+    clientes recibe el estado actual y vuelve a consultar más tarde, así
+    siempre quedan hilos para las demás peticiones.
+    """
+
+    def __init__(self):
+        self.candado = threading.Lock()
+        self.ocupados = 0
+
+    def tomar(self):
+        with self.candado:
+            if self.ocupados >= getattr(settings, 'EVENTOS_MAX_ESPERAS_WSGI', 8):
+                return False
+            self.ocupados += 1
+            return True
+
+    def liberar(self):
+        with self.candado:
+            self.ocupados -= 1
+
+
+cupos_wsgi = _CuposEspera()
+
+
+def _soltar_conexion():
+    """La espera no usa la base (el bus tiene su propia conexión): se libera antes de esperar"""
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def _formatear_sse(tipo, id_evento, datos):
+    lineas = [f'event: {tipo}']
+    if id_evento is not None:
+        lineas.append(f'id: {id_evento}')
+    lineas.append(f'data: {json.dumps(datos, ensure_ascii=False)}')
+    return '\n'.join(lineas) + '\n\n'
+
+
+def _eventos_iniciales(usuario, ultimo_id):
+    """Contador actual y notificaciones que se perdieron desde ``ultimo_id``"""
+    eventos = [('contador', None, {'no_leidas': obtener_no_leidas(usuario)})]
+    if ultimo_id is not None:
+        pendientes = (
+            Notificacion.objects.filter(usuario=usuario, pk__gt=ultimo_id, leido=False)
+            .order_by('pk')
+            .values('id', 'mensaje', 'tipo', 'importante', 'url_redireccion', 'fecha_envio')[:20]
+        )
+        eventos += [('notificacion', n['id'], serializar_notificacion(n)) for n in pendientes]
+    return eventos
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stream_wsgi(usuario_id, iniciales):
+    """
+    Stream acotado en el tiempo para servidores WSGI, donde cada conexión ocupa
+    un hilo: al cerrarse, EventSource reconecta solo enviando Last-Event-ID.
+    """
+    _soltar_conexion()
+    if not cupos_wsgi.tomar():
+        # Sin cupo: estado actual y reconexión diferida (una consulta corta cada tanto)
+        yield f'retry: {getattr(settings, "EVENTOS_REINTENTO_SATURADO", 30) * 1000}\n\n'
+        for evento in iniciales:
+            yield _formatear_sse(*evento)
+        return
+    duracion = getattr(settings, 'EVENTOS_DURACION_WSGI', 25)
+    suscripcion = Suscripcion(usuario_id)
+    bus.suscribir(suscripcion)
+    try:
+        yield f'retry: {getattr(settings, "EVENTOS_INTERVALO", 2) * 1000}\n\n'
+        for evento in iniciales:
+            yield _formatear_sse(*evento)
+        limite = time_module.monotonic() + duracion
+        while (restante := limite - time_module.monotonic()) > 0:
+            evento = suscripcion.esperar(min(restante, LATIDO_SEGUNDOS))
+            yield _formatear_sse(*evento) if evento else ': latido\n\n'
+    finally:
+        bus.desuscribir(suscripcion)
+        cupos_wsgi.liberar()
+
+
+async def _stream_asgi(usuario_id, iniciales):
+    """Stream sin límite de tiempo bajo ASGI: la espera no ocupa un hilo"""
+    suscripcion = SuscripcionAsync(usuario_id)
+    bus.suscribir(suscripcion)
+    try:
+        for evento in iniciales:
+            yield _formatear_sse(*evento)
+        while True:
+            evento = await suscripcion.esperar(LATIDO_SEGUNDOS)
+            yield _formatear_sse(*evento) if evento else ': latido\n\n'
+    finally:
+        bus.desuscribir(suscripcion)
+
+
+@login_required
+@require_GET
+def stream_notificaciones(request):
+    """
+    Stream Server-Sent Events con las notificaciones nuevas y los cambios del
+    contador de no leídas del usuario.
+    """
+    ultimo_id = _entero(request.headers.get('Last-Event-ID') or request.GET.get('desde'))
+    iniciales = _eventos_iniciales(request.user, ultimo_id)
+
+    if isinstance(request, ASGIRequest):
+        contenido = _stream_asgi(request.user.pk, iniciales)
+    else:
+        contenido = _stream_wsgi(request.user.pk, iniciales)
+
+    respuesta = StreamingHttpResponse(contenido, content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+@login_required
+@require_GET
+def long_poll_notificaciones(request):
+    """
+    Alternativa para navegadores sin EventSource: responde en cuanto hay un
+    evento nuevo (o al vencer la espera) con el contador y las notificaciones
+    posteriores a ``desde``.
+    """
+    ultimo_id = _entero(request.GET.get('desde'))
+    contador_cliente = _entero(request.GET.get('contador'))
+    eventos = _eventos_iniciales(request.user, ultimo_id)
+    hay_novedades = len(eventos) > 1 or eventos[0][2]['no_leidas'] != contador_cliente
+
+    # Bajo ASGI las vistas síncronas comparten un hilo: ahí no se espera
+    # (esos clientes usan el stream SSE)
+    reintentar_en = 0
+    if not hay_novedades and not isinstance(request, ASGIRequest):
+        if cupos_wsgi.tomar():
+            _soltar_conexion()
+            suscripcion = Suscripcion(request.user.pk)
+            bus.suscribir(suscripcion)
+            try:
+                evento = suscripcion.esperar(getattr(settings, 'EVENTOS_DURACION_WSGI', 25))
+            finally:
+                bus.desuscribir(suscripcion)
+                cupos_wsgi.liberar()
+            eventos = [evento] if evento else []
+            if evento and evento[0] == 'notificacion':
+                eventos.append(('contador', None, {'no_leidas': obtener_no_leidas(request.user)}))
+        else:
+            eventos = []
+            reintentar_en = getattr(settings, 'EVENTOS_REINTENTO_SATURADO', 30)
+
+    return JsonResponse({
+        'eventos': [{'tipo': tipo, 'id': id_evento, 'datos': datos} for tipo, id_evento, datos in eventos],
+        'reintentar_en': reintentar_en,
+    })
@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
@@ -8,34 +9,33 @@ from django.core.paginator import Paginator
 from datetime import datetime, timedelta
 from .models import (
     RecetaMedica, DetalleReceta, Medicamento, MovimientoInventario,
-    Paciente, Medico, Usuario, Rol
+    Paciente, Medico, Usuario, Rol, AlertaVencimiento
 )
 from .utils_notificaciones import crear_notificacion
+from .utils_inventario import (
+    TIPOS_ENTRADA, TIPOS_SALIDA, StockInsuficiente, ajustar_stock, dispensar_detalles, registrar_entrada
+)
+from .utils_snapshots import valorizacion_mensual
+from .utils_busqueda_medicamentos import buscar_medicamentos
+from .utils_estadisticas_farmacia import dias_series, resumen_farmacia, series_dispensaciones
+from .utils_cola_recetas import (
+    ORDEN_COLA, CursorInvalido, cola_recetas, liberar_receta, paginar_por_cursor, reservada_por_otro,
+    tomar_receta, tomar_siguiente,
+)
+from .utils_ingreso_masivo import (
+    GuiaInvalida, aplicar_guia, descartar_guia, guardar_guia, obtener_guia, validar_guia
+)
+from .utils_reposicion import ESTADOS_REPOSICION, ORDENES, parametros_reposicion, pronostico_reposicion
+from .utils_vencimientos import medicamentos_por_vencer, resumen_vencimientos
+from .utils_clasificacion_inventario import CLASES_ABC, CLASES_XYZ, matriz_clasificacion
+from .decorators import farmaceutico_required, role_required
 
 @login_required
+@farmaceutico_required
 def dashboard_farmacia(request):
     """Dashboard principal de farmacia"""
-    # Verificar que el usuario tenga el rol correcto
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
-    # Estadísticas generales
-    recetas_pendientes = RecetaMedica.objects.filter(estado='pendiente').count()
-    recetas_dispensadas_hoy = RecetaMedica.objects.filter(
-        estado='dispensada',
-        fecha_dispensacion__date=timezone.now().date()
-    ).count()
-    
-    medicamentos_stock_critico = Medicamento.objects.filter(
-        activo=True,
-        stock_actual__lte=F('stock_minimo')
-    ).count()
-    
-    medicamentos_proximos_vencer = Medicamento.objects.filter(
-        activo=True,
-        fecha_vencimiento__lte=timezone.now().date() + timedelta(days=30)
-    ).count()
+    # Estadísticas generales (precalculadas, ver utils_estadisticas_farmacia)
+    resumen = resumen_farmacia()
     
     # Recetas pendientes recientes
     recetas_recientes = RecetaMedica.objects.filter(
@@ -44,33 +44,21 @@ def dashboard_farmacia(request):
         'paciente__usuario', 'medico__usuario'
     ).order_by('-fecha_prescripcion')[:5]
     
-    # Medicamentos más solicitados (últimos 30 días)
-    medicamentos_populares = DetalleReceta.objects.filter(
-        receta__fecha_prescripcion__gte=timezone.now() - timedelta(days=30)
-    ).values(
-        'medicamento__nombre_comercial', 'medicamento__nombre_generico'
-    ).annotate(
-        total_prescrito=Sum('cantidad_prescrita')
-    ).order_by('-total_prescrito')[:5]
-    
     context = {
-        'recetas_pendientes': recetas_pendientes,
-        'recetas_dispensadas_hoy': recetas_dispensadas_hoy,
-        'medicamentos_stock_critico': medicamentos_stock_critico,
-        'medicamentos_proximos_vencer': medicamentos_proximos_vencer,
+        'recetas_pendientes': resumen['recetas_pendientes'],
+        'recetas_dispensadas_hoy': resumen['recetas_dispensadas_hoy'],
+        'medicamentos_stock_critico': resumen['medicamentos_stock_critico'],
+        'medicamentos_proximos_vencer': resumen['medicamentos_proximos_vencer'],
         'recetas_recientes': recetas_recientes,
-        'medicamentos_populares': medicamentos_populares,
+        'medicamentos_populares': resumen['medicamentos_populares'],
     }
     
     return render(request, 'farmacia/dashboard.html', context)
 
 @login_required
+@farmaceutico_required
 def recetas_pendientes(request):
     """Lista de recetas pendientes por dispensar"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     # Filtros
     busqueda = request.GET.get('busqueda', '')
     estado_filtro = request.GET.get('estado', 'pendiente')
@@ -96,11 +84,23 @@ def recetas_pendientes(request):
             Q(paciente__usuario__dni__icontains=busqueda)
         )
     
-    # Ordenar por urgente primero, luego por fecha
-    recetas = recetas.order_by('-urgente', '-fecha_prescripcion')
+    # Las pendientes se muestran como cola de trabajo (urgentes, por vencer, más antiguas);
+    # el resto, urgentes primero y luego las más recientes
+    if estado_filtro == 'pendiente':
+        recetas = cola_recetas(recetas.select_related('tomada_por'))
+        orden = ORDEN_COLA
+    else:
+        orden = ('-urgente', '-fecha_prescripcion', '-id')
+    try:
+        recetas, siguiente = paginar_por_cursor(recetas, orden, request.GET.get('cursor'))
+    except CursorInvalido:
+        recetas, siguiente = paginar_por_cursor(recetas, orden)
+    for receta in recetas:
+        receta.reservada_por_otro = reservada_por_otro(receta, request.user)
     
     context = {
         'recetas': recetas,
+        'siguiente': siguiente,
         'busqueda': busqueda,
         'estado_filtro': estado_filtro,
         'urgente_filtro': urgente_filtro,
@@ -109,12 +109,9 @@ def recetas_pendientes(request):
     return render(request, 'farmacia/recetas_pendientes.html', context)
 
 @login_required
+@farmaceutico_required
 def detalle_receta(request, receta_id):
     """Detalle de una receta específica"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     receta = get_object_or_404(
         RecetaMedica.objects.select_related(
             'paciente__usuario', 'medico__usuario'
@@ -129,12 +126,9 @@ def detalle_receta(request, receta_id):
     return render(request, 'farmacia/detalle_receta.html', context)
 
 @login_required
+@farmaceutico_required
 def dispensar_receta(request, receta_id):
     """Dispensar medicamentos de una receta"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     receta = get_object_or_404(RecetaMedica, id=receta_id)
     
     # Verificar que la receta puede ser dispensada
@@ -142,28 +136,39 @@ def dispensar_receta(request, receta_id):
         messages.error(request, 'Esta receta no puede ser dispensada (ya dispensada o vencida)')
         return redirect('detalle_receta', receta_id=receta.id)
     
+    # Reserva la receta: otro farmacéutico no puede abrirla mientras se atiende
+    if not tomar_receta(receta, request.user):
+        messages.error(request, f'La receta {receta.codigo_receta} la está atendiendo {receta.tomada_por}')
+        return redirect('recetas_pendientes')
+    
     if request.method == 'POST':
         # Procesar dispensación
-        detalles = receta.detalles.all()
+        detalles = receta.detalles.select_related('medicamento')
         errores = []
+        cantidades = []
         
         for detalle in detalles:
             cantidad_a_dispensar = int(request.POST.get(f'cantidad_{detalle.id}', 0))
             lote = request.POST.get(f'lote_{detalle.id}', '')
             
             if cantidad_a_dispensar > 0:
-                if cantidad_a_dispensar > detalle.medicamento.stock_actual:
-                    errores.append(f"No hay suficiente stock de {detalle.medicamento.nombre_comercial}")
-                elif cantidad_a_dispensar > detalle.cantidad_prescrita:
+                if cantidad_a_dispensar > detalle.cantidad_prescrita:
                     errores.append(f"No puede dispensar más de lo prescrito para {detalle.medicamento.nombre_comercial}")
                 else:
-                    # Dispensar medicamento
-                    detalle.dispensar(cantidad_a_dispensar, lote)
+                    cantidades.append((detalle, cantidad_a_dispensar, lote))
+        
+        if not errores:
+            # Todas las líneas se descuentan juntas: si una no alcanza, no se dispensa ninguna
+            try:
+                dispensar_detalles(receta, cantidades, usuario=request.user)
+            except StockInsuficiente as error:
+                errores.append(str(error))
         
         if errores:
             for error in errores:
                 messages.error(request, error)
         else:
+            liberar_receta(receta, request.user)
             # Verificar si la receta está completamente dispensada
             if receta.total_dispensado():
                 receta.marcar_dispensada(request.user)
@@ -191,19 +196,19 @@ def dispensar_receta(request, receta_id):
     return render(request, 'farmacia/dispensar_receta.html', context)
 
 @login_required
+@farmaceutico_required
 def inventario_medicamentos(request):
     """Gestión de inventario de medicamentos"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     # Filtros
     busqueda = request.GET.get('busqueda', '')
     estado_stock = request.GET.get('stock', '')  # critico, bajo, normal
     forma_farmaceutica = request.GET.get('forma', '')
+    clase_abc = request.GET.get('abc', '')
+    clase_xyz = request.GET.get('xyz', '')
+    orden = request.GET.get('orden', '')
     
-    # Query base
-    medicamentos = Medicamento.objects.filter(activo=True)
+    # Query base (la clasificación ABC/XYZ la precalcula clasificar_inventario)
+    medicamentos = Medicamento.objects.filter(activo=True).select_related('clasificacion')
     
     # Aplicar filtros
     if busqueda:
@@ -226,8 +231,16 @@ def inventario_medicamentos(request):
     elif estado_stock == 'normal':
         medicamentos = medicamentos.filter(stock_actual__gt=F('stock_minimo') * 2)
     
+    if clase_abc in CLASES_ABC:
+        medicamentos = medicamentos.filter(clasificacion__clase_abc=clase_abc)
+    if clase_xyz in CLASES_XYZ:
+        medicamentos = medicamentos.filter(clasificacion__clase_xyz=clase_xyz)
+    
     # Ordenar
-    medicamentos = medicamentos.order_by('nombre_comercial')
+    if orden == 'valor':
+        medicamentos = medicamentos.order_by(F('clasificacion__valor_consumo').desc(nulls_last=True), 'nombre_comercial')
+    else:
+        medicamentos = medicamentos.order_by('nombre_comercial')
     
     # Paginación - 20 medicamentos por página
     paginator = Paginator(medicamentos, 20)
@@ -245,6 +258,11 @@ def inventario_medicamentos(request):
         'estado_stock': estado_stock,
         'forma_farmaceutica': forma_farmaceutica,
         'formas_disponibles': formas_disponibles,
+        'clase_abc': clase_abc,
+        'clase_xyz': clase_xyz,
+        'orden': orden,
+        'clases_abc': CLASES_ABC,
+        'clases_xyz': CLASES_XYZ,
         'page_obj': page_obj,
         'paginator': paginator,
     }
@@ -252,34 +270,29 @@ def inventario_medicamentos(request):
     return render(request, 'farmacia/inventario.html', context)
 
 @login_required
+@farmaceutico_required
 def alertas_farmacia(request):
     """Vista de alertas de farmacia (stock crítico, medicamentos por vencer)"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     # Medicamentos con stock crítico
     stock_critico = Medicamento.objects.filter(
         activo=True,
         stock_actual__lte=F('stock_minimo')
     ).order_by('stock_actual')
     
-    # Medicamentos próximos a vencer (30 días)
-    proximos_vencer = Medicamento.objects.filter(
-        activo=True,
-        fecha_vencimiento__lte=timezone.now().date() + timedelta(days=30)
-    ).order_by('fecha_vencimiento')
+    # Lotes vencidos y por vencer, por tramo (precalculados por barrer_vencimientos)
+    alertas = AlertaVencimiento.objects.select_related('medicamento', 'lote')
+    proximos_vencer = alertas.filter(tramo__gt=0, tramo__lte=30)
+    vencidos = alertas.filter(tramo=0)
     
-    # Medicamentos ya vencidos
-    vencidos = Medicamento.objects.filter(
-        activo=True,
-        fecha_vencimiento__lt=timezone.now().date()
-    ).order_by('fecha_vencimiento')
+    # Los que se agotarán antes de recibir un pedido, según el consumo reciente
+    por_agotarse = pronostico_reposicion(estados=('agotado', 'reponer'))[:20]
     
     context = {
         'stock_critico': stock_critico,
         'proximos_vencer': proximos_vencer,
         'vencidos': vencidos,
+        'vencimientos': resumen_vencimientos(),
+        'por_agotarse': por_agotarse,
     }
     
     return render(request, 'farmacia/alertas.html', context)
@@ -287,23 +300,14 @@ def alertas_farmacia(request):
 # === APIs para farmacia ===
 
 @login_required
+@role_required('Farmacéutico', api=True)
 def api_buscar_medicamento(request):
     """API para buscar medicamentos disponibles"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        return JsonResponse({'error': 'No autorizado'}, status=403)
-    
     termino = request.GET.get('q', '')
     if len(termino) < 2:
         return JsonResponse({'medicamentos': []})
     
-    medicamentos = Medicamento.objects.filter(
-        activo=True,
-        stock_actual__gt=0
-    ).filter(
-        Q(nombre_comercial__icontains=termino) |
-        Q(nombre_generico__icontains=termino) |
-        Q(codigo__icontains=termino)
-    )[:10]
+    medicamentos = buscar_medicamentos(termino, limite=10)
     
     data = []
     for med in medicamentos:
@@ -321,39 +325,103 @@ def api_buscar_medicamento(request):
     return JsonResponse({'medicamentos': data})
 
 @login_required
+@role_required('Farmacéutico', api=True)
 def api_estadisticas_farmacia(request):
     """API para obtener estadísticas de farmacia"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        return JsonResponse({'error': 'No autorizado'}, status=403)
-    
-    # Estadísticas de los últimos 7 días
-    hoy = timezone.now().date()
-    hace_7_dias = hoy - timedelta(days=7)
-    
-    dispensaciones_por_dia = []
-    for i in range(7):
-        fecha = hoy - timedelta(days=i)
-        dispensaciones = RecetaMedica.objects.filter(
-            estado='dispensada',
-            fecha_dispensacion__date=fecha
-        ).count()
-        dispensaciones_por_dia.append({
-            'fecha': fecha.strftime('%d/%m'),
-            'dispensaciones': dispensaciones
-        })
+    # Serie de dispensaciones de los últimos N días (7 por defecto)
+    try:
+        dias = int(request.GET.get('dias', dias_series()[0]))
+    except ValueError:
+        dias = dias_series()[0]
+    if dias not in dias_series():
+        return JsonResponse({'error': f'dias debe ser uno de {list(dias_series())}'}, status=400)
     
-    # Medicamentos más dispensados
-    medicamentos_top = DetalleReceta.objects.filter(
-        fecha_dispensacion__gte=hace_7_dias
-    ).values(
-        'medicamento__nombre_comercial'
-    ).annotate(
-        total=Sum('cantidad_dispensada')
-    ).order_by('-total')[:5]
+    data = {
+        'dispensaciones_por_dia': [
+            {'fecha': fecha.strftime('%d/%m'), 'dispensaciones': total}
+            for fecha, total in series_dispensaciones()[dias]
+        ],
+        'medicamentos_top': resumen_farmacia()['medicamentos_top'],
+    }
     
+    return JsonResponse(data)
+
+@login_required
+@farmaceutico_required
+def tomar_siguiente_receta(request):
+    """Reserva la receta más prioritaria libre y abre su dispensación"""
+    if request.method != 'POST':
+        return redirect('recetas_pendientes')
+    receta = tomar_siguiente(request.user)
+    if receta is None:
+        messages.info(request, 'No hay recetas pendientes por atender')
+        return redirect('recetas_pendientes')
+    return redirect('dispensar_receta', receta_id=receta.id)
+
+@login_required
+@farmaceutico_required
+def liberar_receta_view(request, receta_id):
+    """Devuelve a la cola una receta reservada sin dispensarla"""
+    if request.method == 'POST':
+        liberar_receta(get_object_or_404(RecetaMedica, id=receta_id), request.user)
+    return redirect('recetas_pendientes')
+
+@login_required
+@role_required('Farmacéutico', api=True)
+def api_reposicion(request):
+    """API con el pronóstico de reposición (días de cobertura, punto de reorden, cantidad sugerida)"""
+    orden = request.GET.get('orden', 'urgencia')
+    if orden not in ORDENES:
+        return JsonResponse({'error': f'orden debe ser uno de {list(ORDENES)}'}, status=400)
+    estados = [estado for estado in request.GET.getlist('estado') if estado]
+    if any(estado not in ESTADOS_REPOSICION for estado in estados):
+        return JsonResponse({'error': f'estado debe ser uno de {list(ESTADOS_REPOSICION)}'}, status=400)
+    try:
+        limite = min(int(request.GET.get('limite', 50)), 500)
+    except ValueError:
+        limite = 50
+    
+    filas = pronostico_reposicion(orden, estados)
     data = {
-        'dispensaciones_por_dia': list(reversed(dispensaciones_por_dia)),
-        'medicamentos_top': list(medicamentos_top),
+        'parametros': parametros_reposicion(),
+        'total': len(filas),
+        'medicamentos': [
+            {**fila, 'fecha_agotamiento': fila['fecha_agotamiento'].isoformat() if fila['fecha_agotamiento'] else None}
+            for fila in filas[:limite]
+        ],
+    }
+    
+    return JsonResponse(data)
+
+@login_required
+@role_required('Farmacéutico', api=True)
+def api_cola_recetas(request):
+    """API de la cola de recetas pendientes, paginada por cursor (``?cursor=``)"""
+    try:
+        limite = min(int(request.GET.get('limite', 25)), 100)
+    except ValueError:
+        limite = 25
+    recetas = cola_recetas(RecetaMedica.objects.select_related('paciente__usuario', 'tomada_por'))
+    try:
+        recetas, siguiente = paginar_por_cursor(recetas, ORDEN_COLA, request.GET.get('cursor'), limite)
+    except CursorInvalido as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    
+    data = {
+        'recetas': [
+            {
+                'id': receta.id,
+                'codigo_receta': receta.codigo_receta,
+                'urgente': receta.urgente,
+                'paciente': f'{receta.paciente.usuario.nombres} {receta.paciente.usuario.apellidos}',
+                'fecha_prescripcion': receta.fecha_prescripcion.isoformat(),
+                'fecha_limite': receta.fecha_limite.isoformat(),
+                'reservada_por_otro': reservada_por_otro(receta, request.user),
+                'tomada_por': str(receta.tomada_por) if receta.tomada_por else None,
+            }
+            for receta in recetas
+        ],
+        'siguiente': siguiente,
     }
     
     return JsonResponse(data)
@@ -361,12 +429,9 @@ def api_estadisticas_farmacia(request):
 # === GESTIÓN AVANZADA DE INVENTARIO ===
 
 @login_required
+@farmaceutico_required
 def entrada_medicamentos(request):
     """Vista para registrar entrada de medicamentos al inventario"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     if request.method == 'POST':
         medicamento_id = request.POST.get('medicamento_id')
         cantidad = int(request.POST.get('cantidad', 0))
@@ -379,29 +444,16 @@ def entrada_medicamentos(request):
         
         try:
             medicamento = Medicamento.objects.get(id=medicamento_id)
-            stock_anterior = medicamento.stock_actual
-            
-            # Actualizar stock
-            medicamento.stock_actual += cantidad
-            if precio_unitario:
-                medicamento.precio_unitario = precio_unitario
-            if fecha_vencimiento:
-                medicamento.fecha_vencimiento = fecha_vencimiento
-            medicamento.save()
-            
-            # Registrar movimiento
-            MovimientoInventario.objects.create(
-                medicamento=medicamento,
-                tipo_movimiento='entrada',
-                cantidad=cantidad,
-                motivo=motivo,
+            registrar_entrada(
+                medicamento,
+                cantidad,
                 usuario=request.user,
-                lote_referencia=lote,
+                numero_lote=lote,
+                fecha_vencimiento=fecha_vencimiento,
+                precio_unitario=precio_unitario,
+                motivo=motivo,
                 proveedor=proveedor,
-                precio_unitario_momento=precio_unitario,
-                stock_anterior=stock_anterior,
-                stock_nuevo=medicamento.stock_actual,
-                numero_factura=numero_factura
+                numero_factura=numero_factura,
             )
             
             messages.success(request, f'Entrada registrada: +{cantidad} unidades de {medicamento.nombre_comercial}')
@@ -422,12 +474,69 @@ def entrada_medicamentos(request):
     return render(request, 'farmacia/entrada_medicamentos.html', context)
 
 @login_required
+@farmaceutico_required
+def entrada_masiva_medicamentos(request):
+    """Ingreso de una guía de remisión completa (CSV), con vista previa antes de registrar"""
+    resultado = None
+    proveedor = request.POST.get('proveedor', '')
+    numero_factura = request.POST.get('numero_factura', '')
+    if request.method == 'POST':
+        archivo = request.FILES.get('guia')
+        texto = None
+        if archivo:
+            if archivo.size > settings.INGRESO_MASIVO_MAX_BYTES:
+                messages.error(request, 'El archivo de la guía es demasiado grande')
+            else:
+                contenido = archivo.read()
+                try:
+                    texto = contenido.decode('utf-8-sig')
+                except UnicodeDecodeError:
+                    # Guías exportadas desde Excel en Windows
+                    texto = contenido.decode('cp1252', errors='replace')
+                # La vista previa y el registro usan la misma guía sin volver a subirla;
+                # la sesión guarda solo la referencia al texto en la caché
+                descartar_guia(request.session.get('guia_ingreso'))
+                request.session['guia_ingreso'] = guardar_guia(texto)
+        else:
+            texto = obtener_guia(request.session.get('guia_ingreso'))
+            if not texto:
+                messages.error(request, 'Selecciona el archivo de la guía')
+        
+        if texto:
+            try:
+                resultado = validar_guia(texto)
+            except GuiaInvalida as error:
+                messages.error(request, str(error))
+            else:
+                if request.POST.get('accion') == 'aplicar':
+                    if resultado['errores'] or not resultado['lineas']:
+                        messages.error(request, 'La guía tiene errores; no se registró ninguna línea')
+                    else:
+                        aplicar_guia(
+                            resultado['lineas'],
+                            usuario=request.user,
+                            proveedor=proveedor,
+                            numero_factura=numero_factura,
+                        )
+                        descartar_guia(request.session.pop('guia_ingreso', None))
+                        messages.success(
+                            request,
+                            f"Guía registrada: {len(resultado['lineas'])} líneas, +{resultado['unidades']} unidades"
+                        )
+                        return redirect('historial_movimientos')
+    
+    context = {
+        'resultado': resultado,
+        'proveedor': proveedor,
+        'numero_factura': numero_factura,
+    }
+    
+    return render(request, 'farmacia/entrada_masiva.html', context)
+
+@login_required
+@farmaceutico_required
 def ajuste_inventario(request):
     """Vista para realizar ajustes de inventario (positivos o negativos)"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     if request.method == 'POST':
         medicamento_id = request.POST.get('medicamento_id')
         tipo_ajuste = request.POST.get('tipo_ajuste')  # 'positivo' o 'negativo'
@@ -436,30 +545,11 @@ def ajuste_inventario(request):
         
         try:
             medicamento = Medicamento.objects.get(id=medicamento_id)
-            stock_anterior = medicamento.stock_actual
-            
-            if tipo_ajuste == 'positivo':
-                medicamento.stock_actual += cantidad
-                tipo_movimiento = 'ajuste_positivo'
-            else:
-                if cantidad > medicamento.stock_actual:
-                    messages.error(request, 'No se puede ajustar más stock del disponible')
-                    return redirect('ajuste_inventario')
-                medicamento.stock_actual -= cantidad
-                tipo_movimiento = 'ajuste_negativo'
-            
-            medicamento.save()
-            
-            # Registrar movimiento
-            MovimientoInventario.objects.create(
-                medicamento=medicamento,
-                tipo_movimiento=tipo_movimiento,
-                cantidad=cantidad,
-                motivo=motivo,
-                usuario=request.user,
-                stock_anterior=stock_anterior,
-                stock_nuevo=medicamento.stock_actual
-            )
+            try:
+                ajustar_stock(medicamento, cantidad, tipo_ajuste == 'positivo', usuario=request.user, motivo=motivo)
+            except StockInsuficiente:
+                messages.error(request, 'No se puede ajustar más stock del disponible')
+                return redirect('ajuste_inventario')
             
             signo = '+' if tipo_ajuste == 'positivo' else '-'
             messages.success(request, f'Ajuste registrado: {signo}{cantidad} unidades de {medicamento.nombre_comercial}')
@@ -480,12 +570,9 @@ def ajuste_inventario(request):
     return render(request, 'farmacia/ajuste_inventario.html', context)
 
 @login_required
+@farmaceutico_required
 def historial_movimientos(request):
     """Vista para ver el historial de movimientos de inventario"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     # Filtros
     medicamento_id = request.GET.get('medicamento')
     tipo_movimiento = request.GET.get('tipo')
@@ -538,12 +625,9 @@ def historial_movimientos(request):
     return render(request, 'farmacia/historial_movimientos.html', context)
 
 @login_required
+@farmaceutico_required
 def detalle_medicamento_inventario(request, medicamento_id):
     """Vista detallada de un medicamento específico en el inventario"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     medicamento = get_object_or_404(Medicamento, id=medicamento_id)
     
     # Movimientos recientes (últimos 20)
@@ -552,15 +636,12 @@ def detalle_medicamento_inventario(request, medicamento_id):
     ).select_related('usuario').order_by('-fecha_movimiento')[:20]
     
     # Estadísticas del medicamento
-    total_entradas = MovimientoInventario.objects.filter(
-        medicamento=medicamento,
-        tipo_movimiento__in=['entrada', 'ajuste_positivo', 'devolucion']
-    ).aggregate(total=Sum('cantidad'))['total'] or 0
-    
-    total_salidas = MovimientoInventario.objects.filter(
-        medicamento=medicamento,
-        tipo_movimiento__in=['salida', 'ajuste_negativo', 'vencimiento', 'dañado']
-    ).aggregate(total=Sum('cantidad'))['total'] or 0
+    totales = MovimientoInventario.objects.filter(medicamento=medicamento).aggregate(
+        entradas=Sum('cantidad', filter=Q(tipo_movimiento__in=TIPOS_ENTRADA)),
+        salidas=Sum('cantidad', filter=Q(tipo_movimiento__in=TIPOS_SALIDA)),
+    )
+    total_entradas = totales['entradas'] or 0
+    total_salidas = totales['salidas'] or 0
     
     # Dispensaciones del último mes
     ultimo_mes = timezone.now() - timedelta(days=30)
@@ -588,12 +669,9 @@ def detalle_medicamento_inventario(request, medicamento_id):
     return render(request, 'farmacia/detalle_medicamento.html', context)
 
 @login_required
+@farmaceutico_required
 def reporte_inventario(request):
     """Vista para generar reportes de inventario"""
-    if not request.user.rol or request.user.rol.nombre != 'Farmacéutico':
-        messages.error(request, 'No tienes permiso para acceder a esta página')
-        return redirect('dashboard')
-    
     # Estadísticas generales
     total_medicamentos = Medicamento.objects.filter(activo=True).count()
     valor_total_inventario = Medicamento.objects.filter(activo=True).aggregate(
@@ -613,11 +691,8 @@ def reporte_inventario(request):
     
     stock_normal = total_medicamentos - stock_critico - stock_bajo
     
-    # Medicamentos próximos a vencer
-    proximos_vencer_30 = Medicamento.objects.filter(
-        activo=True,
-        fecha_vencimiento__lte=timezone.now().date() + timedelta(days=30)
-    ).count()
+    # Medicamentos con lotes vencidos o que vencen en 30 días
+    proximos_vencer_30 = medicamentos_por_vencer(30).count()
     
     # Top 10 medicamentos más dispensados (último mes)
     ultimo_mes = timezone.now() - timedelta(days=30)
@@ -637,6 +712,12 @@ def reporte_inventario(request):
         total=Sum('cantidad')
     ).order_by('-total')
     
+    # Valorización al cierre de cada mes, desde los snapshots nocturnos
+    valorizacion = valorizacion_mensual()
+    
+    # Matriz ABC/XYZ (valor de consumo x variabilidad de la demanda, último año)
+    clasificacion = matriz_clasificacion()
+    
     context = {
         'total_medicamentos': total_medicamentos,
         'valor_total_inventario': valor_total_inventario,
@@ -646,6 +727,39 @@ def reporte_inventario(request):
         'proximos_vencer_30': proximos_vencer_30,
         'top_dispensados': top_dispensados,
         'movimientos_mes': movimientos_mes,
+        'valorizacion_mensual': valorizacion,
+        'clasificacion': clasificacion,
+        'clases_xyz': CLASES_XYZ,
+    }
+    
+    return render(request, 'farmacia/reporte_inventario.html', context) 
+
+@login_required
+@farmaceutico_required
+def reposicion_inventario(request):
+    """Vista de reposición sugerida, ordenada por urgencia"""
+    orden = request.GET.get('orden', 'urgencia')
+    if orden not in ORDENES:
+        orden = 'urgencia'
+    estado = request.GET.get('estado', '')
+    if estado not in ESTADOS_REPOSICION:
+        estado = ''
+    
+    filas = pronostico_reposicion(orden, [estado] if estado else None)
+    conteos = {nombre: 0 for nombre in ESTADOS_REPOSICION}
+    for fila in pronostico_reposicion():
+        conteos[fila['estado']] += 1
+    
+    paginator = Paginator(filas, 25)
+    medicamentos = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'medicamentos': medicamentos,
+        'conteos': conteos,
+        'parametros': parametros_reposicion(),
+        'orden': orden,
+        'estado': estado,
+        'estados': ESTADOS_REPOSICION,
     }
     
-    return render(request, 'farmacia/reporte_inventario.html', context) 
\ No newline at end of file
+    return render(request, 'farmacia/reposicion.html', context)
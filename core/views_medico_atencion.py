@@ -7,7 +7,8 @@ from django.db import transaction
 from django.urls import reverse
 from datetime import datetime
 from .models import Cita, HistorialMedico, Derivacion, Especialidad, Notificacion, Medico, DisponibilidadMedica, Consultorio, RecetaMedica, DetalleReceta, Medicamento, Usuario
-from .utils_notificaciones import crear_notificacion
+from .utils_notificaciones import crear_notificacion, crear_notificaciones_masivas, notificar_rol
+from . import utils_catalogos
 
 @login_required
 def atender_paciente(request, cita_id):
@@ -37,7 +38,7 @@ def atender_paciente(request, cita_id):
         return redirect('dashboard_medico')
     
     # Obtener especialidades para derivación
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Procesar el formulario de atención
     if request.method == 'POST':
@@ -113,17 +114,17 @@ def atender_paciente(request, cita_id):
                             objeto_relacionado='receta',
                             objeto_id=receta.id
                         )
-                        # Notificar a los farmacéuticos
-                        farmaceuticos = Usuario.objects.filter(rol__nombre='Farmacéutico')
-                        for farm in farmaceuticos:
-                            crear_notificacion(
-                                usuario=farm,
-                                mensaje=f"Se ha generado una nueva receta médica para el paciente {cita.paciente.usuario.nombres} {cita.paciente.usuario.apellidos}.",
-                                tipo='informacion',
-                                importante=True,
-                                objeto_relacionado='receta',
-                                objeto_id=receta.id
-                            )
+                        # Notificar a los farmacéuticos (agrupado en un resumen por ventana de tiempo)
+                        notificar_rol(
+                            'Farmacéutico',
+                            mensaje=f"Se ha generado una nueva receta médica para el paciente {cita.paciente.usuario.nombres} {cita.paciente.usuario.apellidos}.",
+                            tipo='informacion',
+                            importante=True,
+                            objeto_relacionado='receta',
+                            objeto_id=receta.id,
+                            agrupar_por='nueva_receta',
+                            mensaje_resumen='Hay {cantidad} nuevas recetas médicas pendientes de dispensar.'
+                        )
                 
                 # Guardar en la sesión si requiere derivación
                 if requiere_derivacion == 'si':
@@ -191,7 +192,7 @@ def atender_paciente(request, cita_id):
                 })
             
             try:
-                especialidad = Especialidad.objects.get(id=especialidad_id)
+                especialidad = utils_catalogos.especialidades().obtener(especialidad_id)
                 vigencia = int(vigencia_dias)
                 
                 with transaction.atomic():
@@ -254,7 +255,7 @@ def derivar_paciente(request, cita_id):
         return redirect('dashboard_medico')
     
     # Obtener especialidades para derivación
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Procesar el formulario de derivación
     if request.method == 'POST':
@@ -276,7 +277,7 @@ def derivar_paciente(request, cita_id):
             })
         
         try:
-            especialidad = Especialidad.objects.get(id=especialidad_id)
+            especialidad = utils_catalogos.especialidades().obtener(especialidad_id)
             vigencia = int(vigencia_dias)
             
             with transaction.atomic():
@@ -328,20 +329,19 @@ def derivar_paciente(request, cita_id):
                         derivacion.cita_agendada = True
                         derivacion.save()
                         
-                        # Notificar al paciente sobre la cita agendada
-                        crear_notificacion(
-                            usuario=cita.paciente.usuario,
-                            mensaje=f"Se ha agendado una cita con el especialista Dr. {medico_especialista.usuario.nombres} {medico_especialista.usuario.apellidos} para el {fecha_obj.strftime('%d/%m/%Y')} a las {disponibilidad.hora_inicio.strftime('%H:%M')} en el consultorio {consultorio.codigo}.",
-                            tipo='confirmacion',
-                            importante=True,
-                            objeto_relacionado='cita',
-                            objeto_id=nueva_cita.id
-                        )
-                        
-                        # Notificar al médico especialista sobre la nueva cita
-                        crear_notificacion(
-                            usuario=medico_especialista.usuario,
-                            mensaje=f"Tienes una nueva cita por derivación para el {fecha_obj.strftime('%d/%m/%Y')} a las {disponibilidad.hora_inicio.strftime('%H:%M')} con el paciente {cita.paciente.usuario.nombres} {cita.paciente.usuario.apellidos}.",
+                        # Notificar al paciente y al médico especialista sobre la cita agendada
+                        crear_notificaciones_masivas(
+                            [
+                                {
+                                    'usuario': cita.paciente.usuario,
+                                    'mensaje': f"Se ha agendado una cita con el especialista Dr. {medico_especialista.usuario.nombres} {medico_especialista.usuario.apellidos} para el {fecha_obj.strftime('%d/%m/%Y')} a las {disponibilidad.hora_inicio.strftime('%H:%M')} en el consultorio {consultorio.codigo}.",
+                                    'tipo': 'confirmacion',
+                                },
+                                {
+                                    'usuario': medico_especialista.usuario,
+                                    'mensaje': f"Tienes una nueva cita por derivación para el {fecha_obj.strftime('%d/%m/%Y')} a las {disponibilidad.hora_inicio.strftime('%H:%M')} con el paciente {cita.paciente.usuario.nombres} {cita.paciente.usuario.apellidos}.",
+                                },
+                            ],
                             tipo='informacion',
                             importante=True,
                             objeto_relacionado='cita',
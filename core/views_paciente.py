@@ -7,9 +7,13 @@ from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from datetime import datetime, timedelta
+import logging
 
 from .models import Paciente, Especialidad, Medico, Consultorio, Cita, Derivacion, Notificacion, DisponibilidadMedica
-from .utils_notificaciones import crear_notificacion
+from .utils_notificaciones import crear_notificacion, crear_notificaciones_agrupadas
+from . import utils_catalogos
+
+logger = logging.getLogger(__name__)
 
 @login_required
 def reservar_cita(request):
@@ -28,19 +32,18 @@ def reservar_cita(request):
             return redirect('dashboard_paciente')
         
         # Obtener especialidades disponibles
-        especialidades = Especialidad.objects.filter(acceso_directo=True).order_by('nombre')
         derivaciones_activas = Derivacion.objects.filter(
             paciente=paciente,
             estado='pendiente',
             fecha_derivacion__gte=timezone.now().date() - timedelta(days=30)  # Derivaciones de los últimos 30 días
         )
         
-        # Agregar especialidades de derivaciones activas
-        especialidades_derivadas = Especialidad.objects.filter(
-            id__in=derivaciones_activas.values_list('especialidad_destino', flat=True)
-        )
-        # Combinar QuerySets
-        especialidades = (especialidades | especialidades_derivadas).distinct()
+        # Especialidades de acceso directo más las de derivaciones activas
+        especialidades_derivadas = set(derivaciones_activas.values_list('especialidad_destino', flat=True))
+        especialidades = [
+            especialidad for especialidad in utils_catalogos.especialidades()
+            if especialidad.acceso_directo or especialidad.id in especialidades_derivadas
+        ]
         
         # Variables para el formulario
         medicos = []
@@ -71,7 +74,7 @@ def reservar_cita(request):
                     
                     # Obtener médico y consultorio
                     medico = Medico.objects.get(id=medico_id)
-                    consultorio = Consultorio.objects.first()  # Simplificado para el ejemplo
+                    consultorio = utils_catalogos.consultorios().primero()  # Simplificado para el ejemplo
                     
                     # Verificar disponibilidad
                     citas_existentes = Cita.objects.filter(
@@ -86,7 +89,7 @@ def reservar_cita(request):
                         messages.error(request, 'El horario seleccionado ya no está disponible. Por favor, elija otro.')
                     else:
                         # Verificar si necesita derivación
-                        especialidad = Especialidad.objects.get(id=especialidad_id)
+                        especialidad = utils_catalogos.especialidades().obtener(especialidad_id)
                         derivacion = None
                         
                         if not especialidad.acceso_directo:
@@ -127,10 +130,12 @@ def reservar_cita(request):
                             creador=request.user
                         )
                         
-                        # Crear notificación para el médico
-                        crear_notificacion(
-                            usuario=medico.usuario,
+                        # Notificar al médico; las reservas de la misma ventana se agrupan en un resumen
+                        crear_notificaciones_agrupadas(
+                            [medico.usuario],
+                            'nueva_cita',
                             mensaje=f'Nueva cita agendada con {paciente.usuario.nombres} {paciente.usuario.apellidos} para el {fecha_obj.strftime("%d/%m/%Y")} a las {hora_obj.strftime("%H:%M")}.',
+                            mensaje_resumen='Tienes {cantidad} nuevas citas agendadas.',
                             tipo='informacion',
                             objeto_relacionado='cita',
                             objeto_id=cita.id,
@@ -144,7 +149,7 @@ def reservar_cita(request):
             
             # Si hay errores, mantener los valores seleccionados
             if especialidad_id:
-                especialidad_seleccionada = Especialidad.objects.get(id=especialidad_id)
+                especialidad_seleccionada = utils_catalogos.especialidades().obtener(especialidad_id)
                 medicos = Medico.objects.filter(especialidad=especialidad_seleccionada)
             
             if medico_id:
@@ -222,7 +227,7 @@ def obtener_horarios_disponibles(medico, fecha_str):
         
         return sorted(horarios_disponibles)
     except Exception as e:
-        print(f"Error al obtener horarios disponibles: {e}")
+        logger.exception('Error al obtener horarios disponibles')
         return []
 
 
@@ -243,37 +248,28 @@ def api_medicos_por_especialidad(request, especialidad_id):
             return JsonResponse({'success': False, 'error': f'ID de especialidad inválido: {especialidad_id}'}, status=400)
         
         # Obtener la especialidad
-        print(f"Buscando especialidad con ID: {especialidad_id}")
         try:
-            especialidad = Especialidad.objects.get(id=especialidad_id)
-            print(f"Especialidad encontrada: {especialidad.nombre}")
+            especialidad = utils_catalogos.especialidades().obtener(especialidad_id)
         except Especialidad.DoesNotExist:
-            print(f"No se encontró la especialidad con ID: {especialidad_id}")
+            logger.debug('No se encontró la especialidad con ID: %s', especialidad_id)
             return JsonResponse({'success': False, 'error': f'No se encontró la especialidad con ID: {especialidad_id}'}, status=404)
         
-        # Obtener médicos de esta especialidad
-        medicos = Medico.objects.filter(especialidad=especialidad)
-        print(f"Médicos encontrados para {especialidad.nombre}: {medicos.count()}")
-        
-        # Listar los médicos encontrados para depuración
-        for medico in medicos:
-            print(f"Médico: {medico.usuario.nombres} {medico.usuario.apellidos}, ID: {medico.id}")
-        
-        # Preparar datos para la respuesta
-        medicos_data = []
-        for medico in medicos:
-            try:
-                medico_data = {
-                    'id': medico.id,
-                    'nombres': medico.usuario.nombres,
-                    'apellidos': medico.usuario.apellidos,
-                    'especialidad': medico.especialidad.nombre
-                }
-                medicos_data.append(medico_data)
-            except Exception as e:
-                print(f"Error al procesar médico {medico.id}: {str(e)}")
+        # Obtener médicos de esta especialidad (con su usuario en la misma consulta)
+        medicos = Medico.objects.filter(especialidad=especialidad).select_related('usuario')
+        medicos_data = [
+            {
+                'id': medico.id,
+                'nombres': medico.usuario.nombres,
+                'apellidos': medico.usuario.apellidos,
+                'especialidad': especialidad.nombre
+            }
+            for medico in medicos
+        ]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Especialidad %s: %s médicos encontrados', especialidad.nombre, len(medicos_data))
+            for medico in medicos_data:
+                logger.debug('Médico: %s %s (ID: %s)', medico['nombres'], medico['apellidos'], medico['id'])
         
-        print(f"Enviando respuesta con {len(medicos_data)} médicos")
         return JsonResponse({
             'success': True,
             'medicos': medicos_data,
@@ -283,6 +279,7 @@ def api_medicos_por_especialidad(request, especialidad_id):
             }
         })
     except Exception as e:
+        logger.exception('Error en api_medicos_por_especialidad')
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 @api_view(['GET'])
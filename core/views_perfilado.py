@@ -0,0 +1,16 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+
+from .utils_perfilado import directorio_perfiles, NOMBRE_ARCHIVO_VALIDO
+
+
+@staff_member_required
+def descargar_perfil(request, nombre):
+    """Descarga un perfil generado por PerfiladoMiddleware (solo staff)"""
+    if not NOMBRE_ARCHIVO_VALIDO.match(nombre):
+        raise Http404('Perfil no encontrado')
+    ruta = directorio_perfiles() / nombre
+    if not ruta.is_file():
+        raise Http404('Perfil no encontrado')
+    # Los .prof se descargan para abrirlos con snakeviz/pstats; el HTML se muestra en el navegador
+    return FileResponse(open(ruta, 'rb'), as_attachment=nombre.endswith('.prof'), filename=nombre)
@@ -5,12 +5,13 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import Cita, Especialidad, Medico
 from .constants import ESTADO_CITA_PROGRAMADA, ESTADO_CITA_ATENDIDA, ESTADO_CITA_CANCELADA, ESTADO_CITA_INASISTENCIA
+from . import utils_catalogos
 
 # Función original de distribución de citas
 @login_required
 def distribucion_citas(request):
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -131,7 +132,7 @@ def comparativas(request):
     Vista para mostrar comparativas de citas entre diferentes períodos.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -158,7 +159,7 @@ def tendencias(request):
     Vista para mostrar tendencias en la programación de citas a lo largo del tiempo.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -185,7 +186,7 @@ def tasas_asistencia(request):
     Vista para mostrar las tasas de asistencia a citas programadas.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -213,7 +214,7 @@ def citas_admision(request):
     Vista para mostrar análisis de citas creadas por admisión.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -242,7 +243,7 @@ def origen_citas(request):
     Vista para mostrar análisis de citas según su origen: paciente, derivación, seguimiento y admisión.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -319,7 +320,7 @@ def analisis_especialidad(request):
     Vista para mostrar análisis de citas por especialidad médica.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Configurar fechas predeterminadas (último mes)
     fecha_fin = timezone.now().date()
@@ -342,7 +343,7 @@ def analisis_medico(request):
     Vista para mostrar análisis de citas por médico.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -370,7 +371,7 @@ def citas_completadas(request):
     Vista para mostrar análisis de citas completadas (atendidas).
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -397,7 +398,7 @@ def citas_canceladas(request):
     Vista para mostrar análisis de citas canceladas.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
@@ -424,7 +425,7 @@ def citas_inasistencias(request):
     Vista para mostrar análisis de inasistencias a citas.
     """
     # Obtener especialidades para el filtro
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     # Obtener todos los médicos para el filtro
     medicos = Medico.objects.all().select_related('usuario', 'especialidad')
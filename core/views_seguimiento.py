@@ -10,6 +10,8 @@ from .models import (
     SeguimientoSesion, Consultorio, Notificacion
 )
 from .forms import TratamientoProgramadoForm
+from . import utils_catalogos
+from .utils_busqueda_medicamentos import buscar_medicamentos
 
 @login_required
 def programar_seguimientos(request):
@@ -226,7 +228,7 @@ def programar_cita_sesion(request, sesion_id):
             return redirect('programar_cita_sesion', sesion_id=sesion.id)
     
     # Obtener consultorios disponibles
-    consultorios = Consultorio.objects.all()
+    consultorios = utils_catalogos.consultorios().todos
     
     context = {
         'sesion': sesion,
@@ -439,28 +441,7 @@ def api_buscar_medicamentos_prescripcion(request):
     if len(termino) < 2:
         return JsonResponse({'medicamentos': []})
     
-    from .models import Medicamento
-    
-    # Filtrar medicamentos activos con stock
-    medicamentos = Medicamento.objects.filter(
-        activo=True,
-        stock_actual__gt=0
-    )
-    
-    # Aplicar filtro de búsqueda
-    medicamentos = medicamentos.filter(
-        Q(nombre_comercial__icontains=termino) |
-        Q(nombre_generico__icontains=termino) |
-        Q(codigo__icontains=termino) |
-        Q(laboratorio__icontains=termino)
-    )
-    
-    # Aplicar filtro de forma farmacéutica si se especifica
-    if forma:
-        medicamentos = medicamentos.filter(forma_farmaceutica__icontains=forma)
-    
-    # Limitar resultados
-    medicamentos = medicamentos.order_by('nombre_comercial')[:20]
+    medicamentos = buscar_medicamentos(termino, limite=20, forma=forma)
     
     # Convertir a JSON
     data = []
@@ -9,6 +9,7 @@ from django.db.models import Min, Max, Count, Q
 from datetime import datetime, timedelta
 import logging
 from .models import Cita, Especialidad, Medico, Paciente, Notificacion
+from . import utils_catalogos
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -51,7 +52,7 @@ def tendencias_citas(request):
     ).order_by('-fecha_envio')[:5]
     
     # Obtener lista de especialidades para el filtro de tendencias
-    especialidades = Especialidad.objects.all().order_by('nombre')
+    especialidades = utils_catalogos.especialidades().todos
     
     context = {
         # Datos para el filtro de tendencias
@@ -0,0 +1,21 @@
+"""
+Configuración de gunicorn para producción (Dockerfile).
+
+Se usan workers con hilos (gthread): el stream SSE de notificaciones y el
+long-poll (core/views_eventos.py) mantienen su petición abierta hasta
+EVENTOS_DURACION_WSGI segundos, y con el worker síncrono por defecto una sola
+pestaña abierta dejaría al worker sin atender el resto de las peticiones.
+Cada worker atiende hasta GUNICORN_THREADS peticiones a la vez, y de esos
+hilos como mucho EVENTOS_MAX_ESPERAS_WSGI quedan esperando eventos (sin
+conexión a la base); los demás clientes consultan cada
+EVENTOS_REINTENTO_SATURADO segundos. Mantener EVENTOS_MAX_ESPERAS_WSGI bien
+por debajo de GUNICORN_THREADS.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+# Con gthread el timeout vigila al worker, no a cada petición; igual debe superar a los streams
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
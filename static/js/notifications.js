@@ -8,8 +8,9 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Nota: Se ha eliminado el intervalo que ejecutaba la limpieza cada 5 segundos
     
-    // Actualizar el contador de notificaciones al cargar la página
-    updateNotificationCounter();
+    // Recibir el contador y las notificaciones nuevas por SSE (con long-poll como alternativa)
+    // en lugar de consultar el contador periódicamente
+    iniciarStreamNotificaciones();
 
     // Elementos del DOM
     const btnNotifications = document.getElementById('btnNotifications');
@@ -108,21 +109,133 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         })
         .then(response => response.json())
-        .then(data => {
-            const badge = document.querySelector('.notification-badge');
-            if (badge) {
-                if (data.count > 0) {
-                    badge.textContent = data.count;
-                    badge.style.display = '';
-                } else {
-                    badge.style.display = 'none';
-                }
-            }
-        })
+        .then(data => actualizarBadge(data.count))
         .catch(error => console.error('Error:', error));
     }
 });
 
+// Último id de notificación recibido, para no repetir ni perder eventos al reconectar
+let ultimoIdNotificacion = null;
+let contadorActual = null;
+
+function actualizarBadge(count) {
+    contadorActual = count;
+    const badge = document.querySelector('.notification-badge');
+    if (badge) {
+        if (count > 0) {
+            badge.textContent = count;
+            badge.style.display = '';
+        } else {
+            badge.style.display = 'none';
+        }
+    }
+}
+
+function agregarNotificacionAlPanel(notificacion) {
+    const contenedor = document.querySelector('.notifications-content');
+    if (!contenedor || contenedor.querySelector(`.notification-item[data-notification-id="${notificacion.id}"]`)) {
+        return;
+    }
+    const vacio = contenedor.querySelector('.empty-notifications');
+    if (vacio) {
+        vacio.remove();
+    }
+
+    const item = document.createElement('div');
+    item.className = 'notification-item unread';
+    item.setAttribute('data-notification-id', notificacion.id);
+    const destino = document.createElement(notificacion.url ? 'a' : 'div');
+    if (notificacion.url) {
+        destino.href = notificacion.url;
+        destino.className = 'notification-link';
+    }
+    const icono = document.createElement('div');
+    icono.className = 'notification-icon';
+    icono.innerHTML = '<i class="fas fa-bell"></i><span class="unread-indicator"></span>';
+    const contenido = document.createElement('div');
+    contenido.className = 'notification-content';
+    const texto = document.createElement('p');
+    texto.className = 'notification-text';
+    texto.textContent = notificacion.mensaje;
+    const fecha = document.createElement('p');
+    fecha.className = 'notification-time';
+    fecha.textContent = new Date(notificacion.fecha_envio).toLocaleString('es-PE');
+    contenido.append(texto, fecha);
+    destino.append(icono, contenido);
+    item.appendChild(destino);
+    contenedor.prepend(item);
+}
+
+function procesarEventoNotificacion(tipo, datos) {
+    if (tipo === 'contador') {
+        actualizarBadge(datos.no_leidas);
+    } else if (tipo === 'notificacion') {
+        ultimoIdNotificacion = Math.max(ultimoIdNotificacion || 0, datos.id);
+        agregarNotificacionAlPanel(datos);
+    } else if (tipo === 'actualizacion') {
+        actualizarNotificacionEnPanel(datos);
+    }
+}
+
+// Un resumen que sumó eventos: se reescribe en su lugar y pasa al inicio del panel
+function actualizarNotificacionEnPanel(notificacion) {
+    const contenedor = document.querySelector('.notifications-content');
+    const item = contenedor && contenedor.querySelector(`.notification-item[data-notification-id="${notificacion.id}"]`);
+    if (!item) {
+        agregarNotificacionAlPanel(notificacion);
+        return;
+    }
+    // El mismo cambio puede llegar más de una vez (margen del servidor)
+    if (item.getAttribute('data-actualizada') === notificacion.actualizada) {
+        return;
+    }
+    item.setAttribute('data-actualizada', notificacion.actualizada);
+    item.classList.add('unread');
+    const texto = item.querySelector('.notification-text');
+    if (texto) {
+        texto.textContent = notificacion.mensaje;
+    }
+    const fecha = item.querySelector('.notification-time');
+    if (fecha) {
+        fecha.textContent = new Date(notificacion.fecha_envio).toLocaleString('es-PE');
+    }
+    const enlace = item.querySelector('a.notification-link');
+    if (enlace && notificacion.url) {
+        enlace.href = notificacion.url;
+    }
+    contenedor.prepend(item);
+}
+
+function iniciarStreamNotificaciones() {
+    if (!document.querySelector('.notification-badge') && !document.querySelector('.notifications-content')) {
+        return;
+    }
+    if (window.EventSource) {
+        // EventSource reconecta solo y envía Last-Event-ID con el último id recibido
+        const stream = new EventSource('/api/notificaciones/stream/');
+        stream.addEventListener('contador', e => procesarEventoNotificacion('contador', JSON.parse(e.data)));
+        stream.addEventListener('notificacion', e => procesarEventoNotificacion('notificacion', JSON.parse(e.data)));
+        stream.addEventListener('actualizacion', e => procesarEventoNotificacion('actualizacion', JSON.parse(e.data)));
+    } else {
+        longPollNotificaciones();
+    }
+}
+
+function longPollNotificaciones() {
+    const parametros = new URLSearchParams();
+    if (ultimoIdNotificacion !== null) parametros.set('desde', ultimoIdNotificacion);
+    if (contadorActual !== null) parametros.set('contador', contadorActual);
+
+    fetch(`/api/notificaciones/eventos/?${parametros}`, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            data.eventos.forEach(evento => procesarEventoNotificacion(evento.tipo, evento.datos));
+            // Con el servidor saturado responde sin esperar e indica cuándo volver a consultar
+            setTimeout(longPollNotificaciones, (data.reintentar_en || 0) * 1000);
+        })
+        .catch(() => setTimeout(longPollNotificaciones, 10000));
+}
+
 // Función para limpiar notificaciones de citas atendidas
 // Esta función ha sido desactivada para evitar solicitudes constantes a la API
 function limpiarNotificacionesCitasAtendidas() {